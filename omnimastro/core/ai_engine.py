@@ -4,14 +4,42 @@ Integra OpenAI y Anthropic para análisis de screenshots y generación de conten
 """
 
 import os
+import asyncio
+import atexit
 import logging
-from typing import Dict, List, Optional, Tuple, Any
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Any
 from enum import Enum
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict, replace
 import json
 import base64
 from abc import ABC, abstractmethod
 
+from .http_pool import HTTPPoolConfig, create_http_client
+from .hedging import HedgingController, HedgingPolicy, LatencyTracker
+from .image_prep import prepare_image
+from .json_stream import StreamingJSONParser
+from . import prompts, response_parser
+from .perceptual_hash import NearDuplicateIndex
+from .rate_limiter import ProviderLimiter, RateLimit, estimate_tokens, is_rate_limit_error
+from .response_cache import ExplanationCache
+from .metrics import MetricsStore, render_prometheus
+from .resilience import (
+    AttemptTimeout, DeadlineExceeded, RetryPolicy, call_with_retry, check_deadline, deadline, iterate_with_timeout,
+    remaining_time
+)
+from .router import ProviderRouter, estimate_cost
+from .screenshot_analyzer import ScreenshotAnalyzer
+from .single_flight import SingleFlight
+from .usage import (
+    TokenUsage, UsageRecorder, UsageTotals, measure_parse, record_image_tokens, record_usage, track_stream_usage,
+    track_usage, usage_from_anthropic, usage_from_openai
+)
+from ..shared.cache import AnalysisCache
+from ..shared.utils import calculate_bytes_hash
+
 # Configuración de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -68,6 +96,42 @@ class ExplanationResult:
     provider_used: AIProvider
     confidence_score: float
     metadata: Dict[str, Any]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializa el resultado a un diccionario compatible con JSON"""
+        data = asdict(self)
+        data["provider_used"] = self.provider_used.value
+        return data
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ExplanationResult":
+        """Reconstruye un resultado serializado con to_dict"""
+        return cls(**{**data, "provider_used": AIProvider(data["provider_used"])})
+
+
+@dataclass
+class ExplanationChunk:
+    """Fragmento de una explicación en streaming"""
+    field: Optional[str]  # Campo JSON que crece ('summary', 'content'...)
+    delta: str  # Texto nuevo del campo
+    partial: Dict[str, Any]  # Campos recibidos hasta ahora
+    result: Optional[ExplanationResult] = None  # Solo en el último fragmento
+    
+    @property
+    def is_final(self) -> bool:
+        return self.result is not None
+
+
+@dataclass
+class BatchExplanation:
+    """Resultado de un elemento procesado por AIEngine.explain_many"""
+    index: int
+    result: Optional[ExplanationResult] = None
+    error: Optional[Exception] = None
+    
+    @property
+    def ok(self) -> bool:
+        return self.error is None
 
 
 class AIProviderInterface(ABC):
@@ -88,24 +152,103 @@ class AIProviderInterface(ABC):
         """Mejora una explicación basada en feedback"""
         pass
     
+    async def stream_explanation(self, content: str, context: AnalysisContext) -> AsyncIterator[str]:
+        """
+        Genera la explicación en streaming, emitiendo el texto JSON crudo
+        a medida que llega. Por defecto emite la respuesta completa de una vez.
+        """
+        result = await self.generate_explanation(content, context)
+        yield json.dumps(result.metadata.get("raw_response", {}), ensure_ascii=False)
+    
     @abstractmethod
     def is_available(self) -> bool:
         """Verifica si el proveedor está disponible"""
         pass
+    
+    async def aclose(self) -> None:
+        """Cierra el cliente del proveedor si no usa un cliente HTTP compartido"""
+        client = getattr(self, "client", None)
+        if client is not None and getattr(self, "_owns_http_client", True):
+            await client.close()
+    
+    def _build_image_analysis_prompt(self, context: AnalysisContext) -> str:
+        return prompts.image_analysis_prompt(context.education_level.value, context.language)
+    
+    def _build_explanation_prompt(self, content: str, context: AnalysisContext) -> str:
+        """Instrucciones precompiladas (prefijo estable) seguidas del contenido"""
+        return self._explanation_instructions(context) + "\n\n" + self._explanation_input(content, context)
+    
+    def _explanation_instructions(self, context: AnalysisContext) -> str:
+        return prompts.explanation_instructions(
+            context.education_level.value, context.style.value, context.language
+        )
+    
+    def _explanation_input(self, content: str, context: AnalysisContext) -> str:
+        return prompts.explanation_input(content, context.subject_area, context.previous_context)
+    
+    def _get_system_prompt(self, context: AnalysisContext) -> str:
+        return prompts.system_prompt(context.education_level.value, context.language)
+    
+    def _parse_analysis_response(self, content: str) -> Dict[str, Any]:
+        """Parse la respuesta del análisis de imagen (JSON embebido, truncado o ausente)"""
+        return response_parser.parse_analysis(content)
+    
+    def _parse_explanation_response(self, content: str) -> Dict[str, Any]:
+        """Parse la respuesta de una explicación (JSON embebido, truncado o ausente)"""
+        return response_parser.parse_explanation(content)
+    
+    def _parse_explanation_result(self, content: str) -> response_parser.ParseResult:
+        """Como _parse_explanation_response, indicando si se usó el marcador de posición"""
+        return response_parser.parse_explanation_result(content)
+    
+    def _create_explanation_result(self,
+                                   data: Dict[str, Any],
+                                   provider: AIProvider,
+                                   parse_fallback: bool = False) -> ExplanationResult:
+        """
+        Crea objeto ExplanationResult desde respuesta
+        
+        Con ``parse_fallback`` (la respuesta no tenía JSON utilizable y ``data``
+        es el marcador de posición) se marca ``metadata['parse_fallback']``.
+        """
+        result = ExplanationResult(
+            content=data.get("content", ""),
+            summary=data.get("summary", ""),
+            key_concepts=data.get("key_concepts", []),
+            difficulty_level=data.get("difficulty_level", "medium"),
+            estimated_time=data.get("estimated_time", 10),
+            follow_up_questions=data.get("follow_up_questions", []),
+            resources=data.get("resources", []),
+            provider_used=provider,
+            confidence_score=data.get("confidence_score", 0.8),
+            metadata={"raw_response": data}
+        )
+        if parse_fallback:
+            result.metadata["parse_fallback"] = True
+        return result
 
 
 class OpenAIProvider(AIProviderInterface):
     """Implementación del proveedor OpenAI (GPT-4 Vision)"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self,
+                 api_key: Optional[str] = None,
+                 http_client: Optional[Any] = None,
+                 timeout: Optional[float] = RetryPolicy.attempt_timeout):
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         self.model = "gpt-4o"  # Modelo con capacidades de visión
         self.client = None
+        self._owns_http_client = http_client is None
         
         if self.api_key:
             try:
                 import openai
-                self.client = openai.AsyncOpenAI(api_key=self.api_key)
+                # Con http_client compartido se reutiliza su pool de conexiones
+                client_options = {"http_client": http_client} if http_client is not None else {}
+                # Los reintentos y timeouts los gestiona AIEngine (call_with_retry):
+                # los del SDK se sumarían a ellos y retendrían el hueco del limitador
+                self.client = openai.AsyncOpenAI(api_key=self.api_key, max_retries=0, timeout=timeout,
+                                                 **client_options)
                 logger.info("OpenAI provider inicializado correctamente")
             except ImportError:
                 logger.warning("OpenAI library no instalada. Instalar con: pip install openai")
@@ -120,8 +263,10 @@ class OpenAIProvider(AIProviderInterface):
         if not self.is_available():
             raise RuntimeError("OpenAI provider no disponible")
         
-        # Codificar imagen en base64
-        image_base64 = base64.b64encode(image_data).decode('utf-8')
+        # Recortar, redimensionar y re-codificar antes de codificar en base64
+        prepared = await asyncio.to_thread(prepare_image, image_data, "openai")
+        record_image_tokens(prepared.estimated_tokens or 0)
+        image_base64 = base64.b64encode(prepared.data).decode('utf-8')
         
         prompt = self._build_image_analysis_prompt(context)
         
@@ -131,7 +276,7 @@ class OpenAIProvider(AIProviderInterface):
                 messages=[
                     {
                         "role": "system",
-                        "content": "Eres un asistente educativo experto en analizar contenido visual y extraer información relevante para crear explicaciones pedagógicas."
+                        "content": prompts.IMAGE_ANALYSIS_SYSTEM_PROMPT
                     },
                     {
                         "role": "user",
@@ -140,8 +285,8 @@ class OpenAIProvider(AIProviderInterface):
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:image/jpeg;base64,{image_base64}",
-                                    "detail": "high"
+                                    "url": f"data:{prepared.media_type};base64,{image_base64}",
+                                    "detail": prepared.detail
                                 }
                             }
                         ]
@@ -150,9 +295,13 @@ class OpenAIProvider(AIProviderInterface):
                 max_tokens=2000,
                 temperature=0.7
             )
+            record_usage(usage_from_openai(response.usage))
             
             content = response.choices[0].message.content
-            return self._parse_analysis_response(content)
+            with measure_parse():
+                analysis = self._parse_analysis_response(content)
+            analysis["image_payload"] = prepared.report()
+            return analysis
             
         except Exception as e:
             logger.error(f"Error analizando imagen con OpenAI: {e}")
@@ -163,48 +312,61 @@ class OpenAIProvider(AIProviderInterface):
         if not self.is_available():
             raise RuntimeError("OpenAI provider no disponible")
         
-        prompt = self._build_explanation_prompt(content, context)
-        
         try:
             response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": self._get_system_prompt(context)
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                max_tokens=3000,
-                temperature=0.8,
-                response_format={"type": "json_object"}
+                **self._explanation_request(content, context)
             )
+            record_usage(usage_from_openai(response.usage))
             
-            result = json.loads(response.choices[0].message.content)
-            return self._create_explanation_result(result, AIProvider.OPENAI)
+            with measure_parse():
+                parsed = self._parse_explanation_result(response.choices[0].message.content)
+            return self._create_explanation_result(parsed.data, AIProvider.OPENAI, parse_fallback=not parsed.ok)
             
         except Exception as e:
             logger.error(f"Error generando explicación con OpenAI: {e}")
             raise
     
+    async def stream_explanation(self, content: str, context: AnalysisContext) -> AsyncIterator[str]:
+        """Genera explicación en streaming usando GPT-4"""
+        if not self.is_available():
+            raise RuntimeError("OpenAI provider no disponible")
+        
+        stream = await self.client.chat.completions.create(
+            **self._explanation_request(content, context),
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            if getattr(chunk, "usage", None):
+                record_usage(usage_from_openai(chunk.usage))
+    
+    def _explanation_request(self, content: str, context: AnalysisContext) -> Dict[str, Any]:
+        """Parámetros de la llamada chat.completions para una explicación"""
+        return {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": self._get_system_prompt(context)
+                },
+                {
+                    "role": "user",
+                    "content": self._build_explanation_prompt(content, context)
+                }
+            ],
+            "max_tokens": 3000,
+            "temperature": 0.8,
+            "response_format": {"type": "json_object"}
+        }
+    
     async def enhance_explanation(self, explanation: str, feedback: str, context: AnalysisContext) -> str:
         """Mejora explicación basada en feedback"""
         if not self.is_available():
             raise RuntimeError("OpenAI provider no disponible")
         
-        prompt = f"""
-        Explicación actual:
-        {explanation}
-        
-        Feedback del usuario:
-        {feedback}
-        
-        Por favor, mejora la explicación incorporando el feedback del usuario.
-        Mantén el nivel educativo: {context.education_level.value}
-        """
+        prompt = prompts.enhance_prompt(explanation, feedback, context.education_level.value)
         
         try:
             response = await self.client.chat.completions.create(
@@ -216,139 +378,35 @@ class OpenAIProvider(AIProviderInterface):
                 max_tokens=2500,
                 temperature=0.7
             )
+            record_usage(usage_from_openai(response.usage))
             
             return response.choices[0].message.content
             
         except Exception as e:
             logger.error(f"Error mejorando explicación con OpenAI: {e}")
             raise
-    
-    def _build_image_analysis_prompt(self, context: AnalysisContext) -> str:
-        return f"""
-        Analiza esta imagen educativa y extrae:
-        1. Tema o materia identificada
-        2. Conceptos clave presentes
-        3. Tipo de contenido (diagrama, texto, fórmula, gráfico, etc.)
-        4. Nivel de complejidad estimado
-        5. Elementos visuales importantes
-        6. Texto visible (si hay)
-        
-        Contexto: Nivel educativo {context.education_level.value}, Idioma {context.language}
-        
-        Responde en formato JSON con las claves: subject, key_concepts, content_type, complexity, visual_elements, text_content
-        """
-    
-    def _build_explanation_prompt(self, content: str, context: AnalysisContext) -> str:
-        style_instructions = {
-            ExplanationStyle.SIMPLE: "Usa lenguaje muy simple y ejemplos cotidianos",
-            ExplanationStyle.DETAILED: "Proporciona explicaciones completas con múltiples niveles de detalle",
-            ExplanationStyle.STEP_BY_STEP: "Divide la explicación en pasos numerados y secuenciales",
-            ExplanationStyle.CONCEPTUAL: "Enfócate en la comprensión profunda de los conceptos fundamentales",
-            ExplanationStyle.PRACTICAL: "Enfatiza aplicaciones prácticas y ejemplos del mundo real",
-            ExplanationStyle.VISUAL: "Describe visualmente y sugiere diagramas o representaciones visuales"
-        }
-        
-        return f"""
-        Genera una explicación educativa completa sobre el siguiente contenido:
-        
-        {content}
-        
-        Parámetros:
-        - Nivel educativo: {context.education_level.value}
-        - Estilo: {context.style.value} - {style_instructions.get(context.style, '')}
-        - Idioma: {context.language}
-        {f"- Área de estudio: {context.subject_area}" if context.subject_area else ""}
-        {f"- Contexto previo: {context.previous_context}" if context.previous_context else ""}
-        
-        Genera un JSON con la siguiente estructura:
-        {{
-            "content": "Explicación completa y detallada",
-            "summary": "Resumen breve (2-3 oraciones)",
-            "key_concepts": ["Concepto 1", "Concepto 2", ...],
-            "difficulty_level": "fácil|medio|difícil|avanzado",
-            "estimated_time": tiempo_estimado_en_minutos,
-            "follow_up_questions": ["Pregunta 1", "Pregunta 2", ...],
-            "resources": [
-                {{"title": "Título del recurso", "type": "video|artículo|ejercicio", "description": "Descripción"}}
-            ],
-            "confidence_score": 0.0-1.0
-        }}
-        """
-    
-    def _get_system_prompt(self, context: AnalysisContext) -> str:
-        level_descriptions = {
-            EducationLevel.ELEMENTARY: "estudiantes de primaria (6-12 años)",
-            EducationLevel.MIDDLE_SCHOOL: "estudiantes de secundaria (12-15 años)",
-            EducationLevel.HIGH_SCHOOL: "estudiantes de preparatoria (15-18 años)",
-            EducationLevel.UNIVERSITY: "estudiantes universitarios",
-            EducationLevel.PROFESSIONAL: "profesionales y autodidactas avanzados"
-        }
-        
-        target_audience = level_descriptions.get(context.education_level, "estudiantes")
-        
-        return f"""Eres TE-explico, un asistente educativo avanzado especializado en crear explicaciones pedagógicas adaptativas.
-
-Tu objetivo es generar explicaciones claras, precisas y adaptadas al nivel de {target_audience}.
-
-Principios pedagógicos:
-1. Claridad: Usa lenguaje apropiado para el nivel educativo
-2. Estructura: Organiza la información de manera lógica y progresiva
-3. Contextualización: Conecta conceptos nuevos con conocimientos previos
-4. Ejemplos: Proporciona ejemplos relevantes y comprensibles
-5. Verificación: Incluye preguntas para verificar comprensión
-6. Motivación: Muestra la relevancia y aplicación práctica
-
-Siempre responde en {context.language} con un tono amigable pero profesional."""
-    
-    def _parse_analysis_response(self, content: str) -> Dict[str, Any]:
-        """Parse la respuesta del análisis de imagen"""
-        try:
-            # Intentar extraer JSON si está embebido en texto
-            if "```json" in content:
-                start = content.find("```json") + 7
-                end = content.find("```", start)
-                content = content[start:end].strip()
-            
-            return json.loads(content)
-        except json.JSONDecodeError:
-            # Si no es JSON válido, crear estructura básica
-            return {
-                "subject": "No identificado",
-                "key_concepts": [],
-                "content_type": "text",
-                "complexity": "medium",
-                "visual_elements": [],
-                "text_content": content
-            }
-    
-    def _create_explanation_result(self, data: Dict[str, Any], provider: AIProvider) -> ExplanationResult:
-        """Crea objeto ExplanationResult desde respuesta"""
-        return ExplanationResult(
-            content=data.get("content", ""),
-            summary=data.get("summary", ""),
-            key_concepts=data.get("key_concepts", []),
-            difficulty_level=data.get("difficulty_level", "medium"),
-            estimated_time=data.get("estimated_time", 10),
-            follow_up_questions=data.get("follow_up_questions", []),
-            resources=data.get("resources", []),
-            provider_used=provider,
-            confidence_score=data.get("confidence_score", 0.8),
-            metadata={"raw_response": data}
-        )
 
 
 class AnthropicProvider(AIProviderInterface):
     """Implementación del proveedor Anthropic (Claude)"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self,
+                 api_key: Optional[str] = None,
+                 http_client: Optional[Any] = None,
+                 timeout: Optional[float] = RetryPolicy.attempt_timeout):
         self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
         self.model = "claude-3-5-sonnet-20241022"  # Modelo con visión
         self.client = None
+        self._owns_http_client = http_client is None
         
         if self.api_key:
             try:
                 import anthropic
-                self.client = anthropic.AsyncAnthropic(api_key=self.api_key)
+                # Con http_client compartido se reutiliza su pool de conexiones
+                client_options = {"http_client": http_client} if http_client is not None else {}
+                # Sin reintentos propios del SDK (ver OpenAIProvider)
+                self.client = anthropic.AsyncAnthropic(api_key=self.api_key, max_retries=0, timeout=timeout,
+                                                       **client_options)
                 logger.info("Anthropic provider inicializado correctamente")
             except ImportError:
                 logger.warning("Anthropic library no instalada. Instalar con: pip install anthropic")
@@ -363,17 +421,10 @@ class AnthropicProvider(AIProviderInterface):
         if not self.is_available():
             raise RuntimeError("Anthropic provider no disponible")
         
-        # Codificar imagen en base64
-        image_base64 = base64.b64encode(image_data).decode('utf-8')
-        
-        # Detectar tipo de imagen (simplificado)
-        media_type = "image/jpeg"  # Por defecto
-        if image_data[:4] == b'\x89PNG':
-            media_type = "image/png"
-        elif image_data[:3] == b'GIF':
-            media_type = "image/gif"
-        elif image_data[:4] == b'WEBP':
-            media_type = "image/webp"
+        # Detectar formato real, recortar, redimensionar y re-codificar
+        prepared = await asyncio.to_thread(prepare_image, image_data, "anthropic")
+        record_image_tokens(prepared.estimated_tokens or 0)
+        image_base64 = base64.b64encode(prepared.data).decode('utf-8')
         
         prompt = self._build_image_analysis_prompt(context)
         
@@ -381,7 +432,7 @@ class AnthropicProvider(AIProviderInterface):
             response = await self.client.messages.create(
                 model=self.model,
                 max_tokens=2000,
-                system="Eres un asistente educativo experto en analizar contenido visual y extraer información relevante para crear explicaciones pedagógicas.",
+                system=prompts.anthropic_system(prompts.IMAGE_ANALYSIS_SYSTEM_PROMPT),
                 messages=[
                     {
                         "role": "user",
@@ -390,7 +441,7 @@ class AnthropicProvider(AIProviderInterface):
                                 "type": "image",
                                 "source": {
                                     "type": "base64",
-                                    "media_type": media_type,
+                                    "media_type": prepared.media_type,
                                     "data": image_base64
                                 }
                             },
@@ -402,9 +453,13 @@ class AnthropicProvider(AIProviderInterface):
                     }
                 ]
             )
+            record_usage(usage_from_anthropic(response.usage))
             
             content = response.content[0].text
-            return self._parse_analysis_response(content)
+            with measure_parse():
+                analysis = self._parse_analysis_response(content)
+            analysis["image_payload"] = prepared.report()
+            return analysis
             
         except Exception as e:
             logger.error(f"Error analizando imagen con Anthropic: {e}")
@@ -415,51 +470,65 @@ class AnthropicProvider(AIProviderInterface):
         if not self.is_available():
             raise RuntimeError("Anthropic provider no disponible")
         
-        prompt = self._build_explanation_prompt(content, context)
-        
         try:
             response = await self.client.messages.create(
-                model=self.model,
-                max_tokens=4000,
-                system=self._get_system_prompt(context),
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.8
+                **self._explanation_request(content, context)
             )
+            record_usage(usage_from_anthropic(response.usage))
             
             result_text = response.content[0].text
-            result = self._extract_json_from_response(result_text)
-            return self._create_explanation_result(result, AIProvider.ANTHROPIC)
+            with measure_parse():
+                parsed = self._parse_explanation_result(result_text)
+            return self._create_explanation_result(parsed.data, AIProvider.ANTHROPIC, parse_fallback=not parsed.ok)
             
         except Exception as e:
             logger.error(f"Error generando explicación con Anthropic: {e}")
             raise
     
+    async def stream_explanation(self, content: str, context: AnalysisContext) -> AsyncIterator[str]:
+        """Genera explicación en streaming usando Claude"""
+        if not self.is_available():
+            raise RuntimeError("Anthropic provider no disponible")
+        
+        async with self.client.messages.stream(**self._explanation_request(content, context)) as stream:
+            async for text in stream.text_stream:
+                yield text
+            final = await stream.get_final_message()
+            record_usage(usage_from_anthropic(final.usage))
+    
+    def _explanation_request(self, content: str, context: AnalysisContext) -> Dict[str, Any]:
+        """Parámetros de la llamada messages para una explicación"""
+        # Sistema e instrucciones forman el prefijo estable; el contenido va al final
+        system = self._get_system_prompt(context)
+        return {
+            "model": self.model,
+            "max_tokens": 4000,
+            "system": prompts.anthropic_system(system),
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        prompts.text_block(self._explanation_instructions(context),
+                                           prefix_tokens=estimate_tokens(system)),
+                        {"type": "text", "text": self._explanation_input(content, context)}
+                    ]
+                }
+            ],
+            "temperature": 0.8
+        }
+    
     async def enhance_explanation(self, explanation: str, feedback: str, context: AnalysisContext) -> str:
         """Mejora explicación basada en feedback"""
         if not self.is_available():
             raise RuntimeError("Anthropic provider no disponible")
         
-        prompt = f"""
-        Explicación actual:
-        {explanation}
-        
-        Feedback del usuario:
-        {feedback}
-        
-        Por favor, mejora la explicación incorporando el feedback del usuario.
-        Mantén el nivel educativo: {context.education_level.value}
-        """
+        prompt = prompts.enhance_prompt(explanation, feedback, context.education_level.value)
         
         try:
             response = await self.client.messages.create(
                 model=self.model,
                 max_tokens=3000,
-                system=self._get_system_prompt(context),
+                system=prompts.anthropic_system(self._get_system_prompt(context)),
                 messages=[
                     {
                         "role": "user",
@@ -467,55 +536,48 @@ class AnthropicProvider(AIProviderInterface):
                     }
                 ]
             )
+            record_usage(usage_from_anthropic(response.usage))
             
             return response.content[0].text
             
         except Exception as e:
             logger.error(f"Error mejorando explicación con Anthropic: {e}")
             raise
-    
-    def _build_image_analysis_prompt(self, context: AnalysisContext) -> str:
-        return OpenAIProvider(None)._build_image_analysis_prompt(context)
-    
-    def _build_explanation_prompt(self, content: str, context: AnalysisContext) -> str:
-        return OpenAIProvider(None)._build_explanation_prompt(content, context)
-    
-    def _get_system_prompt(self, context: AnalysisContext) -> str:
-        return OpenAIProvider(None)._get_system_prompt(context)
-    
-    def _parse_analysis_response(self, content: str) -> Dict[str, Any]:
-        return OpenAIProvider(None)._parse_analysis_response(content)
-    
-    def _extract_json_from_response(self, text: str) -> Dict[str, Any]:
-        """Extrae JSON de la respuesta de Claude"""
-        try:
-            if "```json" in text:
-                start = text.find("```json") + 7
-                end = text.find("```", start)
-                json_str = text[start:end].strip()
-            else:
-                # Buscar estructura JSON en el texto
-                start = text.find("{")
-                end = text.rfind("}") + 1
-                json_str = text[start:end]
-            
-            return json.loads(json_str)
-        except (json.JSONDecodeError, ValueError) as e:
-            logger.warning(f"No se pudo extraer JSON: {e}")
-            # Crear respuesta estructurada por defecto
-            return {
-                "content": text,
-                "summary": text[:200] + "..." if len(text) > 200 else text,
-                "key_concepts": [],
-                "difficulty_level": "medium",
-                "estimated_time": 10,
-                "follow_up_questions": [],
-                "resources": [],
-                "confidence_score": 0.7
-            }
-    
-    def _create_explanation_result(self, data: Dict[str, Any], provider: AIProvider) -> ExplanationResult:
-        return OpenAIProvider(None)._create_explanation_result(data, provider)
+
+
+# Concurrencia máxima por defecto de llamadas simultáneas a cada proveedor
+DEFAULT_PROVIDER_CONCURRENCY = 8
+
+# Tokens estimados por operación (instrucciones fijas + imagen + salida máxima)
+OPERATION_TOKEN_OVERHEAD = {
+    "analyze_image": 200 + 1600 + 2000,
+    "generate_explanation": 600 + 4000,
+    "enhance_explanation": 500 + 3000,
+}
+
+# Salida máxima incluida en OPERATION_TOKEN_OVERHEAD (para separar entrada/salida)
+OPERATION_OUTPUT_TOKENS = {
+    "analyze_image": 2000,
+    "generate_explanation": 4000,
+    "enhance_explanation": 3000,
+}
+
+# Ruta rápida de OCR local: mínimo de palabras y equivalencia de complejidad
+OCR_FAST_PATH_MIN_WORDS = 20
+LOCAL_COMPLEXITY_MAP = {
+    "basic": "simple",
+    "intermediate": "medium",
+    "advanced": "complex",
+}
+
+
+def _result_text(result: Any) -> str:
+    """Texto de la respuesta de un proveedor, para estimar tokens de salida"""
+    if isinstance(result, ExplanationResult):
+        return json.dumps(result.metadata.get("raw_response") or result.content, ensure_ascii=False)
+    if isinstance(result, str):
+        return result
+    return json.dumps(result, ensure_ascii=False, default=str)
 
 
 class AIEngine:
@@ -524,17 +586,43 @@ class AIEngine:
     def __init__(self, 
                  openai_key: Optional[str] = None,
                  anthropic_key: Optional[str] = None,
-                 default_provider: AIProvider = AIProvider.AUTO):
+                 default_provider: AIProvider = AIProvider.AUTO,
+                 cache: Optional[AnalysisCache] = None,
+                 near_duplicates: Optional[NearDuplicateIndex] = None,
+                 response_cache: Optional[ExplanationCache] = None,
+                 provider_concurrency: Optional[Dict[AIProvider, int]] = None,
+                 rate_limits: Optional[Dict[AIProvider, RateLimit]] = None,
+                 screenshot_analyzer: Optional[ScreenshotAnalyzer] = None,
+                 ocr_fast_path_confidence: Optional[float] = 85.0,
+                 ocr_head_start: float = 0.0,
+                 hedging: Optional[HedgingPolicy] = None,
+                 router: Optional[ProviderRouter] = None,
+                 http_client: Optional[Any] = None,
+                 http_pool: Optional[HTTPPoolConfig] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 default_timeout: Optional[float] = None,
+                 single_flight: bool = True):
         
         self.providers: Dict[AIProvider, AIProviderInterface] = {}
         
+        # Cliente HTTP compartido por ambos proveedores (pool con keep-alive y HTTP/2)
+        self._owns_http_client = http_client is None
+        self.http_client = http_client if http_client is not None else create_http_client(http_pool)
+        self._closed = False
+        
+        # Reintentos de errores transitorios y plazo por defecto de cada operación pública
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.default_timeout = default_timeout
+        
         # Inicializar proveedores
-        openai_provider = OpenAIProvider(openai_key)
+        openai_provider = OpenAIProvider(openai_key, http_client=self.http_client,
+                                         timeout=self.retry_policy.attempt_timeout)
         if openai_provider.is_available():
             self.providers[AIProvider.OPENAI] = openai_provider
             logger.info("✓ OpenAI provider disponible")
         
-        anthropic_provider = AnthropicProvider(anthropic_key)
+        anthropic_provider = AnthropicProvider(anthropic_key, http_client=self.http_client,
+                                               timeout=self.retry_policy.attempt_timeout)
         if anthropic_provider.is_available():
             self.providers[AIProvider.ANTHROPIC] = anthropic_provider
             logger.info("✓ Anthropic provider disponible")
@@ -543,25 +631,96 @@ class AIEngine:
             logger.warning("⚠ No hay proveedores de IA disponibles. Configura las API keys.")
         
         self.default_provider = default_provider
+        self.cache = cache  # Caché por hash de imagen (opcional)
+        self.near_duplicates = near_duplicates  # Índice de capturas casi duplicadas (opcional)
+        self.response_cache = response_cache  # Caché de explicaciones (opcional)
         self._usage_stats: Dict[AIProvider, int] = {p: 0 for p in AIProvider}
+        self._token_usage = UsageTotals()  # Tokens reales (con caché de prompts) por proveedor
+        self.metrics = MetricsStore()  # Tokens, coste y latencias por proveedor/operación/nivel/estilo
+        
+        # Solicitudes idénticas simultáneas comparten una sola llamada al proveedor
+        self._single_flight = SingleFlight() if single_flight else None
+        
+        # Cuotas (solicitudes/tokens por minuto) y concurrencia máxima por proveedor
+        self.provider_concurrency: Dict[AIProvider, int] = {
+            p: DEFAULT_PROVIDER_CONCURRENCY for p in self.providers
+        }
+        self.provider_concurrency.update(provider_concurrency or {})
+        self.rate_limits: Dict[AIProvider, RateLimit] = dict(rate_limits or {})
+        self._limiters: Dict[AIProvider, ProviderLimiter] = {}
+        
+        # OCR local en paralelo con la llamada de visión (opcional). Con
+        # confianza >= ocr_fast_path_confidence se omite la visión; con
+        # ocr_head_start > 0 la visión espera ese tiempo al OCR antes de lanzarse.
+        self.screenshot_analyzer = screenshot_analyzer
+        self.ocr_fast_path_confidence = ocr_fast_path_confidence
+        self.ocr_head_start = ocr_head_start
+        self._pipeline_stats = {'ocr_fast_path': 0, 'vision': 0, 'vision_cancelled': 0}
+        
+        # Latencia observada por proveedor/operación y hedging opcional
+        self._latency = LatencyTracker()
+        self._hedging = HedgingController(hedging, self._latency) if hedging is not None else None
+        
+        # Selección de proveedor por latencia, errores y coste (con circuit breakers)
+        self.router = router or ProviderRouter()
+        for provider_type, provider_impl in self.providers.items():
+            self.router.register(provider_type.value, getattr(provider_impl, "model", None))
     
-    def _select_provider(self, preferred: AIProvider = AIProvider.AUTO) -> AIProviderInterface:
-        """Selecciona el proveedor óptimo"""
+    async def __aenter__(self) -> "AIEngine":
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+    
+    async def aclose(self) -> None:
+        """Cierra los clientes de los proveedores y el pool de conexiones compartido"""
+        if self._closed:
+            return
+        self._closed = True
+        
+        for provider_impl in self.providers.values():
+            try:
+                await provider_impl.aclose()
+            except Exception as e:
+                logger.warning(f"Error cerrando proveedor: {e}")
+        
+        if self.http_client is not None and self._owns_http_client:
+            await self.http_client.aclose()
+    
+    def _select_provider_type(self,
+                              preferred: AIProvider = AIProvider.AUTO,
+                              operation: str = "generate_explanation",
+                              record: bool = True) -> AIProvider:
+        """
+        Selecciona el tipo de proveedor óptimo para una operación
+        
+        Con ``record=False`` solo consulta el orden del enrutador sin contar
+        la decisión (p. ej. para construir la clave de caché antes de saber
+        si habrá llamada).
+        """
         if preferred != AIProvider.AUTO and preferred in self.providers:
-            return self.providers[preferred]
+            return preferred
         
-        # Selección automática: preferir Anthropic para análisis visual, OpenAI para texto
-        if AIProvider.ANTHROPIC in self.providers:
-            return self.providers[AIProvider.ANTHROPIC]
-        elif AIProvider.OPENAI in self.providers:
-            return self.providers[AIProvider.OPENAI]
+        if not self.providers:
+            raise RuntimeError("No hay proveedores de IA disponibles")
         
-        raise RuntimeError("No hay proveedores de IA disponibles")
+        # Selección automática: el enrutador pondera latencia, errores y coste
+        candidates = [p.value for p in self.providers]
+        if not record:
+            return AIProvider(self.router.rank(candidates, operation)[0])
+        return AIProvider(self.router.select(candidates, operation))
+    
+    def _select_provider(self,
+                         preferred: AIProvider = AIProvider.AUTO,
+                         operation: str = "generate_explanation") -> AIProviderInterface:
+        """Selecciona el proveedor óptimo"""
+        return self.providers[self._select_provider_type(preferred, operation)]
     
     async def analyze_screenshot(self, 
                                  image_data: bytes,
                                  context: Optional[AnalysisContext] = None,
-                                 provider: AIProvider = AIProvider.AUTO) -> Dict[str, Any]:
+                                 provider: AIProvider = AIProvider.AUTO,
+                                 timeout: Optional[float] = None) -> Dict[str, Any]:
         """
         Analiza un screenshot y extrae información educativa
         
@@ -569,42 +728,79 @@ class AIEngine:
             image_data: Datos binarios de la imagen
             context: Contexto para el análisis
             provider: Proveedor de IA a utilizar
+            timeout: Plazo total en segundos (por defecto default_timeout)
             
         Returns:
             Diccionario con información extraída
         """
-        if context is None:
-            context = AnalysisContext(education_level=EducationLevel.AUTO)
+        with deadline(self._timeout(timeout)):
+            if context is None:
+                context = AnalysisContext(education_level=EducationLevel.AUTO)
+            
+            digest = calculate_bytes_hash(image_data)
+            result = await self._coalesce(
+                ("analyze_image", digest, provider.value, context.education_level.value, context.language),
+                lambda: self._analyze_uncoalesced(image_data, digest, context, provider)
+            )
+            
+            self._apply_detected_level(context, result)
+            return result
+    
+    async def _analyze_uncoalesced(self,
+                                   image_data: bytes,
+                                   digest: str,
+                                   context: AnalysisContext,
+                                   provider: AIProvider) -> Dict[str, Any]:
+        """Análisis de imagen (caché y llamada al proveedor) sin coalescencia"""
+        def make_key(provider_type: AIProvider) -> str:
+            return AnalysisCache.make_key(
+                digest,
+                operation="analyze_image",
+                provider=provider_type.value,
+                model=getattr(self.providers[provider_type], "model", None),
+                education_level=context.education_level.value,
+                language=context.language
+            )
         
-        selected_provider = self._select_provider(provider)
-        provider_type = next(k for k, v in self.providers.items() if v == selected_provider)
+        # La clave depende del proveedor, pero la decisión solo se registra
+        # si hay llamada: un acierto de caché no despacha nada
+        provider_type = self._select_provider_type(provider, "analyze_image", record=False)
+        cache_key = None
+        if self.cache is not None:
+            cache_key = make_key(provider_type)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info("Análisis de screenshot obtenido desde caché")
+                return cached
+        
+        selected_type = self._select_provider_type(provider, "analyze_image")
+        if selected_type != provider_type:
+            provider_type = selected_type
+            if cache_key is not None:
+                cache_key = make_key(provider_type)
         
         logger.info(f"Analizando screenshot con {provider_type.value}")
         
-        try:
-            result = await selected_provider.analyze_image(image_data, context)
-            self._usage_stats[provider_type] += 1
-            
-            # Auto-detectar nivel educativo si está en AUTO
-            if context.education_level == EducationLevel.AUTO:
-                context.education_level = self._detect_education_level(result)
-            
-            return result
-            
-        except Exception as e:
-            logger.error(f"Error en análisis: {e}")
-            # Intentar con proveedor alternativo
-            if len(self.providers) > 1:
-                logger.info("Intentando con proveedor alternativo...")
-                alt_provider = self._get_alternative_provider(provider_type)
-                if alt_provider:
-                    return await alt_provider.analyze_image(image_data, context)
-            raise
+        result = await self._call_with_fallback(
+            provider_type, "analyze_image",
+            lambda p: p.analyze_image(image_data, context),
+            labels=self._metric_labels(context)
+        )
+        
+        if cache_key is not None:
+            self.cache.set(cache_key, result)
+        return result
+    
+    def _apply_detected_level(self, context: AnalysisContext, analysis: Dict[str, Any]) -> None:
+        """Auto-detecta el nivel educativo si está en AUTO"""
+        if context.education_level == EducationLevel.AUTO:
+            context.education_level = self._detect_education_level(analysis)
     
     async def generate_explanation(self,
                                    content: str,
                                    context: Optional[AnalysisContext] = None,
-                                   provider: AIProvider = AIProvider.AUTO) -> ExplanationResult:
+                                   provider: AIProvider = AIProvider.AUTO,
+                                   timeout: Optional[float] = None) -> ExplanationResult:
         """
         Genera una explicación educativa completa
         
@@ -612,40 +808,167 @@ class AIEngine:
             content: Contenido a explicar (texto o análisis previo)
             context: Contexto para la explicación
             provider: Proveedor de IA a utilizar
+            timeout: Plazo total en segundos (por defecto default_timeout)
             
         Returns:
             ExplanationResult con la explicación generada
         """
+        with deadline(self._timeout(timeout)):
+            if context is None:
+                context = AnalysisContext(
+                    education_level=EducationLevel.HIGH_SCHOOL,
+                    style=ExplanationStyle.DETAILED
+                )
+            
+            signature = self._context_signature(context, provider)
+            return await self._coalesce(
+                ("generate_explanation", calculate_bytes_hash(content.encode("utf-8")), signature),
+                lambda: self._generate_uncoalesced(content, context, provider, signature)
+            )
+    
+    async def _generate_uncoalesced(self,
+                                    content: str,
+                                    context: AnalysisContext,
+                                    provider: AIProvider,
+                                    signature: Tuple) -> ExplanationResult:
+        """Generación de explicación (caché y llamada al proveedor) sin coalescencia"""
+        if self.response_cache is not None:
+            hit = self.response_cache.get(content, signature)
+            if hit is not None:
+                data, similarity = hit
+                logger.info(f"Explicación obtenida desde caché (similitud {similarity:.2f})")
+                result = ExplanationResult.from_dict(data)
+                result.metadata['response_cache'] = {'similarity': similarity}
+                return result
+        
+        provider_type = self._select_provider_type(provider, "generate_explanation")
+        logger.info(f"Generando explicación con {provider_type.value}")
+        
+        result = await self._call_with_fallback(
+            provider_type, "generate_explanation",
+            lambda p: p.generate_explanation(content, context),
+            prompt_text=content,
+            labels=self._metric_labels(context)
+        )
+        
+        # Un marcador de posición no se cachea: la siguiente solicitud lo reintenta
+        if self.response_cache is not None and not result.metadata.get("parse_fallback"):
+            self.response_cache.set(content, signature, result.to_dict())
+        
+        return result
+    
+    async def stream_explanation(self,
+                                 content: str,
+                                 context: Optional[AnalysisContext] = None,
+                                 provider: AIProvider = AIProvider.AUTO) -> AsyncIterator[ExplanationChunk]:
+        """
+        Genera una explicación en streaming
+        
+        Emite el texto de cada campo (summary, content...) en cuanto el
+        proveedor lo produce; el último fragmento incluye el ExplanationResult.
+        El stream completo respeta el plazo actual y el timeout por intento.
+        
+        Args:
+            content: Contenido a explicar
+            context: Contexto para la explicación
+            provider: Proveedor de IA a utilizar
+            
+        Yields:
+            ExplanationChunk con los deltas de texto y el resultado final
+        """
         if context is None:
             context = AnalysisContext(
                 education_level=EducationLevel.HIGH_SCHOOL,
                 style=ExplanationStyle.DETAILED
             )
         
-        selected_provider = self._select_provider(provider)
-        provider_type = next(k for k, v in self.providers.items() if v == selected_provider)
-        
-        logger.info(f"Generando explicación con {provider_type.value}")
-        
-        try:
-            result = await selected_provider.generate_explanation(content, context)
-            self._usage_stats[provider_type] += 1
-            return result
+        signature = self._context_signature(context, provider)
+        if self.response_cache is not None:
+            hit = self.response_cache.get(content, signature)
+            if hit is not None:
+                data, similarity = hit
+                result = ExplanationResult.from_dict(data)
+                result.metadata['response_cache'] = {'similarity': similarity}
+                yield ExplanationChunk(field=None, delta="", partial=result.metadata.get("raw_response", {}), result=result)
+                return
+        
+        provider_type = self._select_provider_type(provider, "generate_explanation")
+        candidates = [provider_type]
+        alt_type = self._get_alternative_provider_type(provider_type, "generate_explanation")
+        if alt_type is not None:
+            candidates.append(alt_type)
+        
+        tokens = estimate_tokens(content) + OPERATION_TOKEN_OVERHEAD["generate_explanation"]
+        
+        for attempt, current_type in enumerate(candidates):
+            check_deadline()
+            parser = StreamingJSONParser()
+            raw_text: List[str] = []
+            emitted = False
+            logger.info(f"Generando explicación en streaming con {current_type.value}")
             
-        except Exception as e:
-            logger.error(f"Error generando explicación: {e}")
-            # Intentar con proveedor alternativo
-            if len(self.providers) > 1:
+            queued = start = time.monotonic()
+            try:
+                async with self._get_limiter(current_type).slot(tokens):
+                    start = time.monotonic()
+                    self.router.dispatch(current_type.value)
+                    usage = UsageRecorder()
+                    stream = iterate_with_timeout(
+                        track_stream_usage(self.providers[current_type].stream_explanation(content, context), usage),
+                        self.retry_policy.attempt_timeout
+                    )
+                    try:
+                        async for text in stream:
+                            raw_text.append(text)
+                            for event in parser.feed(text):
+                                emitted = True
+                                yield ExplanationChunk(field=event.field, delta=event.text, partial=dict(parser.values))
+                    finally:
+                        await stream.aclose()
+            except (asyncio.CancelledError, GeneratorExit, DeadlineExceeded):
+                # Cancelado, abandonado por el consumidor o sin plazo: no es un fallo del proveedor
+                self.router.release_probe(current_type.value)
+                raise
+            except Exception as e:
+                status = self._record_call_error(current_type, "generate_explanation", e, time.monotonic() - start)
+                self.metrics.increment("provider_calls", status=status, provider=current_type.value,
+                                       operation="generate_explanation", mode="stream",
+                                       **self._metric_labels(context))
+                logger.error(f"Error en streaming con {current_type.value}: {e}")
+                # Solo se cambia de proveedor si aún no se envió texto al usuario
+                if emitted or attempt == len(candidates) - 1:
+                    raise
                 logger.info("Intentando con proveedor alternativo...")
-                alt_provider = self._get_alternative_provider(provider_type)
-                if alt_provider:
-                    return await alt_provider.generate_explanation(content, context)
-            raise
+                continue
+            
+            # Mismo parseo (reparación, campos obligatorios, marcador de posición
+            # y estadísticas) que la respuesta no streaming
+            parsed = response_parser.parse_explanation_result("".join(raw_text))
+            data = parsed.data
+            self._record_success(
+                current_type, "generate_explanation", time.monotonic() - start, usage,
+                estimated_input=tokens - OPERATION_OUTPUT_TOKENS["generate_explanation"],
+                estimated_output=estimate_tokens(json.dumps(data, ensure_ascii=False)),
+                labels=dict(self._metric_labels(context), provider=current_type.value,
+                            operation="generate_explanation", mode="stream"),
+                queue_wait=start - queued
+            )
+            result = self.providers[current_type]._create_explanation_result(
+                data, current_type, parse_fallback=not parsed.ok
+            )
+            
+            # Un marcador de posición no se cachea: la siguiente solicitud lo reintenta
+            if self.response_cache is not None and parsed.ok:
+                self.response_cache.set(content, signature, result.to_dict())
+            
+            yield ExplanationChunk(field=None, delta="", partial=data, result=result)
+            return
     
     async def explain_screenshot(self,
                                 image_data: bytes,
                                 context: Optional[AnalysisContext] = None,
-                                provider: AIProvider = AIProvider.AUTO) -> ExplanationResult:
+                                provider: AIProvider = AIProvider.AUTO,
+                                timeout: Optional[float] = None) -> ExplanationResult:
         """
         Pipeline completo: analiza screenshot y genera explicación
         
@@ -653,20 +976,64 @@ class AIEngine:
             image_data: Datos binarios de la imagen
             context: Contexto para análisis y explicación
             provider: Proveedor de IA a utilizar
+            timeout: Plazo total en segundos (por defecto default_timeout)
             
         Returns:
             ExplanationResult con explicación completa
         """
-        if context is None:
-            context = AnalysisContext(
-                education_level=EducationLevel.AUTO,
-                style=ExplanationStyle.DETAILED
+        with deadline(self._timeout(timeout)):
+            if context is None:
+                context = AnalysisContext(
+                    education_level=EducationLevel.AUTO,
+                    style=ExplanationStyle.DETAILED
+                )
+            
+            logger.info("🎓 Iniciando pipeline de explicación de screenshot")
+            
+            signature = self._context_signature(context, provider)
+            explanation = await self._coalesce(
+                ("explain_screenshot", calculate_bytes_hash(image_data), signature),
+                lambda: self._explain_uncoalesced(image_data, context, provider, signature)
             )
+            
+            # Quien esperó a otra solicitud idéntica no ejecutó el pipeline:
+            # reflejar en su contexto el nivel y la materia detectados
+            analysis = explanation.metadata.get('image_analysis')
+            if analysis:
+                self._apply_detected_level(context, analysis)
+                if context.subject_area is None:
+                    context.subject_area = analysis.get('subject', 'General')
+            
+            logger.info("✓ Explicación generada exitosamente")
+            return explanation
+    
+    async def _explain_uncoalesced(self,
+                                   image_data: bytes,
+                                   context: AnalysisContext,
+                                   provider: AIProvider,
+                                   signature: Tuple) -> ExplanationResult:
+        """Pipeline de explicación de screenshot sin coalescencia"""
+        # Paso 0: Reutilizar la explicación de una captura casi idéntica
+        near_hash = None
+        if self.near_duplicates is not None:
+            try:
+                near_hash = await asyncio.to_thread(self.near_duplicates.compute_hash, image_data)
+            except Exception as e:
+                logger.warning(f"No se pudo calcular el hash perceptual: {e}")
         
-        logger.info("🎓 Iniciando pipeline de explicación de screenshot")
-        
-        # Paso 1: Analizar imagen
-        analysis = await self.analyze_screenshot(image_data, context, provider)
+        if near_hash is not None:
+            match = self.near_duplicates.lookup_hash(
+                near_hash, lambda entry: entry["context"] == signature
+            )
+            if match is not None:
+                distance, entry = match
+                logger.info(f"✓ Captura casi duplicada (distancia {distance}), reutilizando explicación")
+                explanation = entry["explanation"]
+                explanation.metadata['near_duplicate'] = {'distance': distance}
+                return explanation
+        
+        # Paso 1: Analizar imagen (visión y OCR local en paralelo)
+        analysis = await self._analyze_with_local_ocr(image_data, context, provider)
         logger.info(f"✓ Análisis completado: {analysis.get('subject', 'tema detectado')}")
         
         # Paso 2: Enriquecer contexto con análisis
@@ -678,16 +1045,147 @@ class AIEngine:
         explanation = await self.generate_explanation(content_to_explain, context, provider)
         
         # Paso 4: Enriquecer con información del análisis
+        explanation.metadata['image_payload'] = analysis.pop('image_payload', None)
         explanation.metadata['image_analysis'] = analysis
         
-        logger.info("✓ Explicación generada exitosamente")
+        if near_hash is not None:
+            self.near_duplicates.add_hash(
+                near_hash, {"context": signature, "explanation": explanation}
+            )
+        
         return explanation
     
+    async def _analyze_with_local_ocr(self,
+                                      image_data: bytes,
+                                      context: AnalysisContext,
+                                      provider: AIProvider) -> Dict[str, Any]:
+        """
+        Analiza la imagen solapando el OCR local con la llamada de visión
+        
+        El OCR corre en un hilo mientras la solicitud al proveedor está en
+        curso. Si su confianza supera ocr_fast_path_confidence, la llamada de
+        visión se cancela (o no llega a lanzarse); si no, el texto OCR se
+        añade al análisis del proveedor.
+        """
+        if self.screenshot_analyzer is None:
+            return await self.analyze_screenshot(image_data, context, provider)
+        
+        local_task = asyncio.ensure_future(
+            asyncio.to_thread(self.screenshot_analyzer.analyze_image_data, image_data)
+        )
+        vision_task = None
+        try:
+            if self.ocr_head_start > 0:
+                await asyncio.wait({local_task}, timeout=self.ocr_head_start)
+                if local_task.done():
+                    fast = self._ocr_fast_path(local_task.result(), context)
+                    if fast is not None:
+                        return fast
+            
+            vision_task = asyncio.ensure_future(self.analyze_screenshot(image_data, context, provider))
+            
+            try:
+                local = await local_task
+            except Exception as e:
+                logger.warning(f"OCR local falló: {e}")
+                local = None
+            
+            if local is not None and not vision_task.done():
+                fast = self._ocr_fast_path(local, context)
+                if fast is not None:
+                    vision_task.cancel()
+                    self._pipeline_stats['vision_cancelled'] += 1
+                    return fast
+            
+            analysis = await vision_task
+            self._pipeline_stats['vision'] += 1
+        finally:
+            for task in (local_task, vision_task):
+                if task is not None and not task.done():
+                    task.cancel()
+        
+        if local is not None and "error" not in local:
+            ocr_text = local["text_extraction"].get("text", "")
+            if ocr_text:
+                analysis = dict(analysis, ocr_text=ocr_text,
+                                ocr_confidence=local["text_extraction"].get("confidence", 0))
+        return analysis
+    
+    def _ocr_fast_path(self,
+                       local: Dict[str, Any],
+                       context: AnalysisContext) -> Optional[Dict[str, Any]]:
+        """Construye el análisis solo con OCR si es fiable, o retorna None"""
+        if self.ocr_fast_path_confidence is None or "error" in local:
+            return None
+        
+        text_result = local["text_extraction"]
+        if (text_result.get("confidence", 0) < self.ocr_fast_path_confidence
+                or text_result.get("word_count", 0) < OCR_FAST_PATH_MIN_WORDS
+                or not local["quality_assessment"].get("suitable_for_ocr")
+                or local["content_detection"].get("has_diagrams")):
+            # Los diagramas necesitan el modelo de visión aunque el texto sea legible
+            return None
+        
+        summary = self.screenshot_analyzer.summarize_content(local)
+        topics = summary["topics"]
+        analysis = {
+            'subject': topics[0] if topics else 'General',
+            'key_concepts': topics,
+            'content_type': summary["type"],
+            'complexity': LOCAL_COMPLEXITY_MAP.get(summary["complexity"], 'medium'),
+            'text_content': text_result.get("text", ""),
+            'ocr_confidence': text_result.get("confidence", 0),
+            'source': 'local_ocr'
+        }
+        
+        logger.info(f"✓ OCR local fiable ({analysis['ocr_confidence']:.1f}%), omitiendo análisis de visión")
+        self._pipeline_stats['ocr_fast_path'] += 1
+        self._apply_detected_level(context, analysis)
+        return analysis
+    
+    def _timeout(self, timeout: Optional[float]) -> Optional[float]:
+        return timeout if timeout is not None else self.default_timeout
+    
+    async def _coalesce(self, key: Tuple, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Ejecuta ``func`` compartiendo el resultado con las solicitudes
+        idénticas en curso (misma clave). Cada llamador conserva su propio
+        plazo mientras espera.
+        """
+        if self._single_flight is None:
+            return await func()
+        
+        remaining = remaining_time()
+        if remaining is None:
+            return await self._single_flight.do(key, func)
+        try:
+            return await asyncio.wait_for(self._single_flight.do(key, func), timeout=max(remaining, 0))
+        except asyncio.TimeoutError as e:
+            if isinstance(e, DeadlineExceeded) or (remaining_time() or 0) > 0:
+                raise
+            raise DeadlineExceeded("Plazo agotado esperando una solicitud idéntica en curso") from e
+    
+    def _metric_labels(self, context: AnalysisContext) -> Dict[str, str]:
+        """Etiquetas de métricas derivadas del contexto educativo"""
+        return {"level": context.education_level.value, "style": context.style.value}
+    
+    def _context_signature(self, context: AnalysisContext, provider: AIProvider) -> Tuple:
+        """Campos del contexto que determinan el resultado de una explicación"""
+        return (
+            provider.value,
+            context.education_level.value,
+            context.style.value,
+            context.language,
+            context.subject_area,
+            context.previous_context
+        )
+    
     async def enhance_explanation(self,
                                  explanation: str,
                                  feedback: str,
                                  context: Optional[AnalysisContext] = None,
-                                 provider: AIProvider = AIProvider.AUTO) -> str:
+                                 provider: AIProvider = AIProvider.AUTO,
+                                 timeout: Optional[float] = None) -> str:
         """
         Mejora una explicación basada en feedback del usuario
         
@@ -696,21 +1194,94 @@ class AIEngine:
             feedback: Feedback del usuario
             context: Contexto educativo
             provider: Proveedor de IA a utilizar
+            timeout: Plazo total en segundos (por defecto default_timeout)
             
         Returns:
             Explicación mejorada
         """
-        if context is None:
-            context = AnalysisContext(education_level=EducationLevel.AUTO)
+        with deadline(self._timeout(timeout)):
+            if context is None:
+                context = AnalysisContext(education_level=EducationLevel.AUTO)
+            
+            provider_type = self._select_provider_type(provider, "enhance_explanation")
+            
+            logger.info(f"Mejorando explicación con {provider_type.value}")
+            
+            return await self._invoke(
+                provider_type, "enhance_explanation",
+                lambda p: p.enhance_explanation(explanation, feedback, context),
+                prompt_text=explanation + feedback,
+                labels=self._metric_labels(context)
+            )
+    
+    async def explain_many(self,
+                           images: Iterable[bytes],
+                           contexts: Optional[Sequence[Optional[AnalysisContext]]] = None,
+                           provider: AIProvider = AIProvider.AUTO,
+                           max_concurrency: int = 16) -> AsyncIterator[BatchExplanation]:
+        """
+        Explica muchas imágenes de forma concurrente
         
-        selected_provider = self._select_provider(provider)
-        provider_type = next(k for k, v in self.providers.items() if v == selected_provider)
+        Las llamadas a cada proveedor quedan acotadas por su limitador
+        (rate_limits y provider_concurrency); max_concurrency limita los
+        pipelines en curso.
         
-        logger.info(f"Mejorando explicación con {provider_type.value}")
+        Args:
+            images: Imágenes a explicar (bytes)
+            contexts: Contexto por imagen (opcional, misma longitud que images)
+            provider: Proveedor de IA a utilizar
+            max_concurrency: Pipelines simultáneos máximos
+            
+        Yields:
+            BatchExplanation en orden de finalización, con su índice de entrada
+        """
+        async def run(index: int, image_data: bytes) -> BatchExplanation:
+            context = contexts[index] if contexts is not None else None
+            # Cada pipeline modifica su contexto: trabajar sobre una copia
+            context = replace(context) if context is not None else None
+            try:
+                result = await self.explain_screenshot(image_data, context, provider)
+                return BatchExplanation(index=index, result=result)
+            except Exception as e:
+                logger.error(f"Error explicando imagen {index}: {e}")
+                return BatchExplanation(index=index, error=e)
         
-        result = await selected_provider.enhance_explanation(explanation, feedback, context)
-        self._usage_stats[provider_type] += 1
-        return result
+        pending = set()
+        items = iter(enumerate(images))
+        
+        try:
+            while True:
+                for index, image_data in items:
+                    pending.add(asyncio.ensure_future(run(index, image_data)))
+                    if len(pending) >= max_concurrency:
+                        break
+                
+                if not pending:
+                    break
+                
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    def explain_many_sync(self,
+                          images: Iterable[bytes],
+                          contexts: Optional[Sequence[Optional[AnalysisContext]]] = None,
+                          provider: AIProvider = AIProvider.AUTO,
+                          max_concurrency: int = 16) -> List[BatchExplanation]:
+        """
+        Versión síncrona de explain_many para scripts
+        
+        Returns:
+            Lista de BatchExplanation en el orden de entrada
+        """
+        async def collect() -> List[BatchExplanation]:
+            results = [item async for item in self.explain_many(images, contexts, provider, max_concurrency)]
+            return sorted(results, key=lambda item: item.index)
+        
+        return asyncio.run(collect())
     
     def _detect_education_level(self, analysis: Dict[str, Any]) -> EducationLevel:
         """Detecta el nivel educativo basado en el análisis"""
@@ -726,12 +1297,247 @@ class AIEngine:
         
         return complexity_map.get(complexity, EducationLevel.HIGH_SCHOOL)
     
-    def _get_alternative_provider(self, current: AIProvider) -> Optional[AIProviderInterface]:
+    def _get_limiter(self, provider_type: AIProvider) -> ProviderLimiter:
+        """Limitador de cuota y concurrencia adaptativa del proveedor"""
+        if provider_type not in self._limiters:
+            self._limiters[provider_type] = ProviderLimiter(
+                self.rate_limits.get(provider_type),
+                max_concurrency=self.provider_concurrency.get(provider_type, DEFAULT_PROVIDER_CONCURRENCY)
+            )
+        return self._limiters[provider_type]
+    
+    async def _invoke(self,
+                      provider_type: AIProvider,
+                      operation: str,
+                      call: Callable[[AIProviderInterface], Awaitable[Any]],
+                      prompt_text: str = "",
+                      labels: Optional[Dict[str, str]] = None) -> Any:
+        """
+        Ejecuta una llamada a un proveedor con timeout por intento, reintentos
+        de errores transitorios (con backoff, jitter y Retry-After) y el plazo
+        heredado del llamador
+        
+        Args:
+            provider_type: Proveedor a utilizar
+            operation: Nombre de la operación (analyze_image, generate_explanation...)
+            call: Función que recibe el proveedor y retorna la corrutina a esperar
+            prompt_text: Texto variable del prompt, para estimar tokens
+            labels: Etiquetas adicionales de métricas (nivel, estilo)
+        """
+        def on_attempt_timeout() -> None:
+            # El intento se canceló (y liberó su prueba) al vencer su timeout:
+            # cuenta como fallo del proveedor
+            self.router.record_failure(provider_type.value, operation, self.retry_policy.attempt_timeout or 0.0)
+            self.metrics.increment("provider_calls", status="timeout",
+                                   **dict(labels or {}, provider=provider_type.value, operation=operation))
+        
+        def on_retry(attempt: int, error: BaseException, delay: float) -> None:
+            if isinstance(error, AttemptTimeout):
+                on_attempt_timeout()
+            self.metrics.increment("retries", provider=provider_type.value, operation=operation,
+                                   reason=type(error).__name__)
+        
+        try:
+            return await call_with_retry(
+                lambda: self._invoke_once(provider_type, operation, call, prompt_text, labels),
+                self.retry_policy,
+                on_retry=on_retry
+            )
+        except AttemptTimeout:
+            on_attempt_timeout()
+            raise
+    
+    async def _invoke_once(self,
+                           provider_type: AIProvider,
+                           operation: str,
+                           call: Callable[[AIProviderInterface], Awaitable[Any]],
+                           prompt_text: str = "",
+                           labels: Optional[Dict[str, str]] = None) -> Any:
+        """
+        Un intento de llamada a un proveedor respetando su cuota y concurrencia
+        
+        Args:
+            provider_type: Proveedor a utilizar
+            operation: Nombre de la operación (analyze_image, generate_explanation...)
+            call: Función que recibe el proveedor y retorna la corrutina a esperar
+            prompt_text: Texto variable del prompt, para estimar tokens
+            labels: Etiquetas adicionales de métricas (nivel, estilo)
+        """
+        tokens = estimate_tokens(prompt_text) + OPERATION_TOKEN_OVERHEAD.get(operation, 0)
+        key = (provider_type.value, operation)
+        labels = dict(labels or {}, provider=provider_type.value, operation=operation)
+        
+        queued = time.monotonic()
+        async with self._get_limiter(provider_type).slot(tokens):
+            start = time.monotonic()
+            self.router.dispatch(provider_type.value)
+            try:
+                with track_usage() as usage:
+                    result = await call(self.providers[provider_type])
+            except asyncio.CancelledError:
+                # Llamada cancelada (p. ej. perdió un hedge): no resuelve la
+                # prueba del circuito, que queda libre para otra llamada.
+                # Su latencia real es al menos la transcurrida: solo se
+                # registra si ya supera el cuantil del hedging
+                self.router.release_probe(provider_type.value)
+                quantile = self._hedging.policy.quantile if self._hedging is not None else HedgingPolicy.quantile
+                self._latency.record_censored(key, time.monotonic() - start, quantile)
+                self.metrics.increment("provider_calls", status="cancelled", **labels)
+                raise
+            except Exception as e:
+                elapsed = time.monotonic() - start
+                status = self._record_call_error(provider_type, operation, e, elapsed)
+                self.metrics.increment("provider_calls", status=status, **labels)
+                self.metrics.observe("call_latency_seconds", elapsed, phase="total", **labels)
+                raise
+            latency = time.monotonic() - start
+            self._latency.record(key, latency)
+        
+        self._record_success(provider_type, operation, latency, usage,
+                             estimated_input=tokens - OPERATION_OUTPUT_TOKENS.get(operation, 0),
+                             estimated_output=estimate_tokens(_result_text(result)),
+                             labels=labels,
+                             queue_wait=start - queued)
+        return result
+    
+    def _record_call_error(self,
+                           provider_type: AIProvider,
+                           operation: str,
+                           error: BaseException,
+                           elapsed: float) -> str:
+        """
+        Registra una llamada fallida en el enrutador y retorna su estado para
+        las métricas. Un 429 no es un fallo del proveedor: lo gestionan el
+        AIMD y el vaciado del limitador, así que no cuenta para el circuit
+        breaker (solo libera la llamada de prueba si la había).
+        """
+        if is_rate_limit_error(error):
+            self.router.release_probe(provider_type.value)
+            return "rate_limited"
+        self.router.record_failure(provider_type.value, operation, elapsed)
+        return "error"
+    
+    def _record_success(self,
+                        provider_type: AIProvider,
+                        operation: str,
+                        latency: float,
+                        recorder: UsageRecorder,
+                        estimated_input: int,
+                        estimated_output: int,
+                        labels: Dict[str, str],
+                        queue_wait: float = 0.0) -> None:
+        """
+        Registra una llamada correcta: uso, enrutador y métricas de tokens,
+        coste y latencia (cola / red / parseo). Usa los tokens reales si el
+        proveedor los reportó y, si no, los estimados.
+        """
+        usage = recorder.total
+        if usage is not None:
+            self._token_usage.add(provider_type.value, usage)
+        else:
+            usage = TokenUsage(input_tokens=estimated_input, output_tokens=estimated_output)
+        
+        self.router.record_success(
+            provider_type.value, operation, latency,
+            input_tokens=usage.input_tokens,
+            output_tokens=usage.output_tokens
+        )
+        self._usage_stats[provider_type] += 1
+        
+        model = getattr(self.providers.get(provider_type), "model", None)
+        cost = estimate_cost(model, usage.input_tokens, usage.output_tokens, usage.cached_input_tokens)
+        
+        metrics = self.metrics
+        metrics.increment("provider_calls", status="ok", **labels)
+        metrics.increment("input_tokens", usage.input_tokens, **labels)
+        metrics.increment("cached_input_tokens", usage.cached_input_tokens, **labels)
+        metrics.increment("output_tokens", usage.output_tokens, **labels)
+        metrics.increment("image_tokens", recorder.image_tokens, **labels)
+        metrics.increment("cost_usd", cost, **labels)
+        metrics.observe("call_latency_seconds", queue_wait, phase="queue", **labels)
+        metrics.observe("call_latency_seconds", max(0.0, latency - recorder.parse_seconds), phase="network", **labels)
+        metrics.observe("call_latency_seconds", recorder.parse_seconds, phase="parse", **labels)
+        metrics.observe("call_latency_seconds", queue_wait + latency, phase="total", **labels)
+    
+    async def _call_with_fallback(self,
+                                  provider_type: AIProvider,
+                                  operation: str,
+                                  call: Callable[[AIProviderInterface], Awaitable[Any]],
+                                  prompt_text: str = "",
+                                  labels: Optional[Dict[str, str]] = None) -> Any:
+        """
+        Ejecuta la llamada y, si falla, la reintenta con el proveedor alternativo
+        
+        Con hedging activo, si el principal supera su latencia p90 se lanza la
+        misma llamada al alternativo y se usa la primera respuesta correcta.
+        """
+        alt_type = self._get_alternative_provider_type(provider_type, operation)
+        primary = asyncio.ensure_future(self._invoke(provider_type, operation, call, prompt_text, labels))
+        hedge = None
+        
+        try:
+            delay = None
+            if self._hedging is not None and alt_type is not None:
+                delay = self._hedging.hedge_delay((provider_type.value, operation))
+            
+            if delay is not None:
+                await asyncio.wait({primary}, timeout=delay)
+                if not primary.done() and self._hedging.try_spend():
+                    logger.info(f"{provider_type.value} supera su p{int(self._hedging.policy.quantile * 100)} "
+                                f"({delay:.2f}s) en {operation}, cubriendo con {alt_type.value}")
+                    self.metrics.increment("hedges", provider=alt_type.value, operation=operation)
+                    hedge = asyncio.ensure_future(self._invoke(alt_type, operation, call, prompt_text, labels))
+                    return await self._race(primary, hedge, operation)
+            
+            try:
+                return await primary
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                logger.error(f"Error en {operation} con {provider_type.value}: {e}")
+                if alt_type is None:
+                    raise
+                logger.info("Intentando con proveedor alternativo...")
+                self.metrics.increment("retries", provider=alt_type.value, operation=operation, reason="fallback")
+                try:
+                    return await self._invoke(alt_type, operation, call, prompt_text, labels)
+                except Exception as alt_error:
+                    # Conservar el error del proveedor principal como causa
+                    raise alt_error from e
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+    
+    async def _race(self, primary: "asyncio.Future", hedge: "asyncio.Future", operation: str) -> Any:
+        """Retorna el primer resultado correcto de dos llamadas; falla si fallan ambas"""
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    self._hedging.record_winner(task is hedge)
+                    return task.result()
+                error = task.exception()
+                logger.error(f"Error en {operation} durante hedging: {error}")
+        raise error
+    
+    def _get_alternative_provider_type(self,
+                                       current: AIProvider,
+                                       operation: str = "generate_explanation") -> Optional[AIProvider]:
+        """Obtiene el tipo del mejor proveedor alternativo para una operación"""
+        others = [p.value for p in self.providers if p != current]
+        if not others:
+            return None
+        return AIProvider(self.router.rank(others, operation)[0])
+    
+    def _get_alternative_provider(self,
+                                  current: AIProvider,
+                                  operation: str = "generate_explanation") -> Optional[AIProviderInterface]:
         """Obtiene un proveedor alternativo"""
-        for provider_type, provider in self.providers.items():
-            if provider_type != current:
-                return provider
-        return None
+        alt_type = self._get_alternative_provider_type(current, operation)
+        return self.providers[alt_type] if alt_type is not None else None
     
     def _build_content_from_analysis(self, analysis: Dict[str, Any]) -> str:
         """Construye contenido para explicación desde análisis"""
@@ -743,6 +1549,9 @@ class AIEngine:
         if 'text_content' in analysis and analysis['text_content']:
             parts.append(f"\nContenido textual:\n{analysis['text_content']}")
         
+        if analysis.get('ocr_text') and analysis['ocr_text'] != analysis.get('text_content'):
+            parts.append(f"\nTexto extraído por OCR:\n{analysis['ocr_text']}")
+        
         if 'key_concepts' in analysis and analysis['key_concepts']:
             concepts = ', '.join(analysis['key_concepts'])
             parts.append(f"\nConceptos identificados: {concepts}")
@@ -757,9 +1566,22 @@ class AIEngine:
         return {
             'providers_available': list(self.providers.keys()),
             'usage_count': {k.value: v for k, v in self._usage_stats.items()},
-            'total_requests': sum(self._usage_stats.values())
+            'total_requests': sum(self._usage_stats.values()),
+            'rate_limiting': {k.value: v.get_statistics() for k, v in self._limiters.items()},
+            'screenshot_pipeline': dict(self._pipeline_stats),
+            'hedging': self._hedging.get_statistics() if self._hedging is not None else None,
+            'single_flight': self._single_flight.get_statistics() if self._single_flight is not None else None,
+            'routing': self.router.get_statistics(),
+            'token_usage': self._token_usage.get_statistics(),
+            'prompt_templates': prompts.get_template_statistics(),
+            'response_parsing': response_parser.get_parser_statistics(),
+            'metrics': self.metrics.snapshot()
         }
     
+    def export_metrics(self, prefix: str = "omnimastro") -> str:
+        """Métricas del motor en formato de texto de Prometheus (para /metrics)"""
+        return render_prometheus(self.metrics, prefix=prefix)
+    
     def is_ready(self) -> bool:
         """Verifica si el motor está listo para usar"""
         return len(self.providers) > 0
@@ -768,18 +1590,121 @@ class AIEngine:
 # Funciones de utilidad
 
 def create_engine(openai_key: Optional[str] = None,
-                 anthropic_key: Optional[str] = None) -> AIEngine:
+                 anthropic_key: Optional[str] = None,
+                 **options: Any) -> AIEngine:
     """
     Factory function para crear un motor de IA configurado
     
     Args:
         openai_key: API key de OpenAI (opcional, usa variable de entorno)
         anthropic_key: API key de Anthropic (opcional, usa variable de entorno)
+        **options: Argumentos adicionales de AIEngine
         
     Returns:
         AIEngine configurado
     """
-    return AIEngine(openai_key=openai_key, anthropic_key=anthropic_key)
+    return AIEngine(openai_key=openai_key, anthropic_key=anthropic_key, **options)
+
+
+# Motores compartidos del proceso, por API keys y event loop: las conexiones
+# HTTP pertenecen al loop en el que se abrieron
+EngineKey = Tuple[Optional[str], Optional[str], Optional[asyncio.AbstractEventLoop]]
+_engine_registry: Dict[EngineKey, AIEngine] = {}
+_engine_lock = threading.Lock()
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def get_engine(openai_key: Optional[str] = None,
+               anthropic_key: Optional[str] = None) -> AIEngine:
+    """
+    Obtiene el motor compartido del proceso para unas API keys
+    
+    Las llamadas repetidas desde el mismo event loop reutilizan el motor y
+    sus conexiones abiertas (cachés, limitadores y enrutador incluidos).
+    Quien crea el loop es responsable de cerrar sus motores antes de
+    cerrarlo: ``async with engine_scope():`` o ``await close_engines()``.
+    Los motores obtenidos sin loop en marcha se cierran al salir del
+    proceso (atexit).
+    
+    Args:
+        openai_key: API key de OpenAI (opcional, usa variable de entorno)
+        anthropic_key: API key de Anthropic (opcional, usa variable de entorno)
+        
+    Returns:
+        AIEngine compartido
+    """
+    loop = _running_loop()
+    key = (
+        openai_key or os.getenv("OPENAI_API_KEY"),
+        anthropic_key or os.getenv("ANTHROPIC_API_KEY"),
+        loop
+    )
+    
+    with _engine_lock:
+        # Descartar motores de loops ya cerrados (sus conexiones no son reutilizables)
+        for stale in [k for k in _engine_registry if k[2] is not None and k[2].is_closed()]:
+            engine = _engine_registry.pop(stale)
+            if not engine._closed:
+                logger.warning("Motor compartido de un event loop cerrado sin close_engines(); "
+                               "sus conexiones no se cerraron limpiamente")
+        
+        if key not in _engine_registry:
+            _engine_registry[key] = create_engine(openai_key, anthropic_key)
+        return _engine_registry[key]
+
+
+async def close_engines() -> None:
+    """Cierra y olvida los motores compartidos del event loop actual"""
+    loop = _running_loop()
+    with _engine_lock:
+        closing = [_engine_registry.pop(k) for k in [k for k in _engine_registry if k[2] is loop]]
+    
+    for engine in closing:
+        await engine.aclose()
+
+
+@asynccontextmanager
+async def engine_scope() -> AsyncIterator[None]:
+    """
+    Ámbito de los motores compartidos del loop actual: al salir del bloque
+    se cierran los obtenidos con ``get_engine`` dentro de él (y en el resto
+    del loop).
+    
+    Uso::
+    
+        async def main():
+            async with engine_scope():
+                await get_engine().generate_explanation(...)
+    """
+    try:
+        yield
+    finally:
+        await close_engines()
+
+
+def _close_engines_at_exit() -> None:
+    """Cierra al salir del proceso los motores obtenidos sin loop en marcha"""
+    with _engine_lock:
+        closing = [_engine_registry.pop(k) for k in [k for k in _engine_registry if k[2] is None]]
+        leaked = sum(1 for engine in _engine_registry.values() if not engine._closed)
+        _engine_registry.clear()
+    
+    for engine in closing:
+        try:
+            asyncio.run(engine.aclose())
+        except Exception as e:
+            logger.warning(f"Error cerrando motor compartido: {e}")
+    if leaked:
+        logger.debug(f"{leaked} motor(es) de event loops sin close_engines() al salir")
+
+
+atexit.register(_close_engines_at_exit)
 
 
 async def quick_explain(image_path: str,
@@ -789,6 +1714,9 @@ async def quick_explain(image_path: str,
     """
     Función rápida para explicar una imagen desde archivo
     
+    Reutiliza el motor compartido (get_engine) y sus conexiones; se cierra
+    con ``engine_scope`` o ``close_engines`` (ver get_engine).
+    
     Args:
         image_path: Ruta al archivo de imagen
         level: Nivel educativo
@@ -801,7 +1729,7 @@ async def quick_explain(image_path: str,
     with open(image_path, 'rb') as f:
         image_data = f.read()
     
-    engine = create_engine()
+    engine = get_engine()
     context = AnalysisContext(
         education_level=level,
         style=style,
@@ -866,5 +1794,7 @@ if __name__ == "__main__":
         print("📊 Estadísticas:")
         print(f"  Total de solicitudes: {stats['total_requests']}")
         
+        await engine.aclose()
+        
     # Ejecutar demo
     asyncio.run(demo())
@@ -0,0 +1,525 @@
+"""
+Trabajos de Explicación Masiva mediante las APIs de Lotes
+
+Para cargas no interactivas (p. ej. pre-generar las explicaciones de todas
+las páginas escaneadas de un libro) las APIs de lotes de los proveedores
+cuestan la mitad y no consumen la cuota de tiempo real:
+- Las solicitudes se escriben en JSONL con el formato de lote del proveedor,
+  reutilizando los mismos parámetros que ``generate_explanation``
+- Se envían, se consultan periódicamente y los resultados se convierten en
+  ``ExplanationResult``
+- El estado del trabajo se guarda en un archivo JSON local tras cada paso,
+  de modo que un proceso reiniciado retoma el trabajo sin reenviar lotes ni
+  volver a descargar resultados ya recogidos. Cada envío lleva un id propio
+  guardado antes de enviar: si el proceso cae entre el envío y el guardado,
+  al retomar se busca el lote por ese id en lugar de enviarlo otra vez
+
+El backend es intercambiable (``BatchBackend``), lo que permite usar un
+servidor de lotes local en pruebas.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Union
+
+from .ai_engine import (
+    AIEngine, AIProvider, AIProviderInterface, AnalysisContext, BatchExplanation,
+    EducationLevel, ExplanationResult, ExplanationStyle
+)
+from .resilience import call_with_retry, check_deadline, deadline
+from .router import BATCH_PRICE_FACTOR, estimate_cost
+from .usage import TokenUsage, usage_from_anthropic, usage_from_openai
+from ..shared.utils import calculate_bytes_hash
+
+logger = logging.getLogger(__name__)
+
+# Solicitudes por lote (límites de los proveedores: 50.000 OpenAI, 100.000 Anthropic)
+DEFAULT_MAX_REQUESTS_PER_BATCH = 10_000
+
+OPERATION = "generate_explanation"
+
+# Margen (segundos) entre el reloj local y el del proveedor al buscar un envío interrumpido
+SUBMISSION_CLOCK_SKEW = 600.0
+
+
+@dataclass
+class BatchStatus:
+    """Estado de un lote en el proveedor"""
+    batch_id: str
+    status: str  # Estado reportado por el proveedor
+    ended: bool  # True si el lote ya no procesará más solicitudes
+    counts: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class BatchItemResult:
+    """Resultado de una solicitud de un lote"""
+    custom_id: str
+    text: Optional[str] = None
+    usage: Optional[TokenUsage] = None
+    error: Optional[str] = None
+
+
+def _namespace(value: Any) -> Any:
+    """Convierte dicts anidados en objetos con atributos (para usage_from_*)"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: _namespace(v) for k, v in value.items()})
+    return value
+
+
+def _counts(value: Any) -> Dict[str, int]:
+    if value is None:
+        return {}
+    if hasattr(value, "model_dump"):
+        value = value.model_dump()
+    elif not isinstance(value, dict):
+        value = vars(value)
+    return {k: v for k, v in value.items() if isinstance(v, int)}
+
+
+class BatchBackend(ABC):
+    """API de lotes de un proveedor"""
+
+    provider: AIProvider
+
+    @abstractmethod
+    def request_line(self, custom_id: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Línea JSONL de una solicitud con los parámetros de la llamada"""
+
+    @abstractmethod
+    async def submit(self, path: Path, submission_id: str) -> str:
+        """Envía el archivo JSONL (etiquetado con ``submission_id``) y retorna el id del lote"""
+
+    async def find(self, submission_id: str, since: float) -> Optional[str]:
+        """
+        Id del lote enviado con ``submission_id`` desde ``since`` (epoch), o
+        None si no existe o la API no permite etiquetar lotes.
+        """
+        return None
+
+    @abstractmethod
+    async def status(self, batch_id: str) -> BatchStatus:
+        """Consulta el estado del lote"""
+
+    @abstractmethod
+    async def results(self, batch_id: str) -> List[BatchItemResult]:
+        """Descarga los resultados de un lote terminado"""
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """OpenAI Batch API (archivo JSONL subido con purpose='batch')"""
+
+    provider = AIProvider.OPENAI
+    endpoint = "/v1/chat/completions"
+    ended_statuses = frozenset({"completed", "failed", "expired", "cancelled"})
+
+    def __init__(self, client: Any, completion_window: str = "24h"):
+        self.client = client
+        self.completion_window = completion_window
+
+    def request_line(self, custom_id: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        return {"custom_id": custom_id, "method": "POST", "url": self.endpoint, "body": params}
+
+    async def submit(self, path: Path, submission_id: str) -> str:
+        with open(path, "rb") as f:
+            uploaded = await self.client.files.create(file=f, purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=self.endpoint,
+            completion_window=self.completion_window,
+            metadata={"submission_id": submission_id}
+        )
+        return batch.id
+
+    async def find(self, submission_id: str, since: float) -> Optional[str]:
+        # La lista va del más reciente al más antiguo
+        async for batch in self.client.batches.list(limit=100):
+            if batch.created_at < since:
+                break
+            if (getattr(batch, "metadata", None) or {}).get("submission_id") == submission_id:
+                return batch.id
+        return None
+
+    async def status(self, batch_id: str) -> BatchStatus:
+        batch = await self.client.batches.retrieve(batch_id)
+        return BatchStatus(batch_id, batch.status, batch.status in self.ended_statuses,
+                           _counts(getattr(batch, "request_counts", None)))
+
+    async def results(self, batch_id: str) -> List[BatchItemResult]:
+        batch = await self.client.batches.retrieve(batch_id)
+        items = []
+        # Las solicitudes fallidas van a un archivo de errores aparte
+        for file_id in (batch.output_file_id, getattr(batch, "error_file_id", None)):
+            if not file_id:
+                continue
+            content = await self.client.files.content(file_id)
+            for line in content.text.splitlines():
+                if line.strip():
+                    items.append(self._parse_line(json.loads(line)))
+        return items
+
+    def _parse_line(self, line: Dict[str, Any]) -> BatchItemResult:
+        response = line.get("response") or {}
+        body = response.get("body") or {}
+        if line.get("error") or response.get("status_code") != 200:
+            error = line.get("error") or body.get("error") or body
+            return BatchItemResult(line["custom_id"], error=json.dumps(error, ensure_ascii=False))
+        return BatchItemResult(
+            line["custom_id"],
+            text=body["choices"][0]["message"]["content"],
+            usage=usage_from_openai(_namespace(body.get("usage")))
+        )
+
+
+class AnthropicBatchBackend(BatchBackend):
+    """Anthropic Message Batches API (sin metadatos: ``find`` no localiza envíos interrumpidos)"""
+
+    provider = AIProvider.ANTHROPIC
+
+    def __init__(self, client: Any):
+        self.client = client
+
+    def request_line(self, custom_id: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        return {"custom_id": custom_id, "params": params}
+
+    async def submit(self, path: Path, submission_id: str) -> str:
+        with open(path, encoding="utf-8") as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+        batch = await self.client.messages.batches.create(requests=requests)
+        return batch.id
+
+    async def status(self, batch_id: str) -> BatchStatus:
+        batch = await self.client.messages.batches.retrieve(batch_id)
+        return BatchStatus(batch_id, batch.processing_status, batch.processing_status == "ended",
+                           _counts(getattr(batch, "request_counts", None)))
+
+    async def results(self, batch_id: str) -> List[BatchItemResult]:
+        items = []
+        async for entry in await self.client.messages.batches.results(batch_id):
+            result = entry.result
+            if result.type != "succeeded":
+                error = getattr(result, "error", None)
+                items.append(BatchItemResult(entry.custom_id, error=f"{result.type}: {error}" if error else result.type))
+                continue
+            message = result.message
+            text = "".join(block.text for block in message.content if getattr(block, "type", None) == "text")
+            items.append(BatchItemResult(entry.custom_id, text=text, usage=usage_from_anthropic(message.usage)))
+        return items
+
+
+def create_batch_backend(provider_type: AIProvider, provider_impl: AIProviderInterface) -> BatchBackend:
+    """Backend de lotes para el cliente de un proveedor del motor"""
+    client = getattr(provider_impl, "client", None)
+    if client is None:
+        raise RuntimeError(f"Proveedor {provider_type.value} no disponible")
+    if provider_type == AIProvider.OPENAI:
+        return OpenAIBatchBackend(client)
+    if provider_type == AIProvider.ANTHROPIC:
+        return AnthropicBatchBackend(client)
+    raise ValueError(f"Proveedor sin API de lotes: {provider_type.value}")
+
+
+class BulkExplanationJob:
+    """
+    Trabajo de explicaciones en lote, reanudable desde su archivo de estado.
+
+    Uso::
+
+        job = BulkExplanationJob(engine, "data/jobs/libro.json")
+        for page in pages:
+            job.add(page.text, context, key=page.name)
+        results = await job.run(poll_interval=60)
+
+    Crear el trabajo con la misma ruta en otro proceso retoma el estado:
+    los lotes ya enviados no se reenvían y los resultados ya recogidos no se
+    descargan de nuevo. Añadir un elemento ya registrado no lo duplica.
+    """
+
+    def __init__(self,
+                 engine: AIEngine,
+                 state_path: Union[str, Path],
+                 provider: AIProvider = AIProvider.AUTO,
+                 backend: Optional[BatchBackend] = None,
+                 max_requests_per_batch: int = DEFAULT_MAX_REQUESTS_PER_BATCH):
+        """
+        Inicializa o retoma el trabajo.
+
+        Args:
+            engine: Motor cuyos proveedores construyen las solicitudes
+            state_path: Archivo JSON de estado (los JSONL se escriben al lado)
+            provider: Proveedor a usar (AUTO = el mejor según el enrutador)
+            backend: API de lotes (por defecto la del proveedor elegido)
+            max_requests_per_batch: Solicitudes máximas por lote enviado
+        """
+        self.engine = engine
+        self.state_path = Path(state_path)
+        self.max_requests_per_batch = max_requests_per_batch
+
+        if self.state_path.exists():
+            with open(self.state_path, encoding="utf-8") as f:
+                self.state = json.load(f)
+            provider_type = AIProvider(self.state["provider"])
+            logger.info(f"Retomando trabajo de lotes {self.state_path} ({len(self.state['items'])} elementos)")
+        else:
+            if provider == AIProvider.AUTO:
+                provider_type = AIProvider(engine.router.rank([p.value for p in engine.providers], OPERATION)[0])
+            else:
+                provider_type = provider
+            self.state = {
+                "provider": provider_type.value,
+                "created_at": time.time(),
+                "items": [],  # [{"key", "custom_id"}] en orden de alta
+                "requests": {},  # custom_id -> estado, etiquetas, resultado o error
+                "batches": []  # [{"file", "custom_ids", "batch_id", "status", "collected"}]
+            }
+
+        self.provider_type = provider_type
+        self.provider_impl = engine.providers.get(provider_type)
+        self.backend = backend or create_batch_backend(provider_type, self.provider_impl)
+        self._pending: List[str] = [
+            custom_id for custom_id, request in self.state["requests"].items() if request["status"] == "new"
+        ]
+        self._params: Dict[str, Dict[str, Any]] = {}
+        self._known = {(item["key"], item["custom_id"]) for item in self.state["items"]}
+        self._added = 0
+
+    def add(self,
+            content: str,
+            context: Optional[AnalysisContext] = None,
+            key: Optional[str] = None) -> str:
+        """
+        Registra un contenido a explicar.
+
+        Args:
+            content: Contenido a explicar
+            context: Contexto de la explicación
+            key: Identificador del elemento (por defecto su posición)
+
+        Returns:
+            str: custom_id de la solicitud (igual para contenido y contexto iguales)
+        """
+        if context is None:
+            context = AnalysisContext(
+                education_level=EducationLevel.HIGH_SCHOOL,
+                style=ExplanationStyle.DETAILED
+            )
+        if self.provider_impl is None:
+            raise RuntimeError(f"Proveedor {self.provider_type.value} no disponible")
+
+        params = self.provider_impl._explanation_request(content, context)
+        # Identificador estable (formato válido en ambos proveedores: [a-zA-Z0-9_-]{1,64})
+        custom_id = "exp_" + calculate_bytes_hash(
+            json.dumps(params, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        )[:48]
+
+        key = key if key is not None else str(self._added)
+        self._added += 1
+        if (key, custom_id) not in self._known:
+            self._known.add((key, custom_id))
+            self.state["items"].append({"key": key, "custom_id": custom_id})
+
+        request = self.state["requests"].get(custom_id)
+        if request is None:
+            request = self.state["requests"][custom_id] = {
+                "status": "new",
+                "labels": self.engine._metric_labels(context)
+            }
+            self._pending.append(custom_id)
+        if request["status"] == "new":
+            self._params[custom_id] = params
+        return custom_id
+
+    async def submit(self) -> List[str]:
+        """
+        Escribe los JSONL de las solicitudes nuevas y envía los lotes aún no
+        enviados (incluidos los preparados antes de una interrupción).
+
+        Returns:
+            Lista de ids de los lotes enviados en esta llamada
+        """
+        pending = [c for c in self._pending if c in self._params]
+        for start in range(0, len(pending), self.max_requests_per_batch):
+            chunk = pending[start:start + self.max_requests_per_batch]
+            path = self.state_path.with_name(f"{self.state_path.stem}.batch{len(self.state['batches'])}.jsonl")
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                for custom_id in chunk:
+                    line = self.backend.request_line(custom_id, self._params.pop(custom_id))
+                    f.write(json.dumps(line, ensure_ascii=False) + "\n")
+            for custom_id in chunk:
+                self.state["requests"][custom_id]["status"] = "prepared"
+            self.state["batches"].append({
+                "file": path.name, "custom_ids": chunk, "batch_id": None, "status": None, "collected": False,
+                "submission_id": None, "submitting_at": None
+            })
+        self._pending = [c for c in self._pending if c in self._params]
+        if self._pending:
+            # Elementos añadidos en un proceso anterior y no escritos: deben añadirse de nuevo
+            logger.warning(f"{len(self._pending)} solicitudes sin parámetros; vuelve a añadirlas con add()")
+        self._save()
+
+        submitted = []
+        for batch in self.state["batches"]:
+            if batch["batch_id"] is not None:
+                continue
+            batch_id = None
+            if batch.get("submission_id") is not None:
+                # Envío interrumpido antes de guardar su id: puede que el lote exista
+                since = batch["submitting_at"] - SUBMISSION_CLOCK_SKEW
+                batch_id = await call_with_retry(
+                    lambda: self.backend.find(batch["submission_id"], since),
+                    self.engine.retry_policy
+                )
+                if batch_id is None:
+                    logger.warning(f"Lote {batch['file']} sin localizar tras un envío interrumpido; "
+                                   f"se reenvía (puede quedar duplicado en el proveedor)")
+                else:
+                    logger.info(f"Lote {batch_id} recuperado tras un envío interrumpido")
+            if batch_id is None:
+                batch["submission_id"] = uuid.uuid4().hex
+                batch["submitting_at"] = time.time()
+                batch["status"] = "submitting"
+                self._save()
+                batch_id = await self.backend.submit(self.state_path.with_name(batch["file"]), batch["submission_id"])
+            batch["batch_id"] = batch_id
+            batch["status"] = "submitted"
+            for custom_id in batch["custom_ids"]:
+                self.state["requests"][custom_id]["status"] = "submitted"
+            self._save()
+            submitted.append(batch["batch_id"])
+            logger.info(f"Lote {batch['batch_id']} enviado ({len(batch['custom_ids'])} solicitudes)")
+        return submitted
+
+    async def poll(self) -> bool:
+        """
+        Consulta los lotes en curso y recoge los resultados de los terminados.
+
+        Returns:
+            bool: True si todos los lotes enviados terminaron y se recogieron
+        """
+        policy = self.engine.retry_policy
+        for batch in self.state["batches"]:
+            if batch["batch_id"] is None or batch["collected"]:
+                continue
+            status = await call_with_retry(lambda: self.backend.status(batch["batch_id"]), policy)
+            batch["status"] = status.status
+            if status.ended:
+                items = await call_with_retry(lambda: self.backend.results(batch["batch_id"]), policy)
+                self._collect(batch, items)
+            self._save()
+        return all(batch["collected"] for batch in self.state["batches"] if batch["batch_id"] is not None)
+
+    async def wait(self, poll_interval: float = 60.0, timeout: Optional[float] = None) -> None:
+        """
+        Consulta hasta que todos los lotes terminen.
+
+        Raises:
+            DeadlineExceeded: Si se agota ``timeout``
+        """
+        with deadline(timeout):
+            while not await self.poll():
+                check_deadline()
+                await asyncio.sleep(poll_interval)
+
+    async def run(self, poll_interval: float = 60.0, timeout: Optional[float] = None) -> List[BatchExplanation]:
+        """Envía, espera y retorna los resultados en el orden de alta"""
+        await self.submit()
+        await self.wait(poll_interval, timeout)
+        return self.results()
+
+    def results(self) -> List[BatchExplanation]:
+        """
+        Resultados recogidos hasta ahora, en el orden de alta.
+
+        Los elementos aún sin resultado se omiten; los fallidos llevan el
+        error del proveedor.
+        """
+        results = []
+        for index, item in enumerate(self.state["items"]):
+            request = self.state["requests"][item["custom_id"]]
+            if request["status"] == "succeeded":
+                results.append(BatchExplanation(index=index, result=ExplanationResult.from_dict(request["result"])))
+            elif request["status"] == "errored":
+                results.append(BatchExplanation(index=index, error=RuntimeError(request["error"])))
+        return results
+
+    def results_by_key(self) -> Dict[str, BatchExplanation]:
+        """Resultados recogidos indexados por la clave de cada elemento"""
+        return {self.state["items"][r.index]["key"]: r for r in self.results()}
+
+    def get_statistics(self) -> Dict[str, Any]:
+        statuses: Dict[str, int] = {}
+        for request in self.state["requests"].values():
+            statuses[request["status"]] = statuses.get(request["status"], 0) + 1
+        return {
+            "provider": self.state["provider"],
+            "items": len(self.state["items"]),
+            "requests": statuses,
+            "batches": [{k: b[k] for k in ("batch_id", "status", "collected")} for b in self.state["batches"]]
+        }
+
+    def _collect(self, batch: Dict[str, Any], items: List[BatchItemResult]) -> None:
+        """Convierte los resultados de un lote en ExplanationResult y registra su uso"""
+        model = getattr(self.provider_impl, "model", None)
+        metrics = self.engine.metrics
+        received = set()
+
+        for item in items:
+            request = self.state["requests"].get(item.custom_id)
+            if request is None or request["status"] in ("succeeded", "errored"):
+                continue
+            received.add(item.custom_id)
+            labels = request["labels"]
+
+            if item.error is None:
+                # Sin JSON utilizable el parser da un marcador de posición: es un error
+                parsed = self.provider_impl._parse_explanation_result(item.text or "")
+                if not parsed.ok:
+                    item.error = "Respuesta sin JSON válido"
+
+            if item.error is not None:
+                request.update(status="errored", error=item.error)
+                metrics.increment("batch_requests", status="error", provider=self.provider_type.value, **labels)
+                continue
+
+            result = self.provider_impl._create_explanation_result(parsed.data, self.provider_type)
+            result.metadata["batch"] = {"batch_id": batch["batch_id"], "custom_id": item.custom_id}
+            request.update(status="succeeded", result=result.to_dict())
+            metrics.increment("batch_requests", status="ok", provider=self.provider_type.value, **labels)
+
+            if item.usage is not None:
+                self.engine._token_usage.add(self.provider_type.value, item.usage)
+                cost = BATCH_PRICE_FACTOR * estimate_cost(
+                    model, item.usage.input_tokens, item.usage.output_tokens, item.usage.cached_input_tokens
+                )
+                for name, value in (("input_tokens", item.usage.input_tokens),
+                                    ("cached_input_tokens", item.usage.cached_input_tokens),
+                                    ("output_tokens", item.usage.output_tokens),
+                                    ("cost_usd", cost)):
+                    metrics.increment(name, value, provider=self.provider_type.value,
+                                      operation=OPERATION, mode="batch", **labels)
+
+        # Solicitudes sin resultado (lote expirado o cancelado)
+        for custom_id in batch["custom_ids"]:
+            request = self.state["requests"][custom_id]
+            if custom_id not in received and request["status"] == "submitted":
+                request.update(status="errored", error=f"Sin resultado (lote {batch['status']})")
+
+        batch["collected"] = True
+        logger.info(f"Lote {batch['batch_id']} recogido ({len(received)} resultados)")
+
+    def _save(self) -> None:
+        """Escritura atómica del estado (un corte no deja el archivo a medias)"""
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_name(self.state_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
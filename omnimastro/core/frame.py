@@ -0,0 +1,141 @@
+"""
+Fotograma Compartido entre Analizadores
+
+Una captura se decodifica una sola vez y cada representación que piden los
+detectores (array RGB, escala de grises, mapa de bordes, niveles de la
+pirámide y copias reducidas) se calcula la primera vez que se pide y se
+reutiliza después, en lugar de que cada detector convierta y copie la
+imagen por su cuenta.
+"""
+
+import logging
+from functools import cached_property
+from typing import Dict, List, Tuple
+
+from PIL import Image, ImageMode
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    import cv2
+    CV2_AVAILABLE = NUMPY_AVAILABLE
+except ImportError:
+    CV2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Umbrales de Canny para el mapa de bordes
+CANNY_LOW = 50
+CANNY_HIGH = 150
+
+
+def _half(array: "np.ndarray") -> "np.ndarray":
+    """Reduce a la mitad (pyrDown, o media de bloques 2x2 sin OpenCV)"""
+    if CV2_AVAILABLE:
+        return cv2.pyrDown(array)
+    height, width = array.shape[0] // 2 * 2, array.shape[1] // 2 * 2
+    blocks = array[:height, :width].reshape(height // 2, 2, width // 2, 2)
+    return (blocks.mean(axis=(1, 3)) + 0.5).astype(np.uint8)
+
+
+class Frame:
+    """
+    Imagen decodificada con vistas calculadas bajo demanda.
+
+    Las vistas son arrays de solo lectura en la práctica: los detectores no
+    deben modificarlos, ya que se comparten.
+    """
+
+    def __init__(self, image: Image.Image):
+        """
+        Args:
+            image: Imagen PIL ya abierta
+        """
+        self.image = image
+        self._pyramid: List["np.ndarray"] = []
+        self._downscaled: Dict[int, "np.ndarray"] = {}
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """(ancho, alto)"""
+        return self.image.size
+
+    @property
+    def width(self) -> int:
+        return self.image.width
+
+    @property
+    def height(self) -> int:
+        return self.image.height
+
+    @cached_property
+    def size_bytes(self) -> int:
+        """Tamaño de los píxeles decodificados, sin serializarlos"""
+        if self.image.mode == "1":
+            return (self.width + 7) // 8 * self.height
+        descriptor = ImageMode.getmode(self.image.mode)
+        return self.width * self.height * len(descriptor.bands) * int(descriptor.typestr[-1])
+
+    @cached_property
+    def rgb(self) -> "np.ndarray":
+        """Array (alto, ancho, 3) uint8"""
+        image = self.image if self.image.mode == "RGB" else self.image.convert("RGB")
+        return np.asarray(image)
+
+    @cached_property
+    def gray(self) -> "np.ndarray":
+        """Array (alto, ancho) uint8 en escala de grises"""
+        if self.image.mode == "L":
+            return np.asarray(self.image)
+        if CV2_AVAILABLE and "rgb" in self.__dict__:
+            return cv2.cvtColor(self.rgb, cv2.COLOR_RGB2GRAY)
+        return np.asarray(self.image.convert("L"))
+
+    @cached_property
+    def gray_image(self) -> Image.Image:
+        """Escala de grises como imagen PIL (modo "L")"""
+        if self.image.mode == "L":
+            return self.image
+        return Image.fromarray(self.gray)
+
+    @cached_property
+    def edges(self) -> "np.ndarray":
+        """Mapa de bordes de Canny de la escala de grises"""
+        return cv2.Canny(self.gray, CANNY_LOW, CANNY_HIGH)
+
+    def pyramid(self, level: int) -> "np.ndarray":
+        """
+        Nivel de la pirámide de escala de grises (0 = tamaño original,
+        cada nivel la mitad del anterior).
+        """
+        if not self._pyramid:
+            self._pyramid.append(self.gray)
+        while len(self._pyramid) <= level:
+            self._pyramid.append(_half(self._pyramid[-1]))
+        return self._pyramid[level]
+
+    def downscaled(self, max_width: int) -> "np.ndarray":
+        """
+        Escala de grises reducida a ``max_width`` de ancho (sin ampliar).
+
+        Parte del nivel de la pirámide más pequeño que aún es más ancho que
+        ``max_width``, de modo que el remuestreo final es barato.
+        """
+        if self.width <= max_width:
+            return self.gray
+        small = self._downscaled.get(max_width)
+        if small is None:
+            level = 0
+            while self.width >> (level + 1) >= max_width:
+                level += 1
+            base = self.pyramid(level)
+            if not CV2_AVAILABLE:
+                return base
+            height = max(1, round(self.height * max_width / self.width))
+            small = self._downscaled[max_width] = cv2.resize(base, (max_width, height),
+                                                             interpolation=cv2.INTER_AREA)
+        return small
@@ -0,0 +1,145 @@
+"""
+Solicitudes Cubiertas (Hedging) entre Proveedores
+
+Si el proveedor principal no responde dentro de su latencia p90 observada,
+se envía la misma solicitud al proveedor alternativo y se usa la primera
+respuesta correcta. El número de solicitudes duplicadas queda acotado por
+un presupuesto proporcional al total de solicitudes.
+"""
+
+import logging
+import threading
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LatencyKey = Tuple[str, str]  # (proveedor, operación)
+
+
+class LatencyTracker:
+    """Ventana deslizante de latencias por proveedor y operación"""
+
+    def __init__(self, window: int = 200):
+        """
+        Args:
+            window: Número de muestras recientes conservadas por clave
+        """
+        self.window = window
+        self._samples: Dict[LatencyKey, Deque[float]] = defaultdict(lambda: deque(maxlen=self.window))
+        self._lock = threading.Lock()
+
+    def record(self, key: LatencyKey, seconds: float) -> None:
+        with self._lock:
+            self._samples[key].append(seconds)
+
+    def record_censored(self, key: LatencyKey, seconds: float, q: float) -> bool:
+        """
+        Registra la latencia de una llamada cancelada antes de terminar.
+
+        Solo se sabe que su latencia real es mayor que ``seconds``; se
+        registra únicamente si ya alcanza el cuantil ``q``, donde el valor
+        truncado no sesga la cola a la baja. Una cancelación temprana (p. ej.
+        el atajo del OCR) no aporta información y se descarta.
+
+        Returns:
+            bool: Si la muestra se registró
+        """
+        threshold = self.quantile(key, q)
+        if threshold is None or seconds < threshold:
+            return False
+        self.record(key, seconds)
+        return True
+
+    def count(self, key: LatencyKey) -> int:
+        with self._lock:
+            return len(self._samples.get(key, ()))
+
+    def quantile(self, key: LatencyKey, q: float) -> Optional[float]:
+        """
+        Cuantil de la latencia reciente.
+
+        Returns:
+            float: Segundos, o None si no hay muestras
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(q * len(samples)))
+        return samples[index]
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            keys = list(self._samples)
+        return {
+            f"{provider}.{operation}": {
+                "samples": self.count((provider, operation)),
+                "p50": self.quantile((provider, operation), 0.5),
+                "p90": self.quantile((provider, operation), 0.9)
+            }
+            for provider, operation in keys
+        }
+
+
+@dataclass
+class HedgingPolicy:
+    """Configuración del hedging (opt-in en AIEngine)"""
+    quantile: float = 0.9  # Latencia del principal tras la que se duplica la solicitud
+    budget_ratio: float = 0.1  # Máximo de solicitudes duplicadas / solicitudes totales
+    min_samples: int = 20  # Muestras necesarias antes de cubrir una operación
+    min_delay: float = 0.05  # Espera mínima antes de duplicar (segundos)
+    operations: Tuple[str, ...] = ("analyze_image", "generate_explanation", "enhance_explanation")
+
+
+class HedgingController:
+    """Decide cuándo cubrir una solicitud y lleva el presupuesto y estadísticas"""
+
+    def __init__(self, policy: HedgingPolicy, tracker: LatencyTracker):
+        self.policy = policy
+        self.tracker = tracker
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+            "primary_wins": 0,
+            "budget_exhausted": 0
+        }
+
+    def hedge_delay(self, key: LatencyKey) -> Optional[float]:
+        """
+        Registra una solicitud elegible y retorna la espera antes de cubrirla.
+
+        Returns:
+            float: Segundos a esperar al principal, o None si no se cubre
+        """
+        with self._lock:
+            self._stats["requests"] += 1
+
+        if key[1] not in self.policy.operations or self.tracker.count(key) < self.policy.min_samples:
+            return None
+
+        delay = self.tracker.quantile(key, self.policy.quantile)
+        return max(self.policy.min_delay, delay) if delay is not None else None
+
+    def try_spend(self) -> bool:
+        """Consume presupuesto para una solicitud duplicada si queda"""
+        with self._lock:
+            if self._stats["hedged"] + 1 > self.policy.budget_ratio * self._stats["requests"]:
+                self._stats["budget_exhausted"] += 1
+                return False
+            self._stats["hedged"] += 1
+            return True
+
+    def record_winner(self, hedge: bool) -> None:
+        with self._lock:
+            self._stats["hedge_wins" if hedge else "primary_wins"] += 1
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["hedge_ratio"] = stats["hedged"] / stats["requests"] if stats["requests"] else 0.0
+        stats["latency"] = self.tracker.get_statistics()
+        return stats
@@ -0,0 +1,72 @@
+"""
+Pool de Conexiones HTTP Compartido
+
+Crea el ``httpx.AsyncClient`` que comparten los SDK de OpenAI y Anthropic:
+límites de conexiones ajustados, keep-alive y HTTP/2 cuando el paquete
+``h2`` está instalado. Reutilizar un único cliente evita pagar el handshake
+TLS y la construcción del cliente en cada solicitud.
+"""
+
+import importlib.util
+import logging
+from dataclasses import dataclass
+from typing import Any, Optional
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+@dataclass
+class HTTPPoolConfig:
+    """Ajustes del pool de conexiones"""
+    max_connections: int = 64
+    max_keepalive_connections: int = 32
+    keepalive_expiry: float = 60.0  # Segundos que una conexión ociosa sigue abierta
+    connect_timeout: float = 10.0
+    read_timeout: float = 120.0  # El análisis de visión puede tardar
+    write_timeout: float = 30.0
+    pool_timeout: float = 30.0  # Espera máxima por una conexión libre
+    http2: bool = True  # Solo se activa si 'h2' está instalado
+
+
+def create_http_client(config: Optional[HTTPPoolConfig] = None) -> Optional[Any]:
+    """
+    Crea el cliente HTTP asíncrono compartido.
+
+    Args:
+        config: Ajustes del pool (por defecto HTTPPoolConfig())
+
+    Returns:
+        httpx.AsyncClient, o None si httpx no está instalado (los SDK crean
+        entonces su propio cliente)
+    """
+    if not HTTPX_AVAILABLE:
+        logger.info("httpx no instalado; cada proveedor usará su propio cliente HTTP")
+        return None
+
+    config = config or HTTPPoolConfig()
+    http2 = config.http2 and HTTP2_AVAILABLE
+    if config.http2 and not HTTP2_AVAILABLE:
+        logger.info("Paquete 'h2' no instalado; usando HTTP/1.1 con keep-alive")
+
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_expiry=config.keepalive_expiry
+        ),
+        timeout=httpx.Timeout(
+            connect=config.connect_timeout,
+            read=config.read_timeout,
+            write=config.write_timeout,
+            pool=config.pool_timeout
+        )
+    )
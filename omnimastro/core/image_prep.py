@@ -0,0 +1,223 @@
+"""
+Preparación de Imágenes para Proveedores de Visión
+
+Reduce el tamaño de la carga enviada a OpenAI/Anthropic antes de
+codificarla en base64:
+- Detecta el formato real por sus bytes mágicos
+- Recorta bordes uniformes (barras, márgenes vacíos)
+- Redimensiona a la resolución que el proveedor usa internamente
+- Re-codifica (PNG para capturas con pocos colores, JPEG para el resto)
+"""
+
+import logging
+import math
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    from PIL import Image, ImageChops
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Resoluciones óptimas por proveedor:
+# - OpenAI (detail high): cabe en 2048x2048 y el lado corto se lleva a 768
+# - Anthropic: lado largo <= 1568 px y ~1.15 MP sin re-escalado en servidor
+PROVIDER_IMAGE_TARGETS: Dict[str, Dict[str, Any]] = {
+    "openai": {"max_side": 2048, "short_side": 768, "detail": "high"},
+    "anthropic": {"max_side": 1568, "max_pixels": 1_150_000},
+}
+
+MEDIA_TYPES = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "gif": "image/gif",
+    "webp": "image/webp",
+}
+
+
+@dataclass
+class PreparedImage:
+    """Imagen lista para enviar a un proveedor"""
+    data: bytes
+    media_type: str
+    width: int
+    height: int
+    original_bytes: int
+    original_format: Optional[str]
+    detail: Optional[str] = None
+    provider: Optional[str] = None
+
+    @property
+    def estimated_tokens(self) -> Optional[int]:
+        """Tokens de entrada que el proveedor cobrará por la imagen"""
+        return estimate_image_tokens(self.provider, self.width, self.height)
+
+    @property
+    def prepared_bytes(self) -> int:
+        return len(self.data)
+
+    def report(self) -> Dict[str, Any]:
+        """Resumen del tamaño antes/después para metadata"""
+        return {
+            "original_bytes": self.original_bytes,
+            "prepared_bytes": self.prepared_bytes,
+            "reduction": 1 - self.prepared_bytes / self.original_bytes if self.original_bytes else 0.0,
+            "original_format": self.original_format,
+            "media_type": self.media_type,
+            "width": self.width,
+            "height": self.height,
+            "estimated_tokens": self.estimated_tokens
+        }
+
+
+def detect_image_format(data: bytes) -> Optional[str]:
+    """
+    Detecta el formato de imagen por sus bytes mágicos.
+
+    Args:
+        data: Bytes de la imagen
+
+    Returns:
+        str: 'png', 'jpeg', 'gif', 'webp' o None si no se reconoce
+    """
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    if data[:3] == b"\xff\xd8\xff":
+        return "jpeg"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def estimate_image_tokens(provider: Optional[str], width: int, height: int) -> Optional[int]:
+    """
+    Estima los tokens de una imagen según la fórmula de cada proveedor.
+
+    - OpenAI (detail high): 85 + 170 por cada tesela de 512x512
+    - Anthropic: ancho * alto / 750
+
+    Returns:
+        int: Tokens estimados, o None si se desconoce el tamaño o el proveedor
+    """
+    if not width or not height:
+        return None
+    if provider == "openai":
+        tiles = math.ceil(width / 512) * math.ceil(height / 512)
+        return 85 + 170 * tiles
+    if provider == "anthropic":
+        return math.ceil(width * height / 750)
+    return None
+
+
+def _crop_uniform_border(image: "Image.Image", tolerance: int = 12) -> "Image.Image":
+    """Recorta el borde del color de la esquina superior izquierda"""
+    background = Image.new(image.mode, image.size, image.getpixel((0, 0)))
+    diff = ImageChops.difference(image, background).convert("L")
+    bbox = diff.point(lambda x: 255 if x > tolerance else 0).getbbox()
+
+    if bbox and bbox != (0, 0) + image.size:
+        return image.crop(bbox)
+    return image
+
+
+def _target_size(width: int, height: int, target: Dict[str, Any]) -> Tuple[int, int]:
+    """Calcula el tamaño final (nunca amplía)"""
+    scale = min(1.0, target["max_side"] / max(width, height))
+
+    if "short_side" in target:
+        scale = min(scale, target["short_side"] / min(width, height))
+    if "max_pixels" in target:
+        scale = min(scale, (target["max_pixels"] / (width * height)) ** 0.5)
+
+    size = max(1, round(width * scale)), max(1, round(height * scale))
+    if "max_pixels" in target and size[0] * size[1] > target["max_pixels"]:
+        # El redondeo no debe pasarse del límite de píxeles
+        size = max(1, math.floor(width * scale)), max(1, math.floor(height * scale))
+    return size
+
+
+def prepare_image(image_data: bytes,
+                  provider: str,
+                  jpeg_quality: int = 85,
+                  crop_borders: bool = True) -> PreparedImage:
+    """
+    Prepara una imagen para un proveedor de visión.
+
+    Args:
+        image_data: Bytes originales de la imagen
+        provider: 'openai' o 'anthropic'
+        jpeg_quality: Calidad JPEG para imágenes fotográficas
+        crop_borders: Si se recortan bordes uniformes
+
+    Returns:
+        PreparedImage: Datos a enviar y tamaño antes/después
+    """
+    original_format = detect_image_format(image_data)
+    target = PROVIDER_IMAGE_TARGETS[provider]
+    passthrough = PreparedImage(
+        data=image_data,
+        media_type=MEDIA_TYPES.get(original_format, "image/jpeg"),
+        width=0,
+        height=0,
+        original_bytes=len(image_data),
+        original_format=original_format,
+        detail=target.get("detail"),
+        provider=provider
+    )
+
+    if not PIL_AVAILABLE:
+        return passthrough
+
+    try:
+        image = Image.open(BytesIO(image_data))
+        image.load()
+        passthrough.width, passthrough.height = image.size
+
+        if image.mode in ("RGBA", "LA", "P"):
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.split()[-1])
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        if crop_borders:
+            image = _crop_uniform_border(image)
+
+        size = _target_size(image.width, image.height, target)
+        if size != image.size:
+            image = image.resize(size, Image.LANCZOS)
+
+        # Capturas de UI suelen tener pocos colores: PNG es más pequeño y nítido
+        buffer = BytesIO()
+        if image.getcolors(256) is not None:
+            image.save(buffer, format="PNG", optimize=True)
+            fmt = "png"
+        else:
+            image.save(buffer, format="JPEG", quality=jpeg_quality, optimize=True)
+            fmt = "jpeg"
+        data = buffer.getvalue()
+
+        # El proveedor re-escala por su cuenta: si no ahorramos bytes, enviar el original
+        if len(data) >= len(image_data) and original_format in MEDIA_TYPES:
+            return passthrough
+
+        return PreparedImage(
+            data=data,
+            media_type=MEDIA_TYPES[fmt],
+            width=image.width,
+            height=image.height,
+            original_bytes=len(image_data),
+            original_format=original_format,
+            detail=target.get("detail"),
+            provider=provider
+        )
+
+    except Exception as e:
+        logger.warning(f"No se pudo preparar la imagen ({e}). Enviando original.")
+        return passthrough
@@ -0,0 +1,233 @@
+"""
+Parser JSON Incremental
+
+Procesa el objeto JSON de una respuesta en streaming a medida que llegan
+los fragmentos del proveedor. Emite el texto de los campos de tipo string
+del nivel superior (``summary``, ``content``...) en cuanto aparece y el
+valor completo de los demás campos (listas, números) al cerrarse.
+
+Es tolerante: ignora texto previo al objeto (por ejemplo una valla
+```json) y no falla si el stream termina a mitad de un valor.
+"""
+
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+# Sustituto de un surrogate UTF-16 sin pareja (como json.loads con errores)
+_REPLACEMENT = "\ufffd"
+
+
+@dataclass
+class StreamEvent:
+    """Evento del parser"""
+    kind: str  # 'delta' (texto nuevo de un string) o 'value' (campo completo)
+    field: str
+    text: str = ""
+    value: Any = None
+
+
+class StreamingJSONParser:
+    """Parser de un objeto JSON de nivel superior alimentado por fragmentos"""
+
+    def __init__(self):
+        self.values: Dict[str, Any] = {}
+        self._state = "seek_object"
+        self._key: List[str] = []
+        self._field: Optional[str] = None
+        self._string: List[str] = []
+        self._escape: Optional[str] = None
+        self._high_surrogate: Optional[int] = None  # Mitad alta de un par \\uD83D\\uDE00 pendiente
+        self._raw: List[str] = []
+        self._depth = 0
+        self._raw_in_string = False
+        self._raw_escape = False
+
+    @property
+    def done(self) -> bool:
+        return self._state == "done"
+
+    def feed(self, chunk: str) -> List[StreamEvent]:
+        """
+        Procesa un fragmento.
+
+        Args:
+            chunk: Texto recibido del proveedor
+
+        Returns:
+            Lista de eventos producidos por el fragmento
+        """
+        events: List[StreamEvent] = []
+        delta: List[str] = []
+
+        for char in chunk:
+            state = self._state
+
+            if state == "seek_object":
+                if char == "{":
+                    self._state = "seek_key"
+
+            elif state == "seek_key":
+                if char == '"':
+                    self._key = []
+                    self._state = "key"
+                elif char == "}":
+                    self._state = "done"
+
+            elif state == "key":
+                if char == "\\" and self._escape is None:
+                    self._escape = ""
+                elif self._escape is not None:
+                    self._key.append(_ESCAPES.get(char, char))
+                    self._escape = None
+                elif char == '"':
+                    self._field = "".join(self._key)
+                    self._state = "colon"
+                else:
+                    self._key.append(char)
+
+            elif state == "colon":
+                if char == ":":
+                    self._state = "seek_value"
+
+            elif state == "seek_value":
+                if char == '"':
+                    self._string = []
+                    self._high_surrogate = None
+                    self._state = "string"
+                elif not char.isspace():
+                    self._raw = [char]
+                    self._depth = 1 if char in "[{" else 0
+                    self._raw_in_string = False
+                    self._raw_escape = False
+                    self._state = "raw"
+
+            elif state == "string":
+                text = self._consume_string_char(char)
+                if text is None:
+                    tail = self._flush_surrogate()
+                    if tail:
+                        self._string.append(tail)
+                        delta.append(tail)
+                    if delta:
+                        events.append(StreamEvent("delta", self._field, text="".join(delta)))
+                        delta = []
+                    value = "".join(self._string)
+                    self.values[self._field] = value
+                    events.append(StreamEvent("value", self._field, value=value))
+                    self._state = "after_value"
+                elif text:
+                    self._string.append(text)
+                    delta.append(text)
+
+            elif state == "raw":
+                if self._consume_raw_char(char):
+                    events.extend(self._finish_raw())
+                    self._state = "done" if char == "}" else "seek_key"
+
+            elif state == "after_value":
+                if char == ",":
+                    self._state = "seek_key"
+                elif char == "}":
+                    self._state = "done"
+
+        if delta:
+            events.append(StreamEvent("delta", self._field, text="".join(delta)))
+        return events
+
+    def close(self) -> Dict[str, Any]:
+        """
+        Finaliza el stream y retorna los campos obtenidos. Si quedó un valor
+        a medias (respuesta truncada), conserva lo que pueda recuperarse.
+        """
+        if self._state == "string":
+            self.values[self._field] = "".join(self._string) + self._flush_surrogate()
+        elif self._state == "raw":
+            self._finish_raw()
+        return self.values
+
+    def _consume_string_char(self, char: str) -> Optional[str]:
+        """Retorna el texto decodificado ('' si aún incompleto) o None al cerrar"""
+        if self._escape is not None:
+            if self._escape == "" and char != "u":
+                self._escape = None
+                return self._flush_surrogate() + _ESCAPES.get(char, char)
+            self._escape += char
+            if len(self._escape) == 5:  # 'u' + 4 dígitos hexadecimales
+                code = self._escape[1:]
+                self._escape = None
+                try:
+                    return self._decode_code_unit(int(code, 16))
+                except ValueError:
+                    return self._flush_surrogate()
+            return ""
+
+        if char == "\\":
+            self._escape = ""
+            return ""
+        if char == '"':
+            return None
+        return self._flush_surrogate() + char
+
+    def _decode_code_unit(self, unit: int) -> str:
+        """
+        Decodifica una unidad UTF-16 de un escape \\uXXXX. Los caracteres
+        fuera del plano básico (emoji, algunos símbolos matemáticos) llegan
+        como par de surrogates: la mitad alta se retiene hasta la baja.
+        """
+        if 0xD800 <= unit <= 0xDBFF:
+            pending = self._flush_surrogate()
+            self._high_surrogate = unit
+            return pending
+        if 0xDC00 <= unit <= 0xDFFF:
+            if self._high_surrogate is None:
+                return _REPLACEMENT
+            high, self._high_surrogate = self._high_surrogate, None
+            return chr(0x10000 + ((high - 0xD800) << 10) + (unit - 0xDC00))
+        return self._flush_surrogate() + chr(unit)
+
+    def _flush_surrogate(self) -> str:
+        """Descarta una mitad alta sin pareja, sustituyéndola"""
+        if self._high_surrogate is None:
+            return ""
+        self._high_surrogate = None
+        return _REPLACEMENT
+
+    def _consume_raw_char(self, char: str) -> bool:
+        """Acumula un valor no string; retorna True cuando termina (en , o })"""
+        if self._raw_in_string:
+            self._raw.append(char)
+            if self._raw_escape:
+                self._raw_escape = False
+            elif char == "\\":
+                self._raw_escape = True
+            elif char == '"':
+                self._raw_in_string = False
+            return False
+
+        if self._depth == 0 and char in ",}":
+            return True
+
+        self._raw.append(char)
+        if char == '"':
+            self._raw_in_string = True
+        elif char in "[{":
+            self._depth += 1
+        elif char in "]}":
+            self._depth -= 1
+        return False
+
+    def _finish_raw(self) -> List[StreamEvent]:
+        raw = "".join(self._raw).strip()
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            logger.debug(f"Valor JSON incompleto para '{self._field}': {raw[:50]}")
+            return []
+        self.values[self._field] = value
+        return [StreamEvent("value", self._field, value=value)]
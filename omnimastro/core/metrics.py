@@ -0,0 +1,168 @@
+"""
+Métricas en Proceso
+
+Contadores e histogramas de buckets logarítmicos (estilo HDR: error
+relativo acotado en todo el rango) etiquetados por proveedor, operación,
+nivel educativo y estilo. Se registran desde el event loop, por lo que no
+usan locks; ``snapshot`` y ``render_prometheus`` leen copias.
+"""
+
+import math
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+class LogHistogram:
+    """
+    Histograma con buckets de anchura relativa constante.
+
+    Un valor v > 0 cae en el bucket floor(log(v) / log(1 + 2e)), de modo que
+    cualquier cuantil se reporta con un error relativo máximo ``e``.
+    """
+
+    def __init__(self, relative_error: float = 0.01):
+        self.relative_error = relative_error
+        self._log_base = math.log1p(2 * relative_error)
+        self._buckets: Dict[int, int] = {}
+        self._zero = 0
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+        if value <= 0:
+            self._zero += 1
+            return
+        index = math.floor(math.log(value) / self._log_base)
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Valor del cuantil q (0-1), o None si no hay muestras"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1) + 1
+        seen = self._zero
+        if seen >= rank:
+            return 0.0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen >= rank:
+                # Punto medio geométrico del bucket
+                return min(self.max, math.exp((index + 0.5) * self._log_base))
+        return self.max
+
+    def summary(self, quantiles: Iterable[float] = DEFAULT_QUANTILES) -> Dict[str, Any]:
+        stats = {"count": self.count, "sum": self.sum, "max": self.max}
+        for q in quantiles:
+            stats[f"p{q * 100:g}"] = self.quantile(q)
+        return stats
+
+
+class MetricsStore:
+    """Registro de contadores e histogramas etiquetados"""
+
+    def __init__(self, relative_error: float = 0.01):
+        self.relative_error = relative_error
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], LogHistogram] = {}
+
+    def increment(self, name: str, value: float = 1, **labels: Any) -> None:
+        """Suma al contador ``name`` con las etiquetas dadas"""
+        key = (name, _labels(labels))
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        """Registra una muestra en el histograma ``name``"""
+        key = (name, _labels(labels))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = LogHistogram(self.relative_error)
+        histogram.record(value)
+
+    def counter_total(self, name: str, **labels: Any) -> float:
+        """Total de un contador sobre las series que contienen las etiquetas dadas"""
+        wanted = set(_labels(labels))
+        return sum(v for (n, l), v in list(self._counters.items()) if n == name and wanted <= set(l))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Copia serializable de todas las series"""
+        def series_name(name: str, labels: Labels) -> str:
+            if not labels:
+                return name
+            return name + "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
+
+        return {
+            "counters": {series_name(n, l): v for (n, l), v in list(self._counters.items())},
+            "histograms": {series_name(n, l): h.summary() for (n, l), h in list(self._histograms.items())}
+        }
+
+    def reset(self) -> None:
+        self._counters = {}
+        self._histograms = {}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    labels = list(labels)
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def render_prometheus(store: MetricsStore,
+                      prefix: str = "omnimastro",
+                      quantiles: Iterable[float] = DEFAULT_QUANTILES) -> str:
+    """
+    Exporta las métricas en el formato de texto de Prometheus.
+
+    Los contadores se exportan como ``counter`` (sufijo _total) y los
+    histogramas como ``summary`` con sus cuantiles, _sum y _count.
+
+    Args:
+        store: Registro de métricas
+        prefix: Prefijo de los nombres de métrica
+        quantiles: Cuantiles exportados por histograma
+
+    Returns:
+        str: Texto listo para servir en /metrics
+    """
+    lines: List[str] = []
+
+    counters: Dict[str, List[Tuple[Labels, float]]] = {}
+    for (name, labels), value in list(store._counters.items()):
+        counters.setdefault(name, []).append((labels, value))
+    for name in sorted(counters):
+        metric = f"{prefix}_{name}_total"
+        lines.append(f"# TYPE {metric} counter")
+        for labels, value in sorted(counters[name]):
+            lines.append(f"{metric}{_format_labels(labels)} {value:g}")
+
+    histograms: Dict[str, List[Tuple[Labels, LogHistogram]]] = {}
+    for (name, labels), histogram in list(store._histograms.items()):
+        histograms.setdefault(name, []).append((labels, histogram))
+    for name in sorted(histograms):
+        metric = f"{prefix}_{name}"
+        lines.append(f"# TYPE {metric} summary")
+        for labels, histogram in sorted(histograms[name], key=lambda item: item[0]):
+            for q in quantiles:
+                value = histogram.quantile(q)
+                q_labels = labels + (("quantile", f"{q:g}"),)
+                lines.append(f"{metric}{_format_labels(q_labels)} {value if value is not None else 'NaN'}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.sum:g}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {histogram.count}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,302 @@
+"""
+Backends OCR y pool de workers persistentes
+
+Mantiene N workers de Tesseract "calientes" para no pagar en cada llamada
+el arranque del proceso y la carga de traineddata (eng+spa). Si está
+instalado ``tesserocr`` cada worker conserva su propia instancia de la
+C-API inicializada; si no, se usa ``pytesseract`` (un proceso por llamada)
+con la misma cola acotada para limitar la concurrencia.
+
+Con varios workers cada proceso tesseract se lanza con OMP_THREAD_LIMIT=1
+(solo en su entorno, sin tocar el del proceso anfitrión) para que no
+compitan por los núcleos. tesserocr corre dentro del proceso y su runtime
+OpenMP lee el límite al cargarse: ahí manda el entorno del anfitrión.
+"""
+
+import functools
+import logging
+import os
+import queue
+import re
+import shlex
+import subprocess
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from io import BytesIO
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .ocr_result import OCRResult, run_image_to_data
+
+try:
+    import tesserocr
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# PSM por defecto (bloque de texto uniforme)
+DEFAULT_PSM = 6
+
+# Región (x, y, ancho, alto) dentro de la imagen
+Rect = Tuple[int, int, int, int]
+
+_PSM_PATTERN = re.compile(r'--psm\s+(\d+)')
+
+
+def parse_psm(config: str, default: int = DEFAULT_PSM) -> int:
+    """
+    Extrae el Page Segmentation Mode de una configuración de Tesseract.
+
+    Args:
+        config: Cadena de configuración (ej: '--psm 6')
+        default: PSM si no se especifica
+
+    Returns:
+        int: PSM
+    """
+    match = _PSM_PATTERN.search(config or "")
+    return int(match.group(1)) if match else default
+
+
+class OCRBackend(ABC):
+    """Interfaz de un backend capaz de ejecutar una pasada image_to_data"""
+
+    name = "base"
+
+    @abstractmethod
+    def image_to_data(self, image: Any, lang: str, config: str, rect: Optional[Rect] = None) -> OCRResult:
+        """Reconoce la imagen (o solo la región ``rect``) y retorna el resultado unificado"""
+        pass
+
+    def close(self) -> None:
+        """Libera los recursos del backend"""
+        pass
+
+
+class PytesseractBackend(OCRBackend):
+    """Backend basado en pytesseract (lanza un proceso por llamada)"""
+
+    name = "pytesseract"
+
+    def __init__(self, thread_limit: Optional[int] = None):
+        """
+        Args:
+            thread_limit: OMP_THREAD_LIMIT de cada proceso tesseract (None = heredar)
+        """
+        self._env: Optional[Dict[str, str]] = None
+        if thread_limit is not None:
+            self._env = {**os.environ, "OMP_THREAD_LIMIT": str(thread_limit)}
+
+    def _run(self, image: Any, lang: str, config: str) -> OCRResult:
+        if self._env is None:
+            return run_image_to_data(image, lang, config)
+
+        # pytesseract no admite un entorno por llamada: se invoca el mismo
+        # ejecutable con la misma salida TSV que image_to_data
+        import pytesseract
+
+        buffer = BytesIO()
+        image.save(buffer, format="PNG")
+        command = [pytesseract.pytesseract.tesseract_cmd, "stdin", "stdout", "-l", lang,
+                   *shlex.split(config or ""), "tsv"]
+        completed = subprocess.run(command, input=buffer.getvalue(), capture_output=True, env=self._env)
+        if completed.returncode != 0:
+            raise RuntimeError(f"tesseract terminó con código {completed.returncode}: "
+                               f"{completed.stderr.decode('utf-8', 'replace').strip()}")
+        return OCRResult.from_tsv(completed.stdout.decode("utf-8", "replace"))
+
+    def image_to_data(self, image: Any, lang: str, config: str, rect: Optional[Rect] = None) -> OCRResult:
+        if rect is None:
+            return self._run(image, lang, config)
+
+        x, y, w, h = rect
+        result = self._run(image.crop((x, y, x + w, y + h)), lang, config)
+        # Coordenadas en la imagen completa, como con SetRectangle
+        for word in result.words:
+            word.left += x
+            word.top += y
+        return result
+
+
+class TesserocrBackend(OCRBackend):
+    """Backend con la C-API de Tesseract residente en memoria"""
+
+    name = "tesserocr"
+
+    def __init__(self, lang: str, psm: int = DEFAULT_PSM):
+        self._lang = lang
+        self._api = tesserocr.PyTessBaseAPI(lang=lang, psm=psm)
+        self._image: Any = None  # Última imagen cargada con SetImage
+
+    def image_to_data(self, image: Any, lang: str, config: str, rect: Optional[Rect] = None) -> OCRResult:
+        if lang != self._lang:
+            # Cambiar idioma obliga a recargar traineddata
+            self._api.Init(lang=lang)
+            self._lang = lang
+            self._image = None
+
+        self._api.SetPageSegMode(parse_psm(config))
+        if image is not self._image:
+            # Varias regiones de la misma imagen reutilizan la copia ya cargada
+            self._api.SetImage(image)
+            self._image = image
+        if rect is not None:
+            self._api.SetRectangle(*rect)
+        else:
+            self._api.SetRectangle(0, 0, image.width, image.height)
+        self._api.Recognize()
+        return OCRResult.from_tsv(self._api.GetTSVText(0))
+
+    def close(self) -> None:
+        self._image = None
+        self._api.End()
+
+
+def create_backend(lang: str, config: str = "", thread_limit: Optional[int] = None) -> OCRBackend:
+    """
+    Crea el backend más rápido disponible.
+
+    Args:
+        lang: Idiomas en formato Tesseract (ej: 'eng+spa')
+        config: Configuración por defecto (para el PSM inicial)
+        thread_limit: OMP_THREAD_LIMIT de los procesos tesseract (solo pytesseract)
+
+    Returns:
+        OCRBackend: tesserocr si está instalado, si no pytesseract
+    """
+    if TESSEROCR_AVAILABLE:
+        try:
+            return TesserocrBackend(lang, parse_psm(config))
+        except Exception as e:
+            logger.warning(f"No se pudo inicializar tesserocr ({e}). Usando pytesseract.")
+    return PytesseractBackend(thread_limit)
+
+
+class OCRWorkerPool:
+    """
+    Pool de workers OCR persistentes alimentado por una cola acotada.
+
+    Cada worker es un hilo que crea su backend una sola vez y lo reutiliza
+    para todas las peticiones. tesserocr y los subprocesos de pytesseract
+    liberan el GIL, por lo que los hilos reconocen en paralelo.
+    """
+
+    def __init__(self,
+                 lang: str,
+                 config: str = "--psm 6",
+                 workers: Optional[int] = None,
+                 max_queue: int = 64,
+                 backend_factory: Optional[Callable[[str, str], OCRBackend]] = None):
+        """
+        Inicializa el pool y arranca los workers.
+
+        Args:
+            lang: Idiomas por defecto (ej: 'eng+spa')
+            config: Configuración por defecto de Tesseract
+            workers: Número de workers (por defecto, núcleos disponibles)
+            max_queue: Tamaño máximo de la cola; submit bloquea si está llena
+            backend_factory: Constructor de backends (por defecto create_backend,
+                con un hilo OpenMP por proceso tesseract si hay varios workers)
+        """
+        self.lang = lang
+        self.config = config
+        self.workers = workers or os.cpu_count() or 2
+        self._thread_limit = 1 if self.workers > 1 else None
+        self._backend_factory = backend_factory or functools.partial(create_backend, thread_limit=self._thread_limit)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._threads: List[threading.Thread] = []
+        self._ready = threading.Barrier(self.workers + 1)  # Todos los backends creados
+        self._closed = False
+        self.backend_name = "unknown"
+
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._worker_loop,
+                name=f"ocr-worker-{i}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+        self._ready.wait()
+        logger.info(f"OCRWorkerPool iniciado: {self.workers} workers ({self.backend_name}, {lang})")
+
+    def _worker_loop(self) -> None:
+        """Bucle de un worker: atiende peticiones con su backend residente"""
+        try:
+            backend = self._backend_factory(self.lang, self.config)
+        except Exception as e:
+            logger.error(f"Error creando backend OCR: {e}. Usando pytesseract.")
+            backend = PytesseractBackend(self._thread_limit)
+        self.backend_name = backend.name
+        self._ready.wait()
+
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+
+                future, image, lang, config, rect = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(backend.image_to_data(image, lang, config, rect))
+                except Exception as e:
+                    future.set_exception(e)
+        finally:
+            backend.close()
+
+    def submit(self,
+               image: Any,
+               lang: Optional[str] = None,
+               config: Optional[str] = None,
+               timeout: Optional[float] = None,
+               rect: Optional[Rect] = None) -> Future:
+        """
+        Encola una imagen para OCR.
+
+        Args:
+            image: Imagen PIL
+            lang: Idiomas (por defecto los del pool)
+            config: Configuración de Tesseract (por defecto la del pool)
+            timeout: Segundos máximos esperando hueco en la cola
+            rect: Región (x, y, ancho, alto) a reconocer (por defecto toda la imagen)
+
+        Returns:
+            Future: Se resuelve con un OCRResult
+
+        Raises:
+            queue.Full: Si la cola sigue llena tras ``timeout``
+        """
+        if self._closed:
+            raise RuntimeError("OCRWorkerPool cerrado")
+
+        future: Future = Future()
+        self._queue.put(
+            (future, image, lang or self.lang, config if config is not None else self.config, rect),
+            timeout=timeout
+        )
+        return future
+
+    def image_to_data(self,
+                      image: Any,
+                      lang: Optional[str] = None,
+                      config: Optional[str] = None,
+                      timeout: Optional[float] = None,
+                      rect: Optional[Rect] = None) -> OCRResult:
+        """Versión bloqueante de submit"""
+        return self.submit(image, lang, config, timeout, rect).result(timeout)
+
+    def close(self) -> None:
+        """Detiene los workers y libera sus backends"""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        logger.info("OCRWorkerPool detenido")
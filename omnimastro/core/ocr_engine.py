@@ -3,17 +3,178 @@ Motor OCR de OmniMaestro
 
 Integración con Tesseract OCR para extracción de texto de imágenes.
 Soporta múltiples idiomas y optimización de procesamiento.
+
+Las imágenes se aceptan como ruta, ``PIL.Image``, bytes codificados
+(``bytes``/``bytearray``/``memoryview``) o arrays NumPy; todo el
+procesamiento ocurre en memoria, sin archivos temporales.
 """
 
+import bisect
 import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, List, Dict, Tuple
-from PIL import Image
+from typing import Any, Callable, Optional, List, Dict, Sequence, Tuple, Union
+from PIL import Image, ImageColor
 import io
 
+from .ocr_backend import TESSEROCR_AVAILABLE, OCRWorkerPool, parse_psm
+from .ocr_result import OCRResult, run_image_to_data
+from .preprocessing import get_preprocessor
+from ..shared.cache import AnalysisCache
+from ..shared.utils import calculate_bytes_hash, calculate_file_hash
+
 # Configuración de logging
 logger = logging.getLogger(__name__)
 
+# Separación entre regiones empaquetadas en un lienzo y alto máximo del lienzo
+REGION_PADDING = 16
+MAX_CANVAS_HEIGHT = 8192
+
+# PSM que tratan la imagen como una sola línea, palabra o carácter: sus
+# regiones no se apilan con otras y se reconocen cada una en su lienzo
+SINGLE_LINE_PSMS = frozenset({7, 8, 10, 13})
+
+# Fuentes de imagen aceptadas: ruta, imagen PIL, bytes codificados o array NumPy
+ImageSource = Union[str, Path, Image.Image, bytes, bytearray, memoryview, Any]
+
+
+def load_image(source: ImageSource) -> Image.Image:
+    """
+    Obtiene una imagen PIL desde cualquier fuente admitida.
+    
+    Las imágenes PIL se devuelven tal cual; los arrays NumPy contiguos se
+    envuelven sin copiar sus píxeles (``Image.fromarray``).
+    
+    Args:
+        source: Ruta, imagen PIL, bytes codificados o array (alto, ancho[, canales])
+    
+    Returns:
+        Image: Imagen PIL
+    """
+    if isinstance(source, Image.Image):
+        return source
+    if isinstance(source, (str, Path)):
+        return Image.open(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return Image.open(io.BytesIO(source))
+    if hasattr(source, "__array_interface__"):
+        return Image.fromarray(source)
+    raise TypeError(f"Fuente de imagen no soportada: {type(source).__name__}")
+
+
+def crop_image(source: ImageSource, region: Tuple[int, int, int, int]) -> Image.Image:
+    """
+    Recorta una región (x, y, ancho, alto) en memoria.
+    
+    Con arrays NumPy se toma una vista del array original y solo se copian
+    los píxeles del recorte; con imágenes PIL se recorta sin volver a
+    codificar.
+    """
+    x, y, w, h = region
+    if hasattr(source, "__array_interface__") and not isinstance(source, Image.Image):
+        return Image.fromarray(source[y:y + h, x:x + w])
+    return load_image(source).crop((x, y, x + w, y + h))
+
+
+def image_digest(source: ImageSource, image: Optional[Image.Image] = None) -> str:
+    """
+    Hash del contenido de una imagen para las claves de caché.
+    
+    Las rutas y los bytes se resumen tal cual; las imágenes ya decodificadas
+    por sus píxeles, modo y tamaño.
+    """
+    if isinstance(source, (str, Path)):
+        return calculate_file_hash(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return calculate_bytes_hash(source)
+    image = image if image is not None else load_image(source)
+    return f"{calculate_bytes_hash(image.tobytes())}:{image.mode}:{image.width}x{image.height}"
+
+
+def recognize_packed(image: Image.Image,
+                     boxes: Sequence[Optional[Tuple[int, int, int, int]]],
+                     run_ocr: Callable[..., OCRResult],
+                     configs: Optional[Sequence[str]] = None) -> List[OCRResult]:
+    """
+    Reconoce muchas regiones con pocas pasadas OCR.
+    
+    Empaqueta las regiones en columnas verticales separadas por
+    REGION_PADDING, reconoce cada lienzo de una pasada (en paralelo si hay
+    varios) y reparte las palabras entre regiones según la franja en la que
+    caen, con sus coordenadas en la imagen original.
+    
+    Con ``configs`` cada lienzo solo agrupa regiones con la misma
+    configuración, y las de PSM de una sola línea o palabra
+    (SINGLE_LINE_PSMS) van cada una en su propio lienzo.
+    
+    Args:
+        image: Imagen de origen
+        boxes: Regiones (x, y, ancho, alto) ya ajustadas a la imagen (None = vacía)
+        run_ocr: Función que ejecuta una pasada OCR sobre un lienzo; recibe
+                 además la configuración del lienzo si se indica ``configs``
+        configs: Configuración de Tesseract de cada región (opcional)
+    
+    Returns:
+        OCRResult por región, en el orden de ``boxes``
+    """
+    if image.mode not in ("L", "RGB"):
+        image = image.convert("L" if image.mode == "1" else "RGB")
+    white = ImageColor.getcolor("white", image.mode)
+    
+    # Agrupar regiones en lienzos de alto acotado (por configuración)
+    groups: List[Tuple[Optional[str], List[Tuple[int, Tuple[int, int, int, int], int]]]] = []
+    heights: List[int] = []
+    open_groups: Dict[Optional[str], int] = {}  # Configuración -> lienzo en el que aún caben regiones
+    for index, box in enumerate(boxes):
+        if box is None:
+            continue
+        config = configs[index] if configs is not None else None
+        position = open_groups.get(config)
+        if position is None or heights[position] + box[3] + REGION_PADDING > MAX_CANVAS_HEIGHT:
+            position = open_groups[config] = len(groups)
+            groups.append((config, []))
+            heights.append(REGION_PADDING)
+        groups[position][1].append((index, box, heights[position]))
+        heights[position] += box[3] + REGION_PADDING
+        if config is not None and parse_psm(config) in SINGLE_LINE_PSMS:
+            del open_groups[config]  # Una línea por lienzo
+    
+    def recognize(entry: Tuple[Optional[str], List[Tuple[int, Tuple[int, int, int, int], int]]]) -> OCRResult:
+        config, group = entry
+        width = max(box[2] for _, box, _ in group) + 2 * REGION_PADDING
+        _, last_box, last_top = group[-1]
+        canvas = Image.new(image.mode, (width, last_top + last_box[3] + REGION_PADDING), white)
+        for _, (x, y, w, h), top in group:
+            canvas.paste(image.crop((x, y, x + w, y + h)), (REGION_PADDING, top))
+        return run_ocr(canvas) if configs is None else run_ocr(canvas, config)
+    
+    if len(groups) > 1:
+        with ThreadPoolExecutor(max_workers=min(len(groups), os.cpu_count() or 2)) as executor:
+            canvas_results = list(executor.map(recognize, groups))
+    else:
+        canvas_results = [recognize(entry) for entry in groups]
+    
+    words: List[List] = [[] for _ in boxes]
+    for (_, group), result in zip(groups, canvas_results):
+        tops = [top for _, _, top in group]
+        for word in result.words:
+            center = word.top + word.height / 2
+            position = bisect.bisect_right(tops, center) - 1
+            if position < 0:
+                continue
+            index, (x, y, w, h), top = group[position]
+            if center >= top + h:
+                continue  # Ruido en la separación entre regiones
+            # Coordenadas de vuelta a la imagen original
+            word.left += x - REGION_PADDING
+            word.top += y - top
+            words[index].append(word)
+    
+    return [OCRResult(words=region_words) for region_words in words]
+
+
 class OCREngine:
     """
     Motor de OCR para extracción de texto de imágenes.
@@ -21,7 +182,12 @@ class OCREngine:
     Utiliza Tesseract OCR con optimizaciones para capturas de pantalla.
     """
     
-    def __init__(self, languages: List[str] = None, config: str = "--psm 6"):
+    def __init__(self,
+                 languages: List[str] = None,
+                 config: str = "--psm 6",
+                 pool: Optional[OCRWorkerPool] = None,
+                 cache: Optional[AnalysisCache] = None,
+                 recipe: str = "document"):
         """
         Inicializa el motor OCR.
         
@@ -29,9 +195,20 @@ class OCREngine:
             languages: Lista de idiomas a reconocer (ej: ['eng', 'spa'])
             config: Configuración de Tesseract PSM (Page Segmentation Mode)
                    --psm 6: Asume un bloque de texto uniforme (recomendado para capturas)
+            pool: Pool de workers Tesseract persistentes (opcional). Sin pool
+                  cada llamada lanza un proceso tesseract nuevo.
+            cache: Caché por hash de imagen para resultados de extract_text (opcional)
+            recipe: Receta de preprocesamiento (ver ``preprocessing.RECIPES``)
+        
+        Raises:
+            ValueError: Si la receta no existe
         """
         self.languages = languages or ['eng', 'spa']
         self.config = config
+        self.pool = pool
+        self.cache = cache
+        self.recipe = recipe
+        self._preprocessor = get_preprocessor(recipe)
         self._tesseract_available = False
         self._check_tesseract()
     
@@ -42,6 +219,12 @@ class OCREngine:
         Returns:
             bool: True si Tesseract está disponible
         """
+        if self.pool is not None and self.pool.backend_name == "tesserocr":
+            # La C-API residente no necesita el ejecutable tesseract
+            logger.info("Tesseract OCR disponible vía tesserocr (pool persistente)")
+            self._tesseract_available = True
+            return True
+        
         try:
             import pytesseract
             version = pytesseract.get_tesseract_version()
@@ -54,12 +237,12 @@ class OCREngine:
             self._tesseract_available = False
             return False
     
-    def extract_text(self, image_path: str, preprocess: bool = True) -> Optional[str]:
+    def extract_text(self, image: ImageSource, preprocess: bool = True) -> Optional[str]:
         """
         Extrae texto de una imagen.
         
         Args:
-            image_path: Ruta a la imagen
+            image: Ruta, imagen PIL, bytes codificados o array NumPy
             preprocess: Si debe preprocesar la imagen para mejor OCR
         
         Returns:
@@ -70,27 +253,41 @@ class OCREngine:
             return None
         
         try:
-            import pytesseract
+            source = image
+            image = None
+            
+            cache_key = None
+            if self.cache is not None:
+                if not isinstance(source, (str, Path, bytes, bytearray, memoryview)):
+                    image = load_image(source)
+                cache_key = AnalysisCache.make_key(
+                    image_digest(source, image),
+                    operation="extract_text",
+                    languages=self.languages,
+                    config=self.config,
+                    preprocess=self.recipe if preprocess else None
+                )
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    logger.info(f"Texto extraído desde caché: {len(cached)} caracteres")
+                    return cached
             
-            # Cargar imagen
-            image = Image.open(image_path)
+            # Cargar imagen (sin copia si ya está en memoria)
+            if image is None:
+                image = load_image(source)
             
             # Preprocesar si se solicita
             if preprocess:
                 image = self._preprocess_image(image)
             
-            # Configurar idiomas
-            lang_str = '+'.join(self.languages)
+            # Extraer texto (una sola pasada image_to_data)
+            text = self._run_ocr(image).text.strip()
             
-            # Extraer texto
-            text = pytesseract.image_to_string(
-                image,
-                lang=lang_str,
-                config=self.config
-            )
+            if cache_key is not None:
+                self.cache.set(cache_key, text)
             
             logger.info(f"Texto extraído: {len(text)} caracteres")
-            return text.strip()
+            return text
             
         except Exception as e:
             logger.error(f"Error extrayendo texto: {e}")
@@ -98,14 +295,14 @@ class OCREngine:
     
     def extract_text_with_confidence(
         self, 
-        image_path: str, 
+        image: ImageSource, 
         preprocess: bool = True
     ) -> Optional[Dict]:
         """
         Extrae texto con información de confianza.
         
         Args:
-            image_path: Ruta a la imagen
+            image: Ruta, imagen PIL, bytes codificados o array NumPy
             preprocess: Si debe preprocesar la imagen
         
         Returns:
@@ -115,39 +312,21 @@ class OCREngine:
             return None
         
         try:
-            import pytesseract
-            
-            image = Image.open(image_path)
+            image = load_image(image)
             
             if preprocess:
                 image = self._preprocess_image(image)
             
-            lang_str = '+'.join(self.languages)
-            
-            # Obtener datos detallados
-            data = pytesseract.image_to_data(
-                image,
-                lang=lang_str,
-                config=self.config,
-                output_type=pytesseract.Output.DICT
-            )
-            
-            # Extraer palabras con confianza > 0
-            words = []
-            confidences = []
-            
-            for i, conf in enumerate(data['conf']):
-                if conf > 0:
-                    words.append(data['text'][i])
-                    confidences.append(conf)
+            result = self._run_ocr(image)
             
-            text = ' '.join(words)
-            avg_confidence = sum(confidences) / len(confidences) if confidences else 0
+            # Solo palabras con confianza > 0 (texto, media y lista)
+            words = result.words_above(0)
+            confidences = [w.confidence for w in words]
             
             return {
-                'text': text,
-                'confidence': avg_confidence,
-                'words': list(zip(words, confidences)),
+                'text': ' '.join(w.text for w in words),
+                'confidence': sum(confidences) / len(confidences) if confidences else 0,
+                'words': [(w.text, w.confidence) for w in words],
                 'word_count': len(words)
             }
             
@@ -155,6 +334,21 @@ class OCREngine:
             logger.error(f"Error extrayendo texto con confianza: {e}")
             return None
     
+    def _run_ocr(self, image: Image.Image) -> OCRResult:
+        """
+        Ejecuta una pasada OCR con los idiomas y configuración del motor.
+        
+        Args:
+            image: Imagen PIL
+        
+        Returns:
+            OCRResult: Palabras, confianza y texto con layout
+        """
+        lang_str = '+'.join(self.languages)
+        if self.pool is not None:
+            return self.pool.image_to_data(image, lang_str, self.config)
+        return run_image_to_data(image, lang_str, self.config)
+    
     def _preprocess_image(self, image: Image.Image) -> Image.Image:
         """
         Preprocesa imagen para mejorar OCR.
@@ -166,23 +360,8 @@ class OCREngine:
             Image: Imagen preprocesada
         """
         try:
-            from PIL import ImageEnhance, ImageFilter
-            
-            # Convertir a escala de grises
-            image = image.convert('L')
-            
-            # Aumentar contraste
-            enhancer = ImageEnhance.Contrast(image)
-            image = enhancer.enhance(2.0)
-            
-            # Aumentar nitidez
-            enhancer = ImageEnhance.Sharpness(image)
-            image = enhancer.enhance(1.5)
-            
-            # Reducir ruido
-            image = image.filter(ImageFilter.MedianFilter(size=3))
-            
-            return image
+            # Escala de grises, contraste, nitidez y mediana en una sola canalización
+            return self._preprocessor(image)
             
         except Exception as e:
             logger.warning(f"Error en preprocesamiento: {e}. Usando imagen original.")
@@ -190,47 +369,120 @@ class OCREngine:
     
     def extract_from_region(
         self, 
-        image_path: str, 
-        region: Tuple[int, int, int, int]
+        image: ImageSource, 
+        region: Tuple[int, int, int, int],
+        preprocess: bool = True
     ) -> Optional[str]:
         """
         Extrae texto de una región específica de la imagen.
         
+        El recorte se hace en memoria (vista del array con NumPy) y se pasa
+        directamente al backend, sin archivos temporales.
+        
         Args:
-            image_path: Ruta a la imagen
+            image: Ruta, imagen PIL, bytes codificados o array NumPy
             region: Tupla (x, y, width, height) de la región
+            preprocess: Si debe preprocesar el recorte
         
         Returns:
             str: Texto extraído de la región
         """
         try:
-            image = Image.open(image_path)
-            
-            # Recortar región
-            x, y, w, h = region
-            cropped = image.crop((x, y, x + w, y + h))
+            return self.extract_text(crop_image(image, region), preprocess=preprocess)
             
-            # Guardar temporalmente y extraer
-            temp_path = Path(image_path).parent / "temp_crop.png"
-            cropped.save(temp_path)
-            
-            text = self.extract_text(str(temp_path))
+        except Exception as e:
+            logger.error(f"Error extrayendo de región: {e}")
+            return None
+    
+    def extract_regions(
+        self,
+        image: ImageSource,
+        regions: Sequence[Tuple[int, int, int, int]],
+        preprocess: bool = True
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Extrae texto de muchas regiones de una imagen en una sola llamada.
+        
+        La imagen se carga y preprocesa una vez. Con pool, cada región se
+        encola como un rectángulo de la misma imagen (tesserocr la reutiliza
+        con SetRectangle) y los workers las reconocen en paralelo. Sin pool,
+        las regiones se empaquetan en lienzos y cada lienzo se reconoce con
+        un único proceso tesseract, en paralelo entre núcleos.
+        
+        Args:
+            image: Ruta, imagen PIL, bytes codificados o array NumPy
+            regions: Regiones (x, y, width, height)
+            preprocess: Si debe preprocesar la imagen
+        
+        Returns:
+            list: Por región y en el orden de entrada, diccionario con
+            'region', 'text', 'confidence' y 'word_count'; None si falla
+        """
+        if not self._tesseract_available:
+            return None
+        if not regions:
+            return []
+        
+        try:
+            image = load_image(image)
+            if preprocess:
+                image = self._preprocess_image(image)
+            image.load()  # Los workers leen la misma imagen en paralelo
             
-            # Limpiar archivo temporal
-            temp_path.unlink(missing_ok=True)
+            boxes = [self._clip_region(region, image.size) for region in regions]
+            if self.pool is not None:
+                results = self._ocr_regions_pooled(image, boxes)
+            else:
+                results = self._ocr_regions_packed(image, boxes)
             
-            return text
+            return [
+                {
+                    'region': tuple(region),
+                    'text': result.text,
+                    'confidence': result.confidence,
+                    'word_count': result.word_count
+                }
+                for region, result in zip(regions, results)
+            ]
             
         except Exception as e:
-            logger.error(f"Error extrayendo de región: {e}")
+            logger.error(f"Error extrayendo regiones: {e}")
             return None
     
-    def detect_language(self, image_path: str) -> Optional[str]:
+    @staticmethod
+    def _clip_region(region: Tuple[int, int, int, int],
+                     size: Tuple[int, int]) -> Optional[Tuple[int, int, int, int]]:
+        """Ajusta la región a los límites de la imagen (None si queda vacía)"""
+        x, y, w, h = (int(v) for v in region)
+        left, top = max(0, x), max(0, y)
+        right, bottom = min(size[0], x + w), min(size[1], y + h)
+        if right <= left or bottom <= top:
+            return None
+        return left, top, right - left, bottom - top
+    
+    def _ocr_regions_pooled(self,
+                            image: Image.Image,
+                            boxes: List[Optional[Tuple[int, int, int, int]]]) -> List[OCRResult]:
+        """Una petición por región al pool, todas sobre la misma imagen"""
+        lang_str = '+'.join(self.languages)
+        futures = [
+            self.pool.submit(image, lang_str, self.config, rect=box) if box is not None else None
+            for box in boxes
+        ]
+        return [future.result() if future is not None else OCRResult() for future in futures]
+    
+    def _ocr_regions_packed(self,
+                            image: Image.Image,
+                            boxes: List[Optional[Tuple[int, int, int, int]]]) -> List[OCRResult]:
+        """Regiones empaquetadas en lienzos (un proceso tesseract por lienzo)"""
+        return recognize_packed(image, boxes, self._run_ocr)
+    
+    def detect_language(self, image: ImageSource) -> Optional[str]:
         """
         Detecta el idioma predominante en una imagen.
         
         Args:
-            image_path: Ruta a la imagen
+            image: Ruta, imagen PIL, bytes codificados o array NumPy
         
         Returns:
             str: Código de idioma detectado (ej: 'eng', 'spa')
@@ -241,7 +493,7 @@ class OCREngine:
         try:
             import pytesseract
             
-            image = Image.open(image_path)
+            image = load_image(image)
             osd = pytesseract.image_to_osd(image)
             
             # Parsear resultado
@@ -258,22 +510,53 @@ class OCREngine:
             return None
 
 
-# Instancia global (singleton)
-_ocr_engine_instance = None
+# Instancias globales: un pool persistente y un motor por combinación de idiomas
+_ocr_pools: Dict[Tuple[str, ...], OCRWorkerPool] = {}
+_ocr_engine_instances: Dict[Tuple[str, ...], OCREngine] = {}
+_ocr_lock = threading.Lock()
+
+def get_ocr_pool(languages: List[str] = None, workers: Optional[int] = None) -> OCRWorkerPool:
+    """
+    Obtiene el pool global de workers Tesseract para unos idiomas.
+    
+    Args:
+        languages: Lista de idiomas (ej: ['eng', 'spa'])
+        workers: Número de workers (solo se usa al crear el pool)
+    
+    Returns:
+        OCRWorkerPool: Pool compartido con workers ya inicializados
+    """
+    key = tuple(languages or ['eng', 'spa'])
+    
+    with _ocr_lock:
+        if key not in _ocr_pools:
+            _ocr_pools[key] = OCRWorkerPool('+'.join(key), workers=workers)
+        return _ocr_pools[key]
 
 def get_ocr_engine(languages: List[str] = None) -> OCREngine:
     """
-    Obtiene la instancia global del motor OCR.
+    Obtiene el motor OCR global para unos idiomas, respaldado por el pool
+    de workers persistentes.
+    
+    El pool solo se crea si hay con qué reconocer (el ejecutable tesseract
+    o tesserocr); sin Tesseract no se arranca ningún hilo.
     
     Args:
-        languages: Lista de idiomas (solo se usa en primera llamada)
+        languages: Lista de idiomas (ej: ['eng', 'spa'])
     
     Returns:
         OCREngine: Instancia del motor OCR
     """
-    global _ocr_engine_instance
+    key = tuple(languages or ['eng', 'spa'])
+    with _ocr_lock:
+        engine = _ocr_engine_instances.get(key)
+    if engine is not None:
+        return engine
     
-    if _ocr_engine_instance is None:
-        _ocr_engine_instance = OCREngine(languages=languages)
+    engine = OCREngine(languages=list(key))
+    if engine._tesseract_available or TESSEROCR_AVAILABLE:
+        engine.pool = get_ocr_pool(list(key))
+        engine._check_tesseract()
     
-    return _ocr_engine_instance
\ No newline at end of file
+    with _ocr_lock:
+        return _ocr_engine_instances.setdefault(key, engine)
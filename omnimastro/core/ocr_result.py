@@ -0,0 +1,201 @@
+"""
+Modelo unificado de resultados OCR
+
+Convierte la salida de ``image_to_data`` de Tesseract (una sola pasada)
+en un resultado con palabras, confianza y texto reconstruido a partir de
+los índices de bloque/párrafo/línea/palabra, preservando el layout.
+Lo comparten OCREngine y ScreenshotAnalyzer.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Nivel de fila TSV correspondiente a palabras
+WORD_LEVEL = 5
+
+# Columnas del formato TSV de Tesseract (mismo orden que image_to_data)
+TSV_COLUMNS = [
+    'level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num',
+    'left', 'top', 'width', 'height', 'conf', 'text'
+]
+
+
+@dataclass
+class OCRWord:
+    """Palabra reconocida con su posición en el layout"""
+    text: str
+    confidence: float
+    left: int
+    top: int
+    width: int
+    height: int
+    block_num: int = 0
+    par_num: int = 0
+    line_num: int = 0
+    word_num: int = 0
+    region: int = 0  # Región de origen cuando se unen varias pasadas OCR (0 = una sola)
+
+    @property
+    def bbox(self) -> Dict[str, int]:
+        """Caja delimitadora en formato dict"""
+        return {
+            "x": self.left,
+            "y": self.top,
+            "width": self.width,
+            "height": self.height
+        }
+
+
+@dataclass
+class OCRResult:
+    """Resultado de una pasada OCR"""
+    words: List[OCRWord] = field(default_factory=list)
+
+    @classmethod
+    def from_data(cls, data: Dict[str, List[Any]]) -> "OCRResult":
+        """
+        Construye el resultado desde la salida DICT de ``image_to_data``.
+
+        Args:
+            data: Diccionario con columnas TSV (level, block_num, text, conf...)
+
+        Returns:
+            OCRResult: Resultado con las palabras no vacías
+        """
+        words = []
+        texts = data.get('text', [])
+        levels = data.get('level') or [WORD_LEVEL] * len(texts)
+        blocks = data.get('block_num') or [0] * len(texts)
+        pars = data.get('par_num') or [0] * len(texts)
+        lines = data.get('line_num') or [0] * len(texts)
+        word_nums = data.get('word_num') or [0] * len(texts)
+
+        for i, text in enumerate(texts):
+            if int(levels[i]) != WORD_LEVEL:
+                continue
+            text = str(text).strip()
+            if not text:
+                continue
+
+            words.append(OCRWord(
+                text=text,
+                confidence=_to_float(data['conf'][i]),
+                left=int(data['left'][i]),
+                top=int(data['top'][i]),
+                width=int(data['width'][i]),
+                height=int(data['height'][i]),
+                block_num=int(blocks[i]),
+                par_num=int(pars[i]),
+                line_num=int(lines[i]),
+                word_num=int(word_nums[i])
+            ))
+
+        return cls(words=words)
+
+    @classmethod
+    def from_tsv(cls, tsv: str) -> "OCRResult":
+        """
+        Construye el resultado desde texto TSV de Tesseract
+        (p. ej. ``TessBaseAPI.GetTSVText``), con o sin cabecera.
+
+        Args:
+            tsv: Texto TSV
+
+        Returns:
+            OCRResult: Resultado con las palabras no vacías
+        """
+        data: Dict[str, List[Any]] = {column: [] for column in TSV_COLUMNS}
+
+        for row in tsv.splitlines():
+            values = row.split('\t')
+            if len(values) < len(TSV_COLUMNS) - 1 or values[0] == 'level':
+                continue
+            if len(values) == len(TSV_COLUMNS) - 1:
+                values.append('')
+            for column, value in zip(TSV_COLUMNS, values):
+                data[column].append(value)
+
+        return cls.from_data(data)
+
+    @property
+    def text(self) -> str:
+        """
+        Texto reconstruido respetando el layout: palabras de una línea
+        separadas por espacio, líneas por salto de línea y párrafos/bloques
+        (también los de regiones distintas) por una línea en blanco.
+        """
+        paragraphs: List[str] = []
+        lines: List[str] = []
+        current_line: List[str] = []
+        line_key = None
+        par_key = None
+
+        for word in self.words:
+            new_par = (word.region, word.block_num, word.par_num)
+            new_line = new_par + (word.line_num,)
+
+            if line_key is not None and new_line != line_key:
+                lines.append(' '.join(current_line))
+                current_line = []
+            if par_key is not None and new_par != par_key:
+                paragraphs.append('\n'.join(lines))
+                lines = []
+
+            current_line.append(word.text)
+            line_key = new_line
+            par_key = new_par
+
+        if current_line:
+            lines.append(' '.join(current_line))
+        if lines:
+            paragraphs.append('\n'.join(lines))
+
+        return '\n\n'.join(paragraphs)
+
+    @property
+    def confidence(self) -> float:
+        """Confianza media de las palabras reconocidas (0-100)"""
+        confidences = [w.confidence for w in self.words if w.confidence >= 0]
+        return sum(confidences) / len(confidences) if confidences else 0
+
+    @property
+    def word_count(self) -> int:
+        return len(self.words)
+
+    def words_above(self, threshold: float) -> List[OCRWord]:
+        """Palabras con confianza estrictamente mayor al umbral"""
+        return [w for w in self.words if w.confidence > threshold]
+
+
+def run_image_to_data(image: Any, lang: str, config: str = "") -> OCRResult:
+    """
+    Ejecuta una única pasada ``image_to_data`` de Tesseract.
+
+    Args:
+        image: Imagen PIL (o array) a reconocer
+        lang: Idiomas en formato Tesseract (ej: 'eng+spa')
+        config: Opciones adicionales de Tesseract (ej: '--psm 6')
+
+    Returns:
+        OCRResult: Resultado unificado
+    """
+    import pytesseract
+
+    data = pytesseract.image_to_data(
+        image,
+        lang=lang,
+        config=config,
+        output_type=pytesseract.Output.DICT
+    )
+    return OCRResult.from_data(data)
+
+
+def _to_float(value: Any) -> float:
+    """Normaliza la confianza (pytesseract la devuelve como str, int o float)"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return -1.0
@@ -0,0 +1,333 @@
+"""
+Detección de Capturas Casi Duplicadas
+
+Hash perceptual (dHash / pHash calculados con NumPy) y un BK-tree para
+buscar capturas a una distancia de Hamming configurable. Permite reutilizar
+el resultado de una captura ya procesada cuando otra difiere solo en la
+recompresión o el reescalado.
+
+Un hash de 64 bits no distingue dos páginas con la misma maquetación y
+distinto texto (la misma hoja con otra ecuación da distancia 0), así que
+cada candidato se confirma con una miniatura de detalle: solo se reutiliza
+si ningún píxel de la miniatura difiere más de DETAIL_TOLERANCE niveles, con
+una excepción para el puntero del ratón: los píxeles distintos forman como
+mucho dos grupos (posición anterior y nueva), cada uno dentro de una ventana
+del tamaño del puntero que es fondo liso en una de las dos capturas. Un
+carácter cambiado deja contenido en ambas y sigue rechazándose.
+"""
+
+import copy
+import logging
+import threading
+import zlib
+from collections import deque
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+
+try:
+    from PIL import Image
+    import numpy as np
+    PHASH_AVAILABLE = True
+except ImportError:
+    PHASH_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+HASH_ALGORITHMS = ("dhash", "phash")
+
+# Miniatura de detalle para confirmar candidatos: ancho y diferencia máxima
+# por píxel (un signo cambiado en una captura de 1920 px de ancho deja una
+# diferencia de varias decenas de niveles; la recompresión JPEG, pocas)
+DETAIL_WIDTH = 192
+DETAIL_TOLERANCE = 10
+
+# Ventana (filas, columnas de la miniatura) que cubre el puntero del ratón:
+# unos 20x14 píxeles de pantalla, independiente de la escala HiDPI
+CURSOR_CELLS = (4, 3)
+
+
+@dataclass(frozen=True)
+class ImageFingerprint:
+    """Hash perceptual más miniatura de detalle comprimida de una captura"""
+    hash: int
+    detail: bytes
+    shape: Tuple[int, int]
+
+    def matches(self, other: "ImageFingerprint", tolerance: int = DETAIL_TOLERANCE) -> bool:
+        """Si las miniaturas de detalle coinciden dentro de la tolerancia"""
+        if self.shape != other.shape:
+            return False
+        a = np.frombuffer(zlib.decompress(self.detail), dtype=np.uint8).reshape(self.shape).astype(np.int16)
+        b = np.frombuffer(zlib.decompress(other.detail), dtype=np.uint8).reshape(other.shape).astype(np.int16)
+        changed = np.argwhere(np.abs(a - b) > tolerance)
+        if not len(changed):
+            return True
+        if len(changed) > 2 * CURSOR_CELLS[0] * CURSOR_CELLS[1]:
+            return False
+
+        # Solo se tolera el puntero: a lo sumo dos grupos de su tamaño...
+        groups = _group_cells([tuple(cell) for cell in changed.tolist()])
+        if len(groups) > 2:
+            return False
+        for cells in groups:
+            (top, left), (bottom, right) = np.min(cells, axis=0), np.max(cells, axis=0)
+            if bottom - top >= CURSOR_CELLS[0] or right - left >= CURSOR_CELLS[1]:
+                return False
+            # ...cada uno sobre fondo liso (con un píxel de margen) en alguna captura
+            window = (slice(max(top - 1, 0), bottom + 2), slice(max(left - 1, 0), right + 2))
+            if not any(int(image[window].max() - image[window].min()) <= tolerance for image in (a, b)):
+                return False
+        return True
+
+
+def _group_cells(cells: List[Tuple[int, int]]) -> List[List[Tuple[int, int]]]:
+    """Agrupa celdas a distancia de Chebyshev <= 2 (un hueco de un píxel no separa)"""
+    pending = set(cells)
+    groups = []
+    while pending:
+        stack = [pending.pop()]
+        group = []
+        while stack:
+            row, col = stack.pop()
+            group.append((row, col))
+            near = [c for c in pending if abs(c[0] - row) <= 2 and abs(c[1] - col) <= 2]
+            pending.difference_update(near)
+            stack.extend(near)
+        groups.append(group)
+    return groups
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Número de bits distintos entre dos hashes"""
+    return bin(a ^ b).count("1")
+
+
+def _bits_to_int(bits: "np.ndarray") -> int:
+    value = 0
+    for bit in bits.flatten():
+        value = (value << 1) | int(bit)
+    return value
+
+
+def _to_image(image: Union["Image.Image", bytes]) -> "Image.Image":
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return Image.open(BytesIO(image))
+    return image
+
+
+def dhash(image: Union["Image.Image", bytes], hash_size: int = 8) -> int:
+    """
+    Difference hash: compara cada píxel con su vecino derecho sobre una
+    miniatura en escala de grises de (hash_size + 1) x hash_size.
+
+    Args:
+        image: Imagen PIL o bytes codificados
+        hash_size: Lado del hash (8 -> 64 bits)
+
+    Returns:
+        int: Hash perceptual
+    """
+    gray = _to_image(image).convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = np.asarray(gray, dtype=np.int16)
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def detail_thumbnail(image: Union["Image.Image", bytes], width: int = DETAIL_WIDTH) -> "np.ndarray":
+    """Miniatura en escala de grises de ``width`` píxeles de ancho (promedio por áreas)"""
+    gray = _to_image(image).convert("L")
+    height = max(1, round(gray.height * width / gray.width))
+    return np.asarray(gray.resize((width, height), Image.BOX))
+
+
+def _dct_matrix(n: int) -> "np.ndarray":
+    k = np.arange(n)
+    matrix = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n))
+    matrix[0] *= 1 / np.sqrt(2)
+    return matrix * np.sqrt(2 / n)
+
+
+_DCT_CACHE: Dict[int, "np.ndarray"] = {}
+
+
+def phash(image: Union["Image.Image", bytes], hash_size: int = 8, highfreq_factor: int = 4) -> int:
+    """
+    Perceptual hash: DCT 2D de una miniatura y comparación de las
+    frecuencias bajas contra su mediana.
+
+    Args:
+        image: Imagen PIL o bytes codificados
+        hash_size: Lado del hash (8 -> 64 bits)
+        highfreq_factor: Factor de la miniatura respecto al hash
+
+    Returns:
+        int: Hash perceptual
+    """
+    size = hash_size * highfreq_factor
+    gray = _to_image(image).convert("L").resize((size, size), Image.LANCZOS)
+    pixels = np.asarray(gray, dtype=np.float64)
+
+    if size not in _DCT_CACHE:
+        _DCT_CACHE[size] = _dct_matrix(size)
+    dct = _DCT_CACHE[size]
+
+    coefficients = dct @ pixels @ dct.T
+    low = coefficients[:hash_size, :hash_size]
+    median = np.median(low.flatten()[1:])  # Excluir el componente DC
+    return _bits_to_int(low > median)
+
+
+class BKTree:
+    """BK-tree sobre distancia de Hamming para búsqueda por radio"""
+
+    def __init__(self):
+        self._root: Optional[Tuple[int, List[Any], Dict[int, Any]]] = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, key: int, value: Any) -> None:
+        """Inserta un hash con su valor asociado"""
+        self._size += 1
+        if self._root is None:
+            self._root = (key, [value], {})
+            return
+
+        node = self._root
+        while True:
+            node_key, values, children = node
+            distance = hamming_distance(key, node_key)
+            if distance == 0:
+                values.append(value)
+                return
+            child = children.get(distance)
+            if child is None:
+                children[distance] = (key, [value], {})
+                return
+            node = child
+
+    def search(self, key: int, max_distance: int) -> List[Tuple[int, Any]]:
+        """
+        Busca valores dentro de un radio de Hamming.
+
+        Args:
+            key: Hash de consulta
+            max_distance: Distancia máxima permitida
+
+        Returns:
+            Lista de (distancia, valor) ordenada por distancia
+        """
+        if self._root is None:
+            return []
+
+        matches = []
+        pending = [self._root]
+        while pending:
+            node_key, values, children = pending.pop()
+            distance = hamming_distance(key, node_key)
+            if distance <= max_distance:
+                matches.extend((distance, value) for value in values)
+            # Desigualdad triangular: solo ramas en [d - r, d + r]
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    pending.append(child)
+
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+
+class NearDuplicateIndex:
+    """
+    Índice de capturas procesadas por hash perceptual.
+
+    Guarda el resultado de cada captura y lo devuelve para cualquier otra
+    cuyo hash esté a ``max_distance`` bits o menos y cuya miniatura de
+    detalle coincida (ver ``ImageFingerprint.matches``).
+    """
+
+    def __init__(self,
+                 max_distance: int = 6,
+                 algorithm: str = "dhash",
+                 max_entries: int = 10000):
+        """
+        Inicializa el índice.
+
+        Args:
+            max_distance: Distancia de Hamming máxima para considerar duplicado
+            algorithm: 'dhash' (más rápido) o 'phash' (más robusto a recompresión)
+            max_entries: Máximo de entradas; al superarlo se descartan las más antiguas
+        """
+        if algorithm not in HASH_ALGORITHMS:
+            raise ValueError(f"Algoritmo no soportado: {algorithm}")
+
+        self.max_distance = max_distance
+        self.algorithm = algorithm
+        self.max_entries = max_entries
+        self._tree = BKTree()
+        self._entries: Deque[Tuple[int, Any]] = deque()
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "hits": 0, "rejected": 0}
+
+    def is_available(self) -> bool:
+        return PHASH_AVAILABLE
+
+    def compute_hash(self, image: Union["Image.Image", bytes]) -> ImageFingerprint:
+        """
+        Calcula el hash perceptual y la miniatura de detalle de una imagen
+        PIL o bytes codificados.
+        """
+        image = _to_image(image)
+        image_hash = phash(image) if self.algorithm == "phash" else dhash(image)
+        detail = detail_thumbnail(image)
+        return ImageFingerprint(image_hash, zlib.compress(detail.tobytes(), 1), detail.shape)
+
+    def lookup_hash(self,
+                    fingerprint: ImageFingerprint,
+                    predicate: Optional[Callable[[Any], bool]] = None) -> Optional[Tuple[int, Any]]:
+        """
+        Busca el resultado más cercano para una captura.
+
+        Args:
+            fingerprint: Resultado de ``compute_hash``
+            predicate: Filtro opcional sobre los valores candidatos
+
+        Returns:
+            (distancia, copia independiente del valor) o None si no hay casi duplicados
+        """
+        with self._lock:
+            self._stats["lookups"] += 1
+            for distance, (candidate, value) in self._tree.search(fingerprint.hash, self.max_distance):
+                if predicate is not None and not predicate(value):
+                    continue
+                if not fingerprint.matches(candidate):
+                    self._stats["rejected"] += 1
+                    continue
+                self._stats["hits"] += 1
+                return distance, copy.deepcopy(value)
+        return None
+
+    def add_hash(self, fingerprint: ImageFingerprint, value: Any) -> None:
+        """Registra el resultado de una captura procesada (se guarda una copia)"""
+        entry = (fingerprint, copy.deepcopy(value))
+        with self._lock:
+            self._entries.append((fingerprint.hash, entry))
+            self._tree.add(fingerprint.hash, entry)
+
+            if len(self._entries) > self.max_entries:
+                # El BK-tree no admite borrado: reconstruir con la mitad reciente
+                keep = self.max_entries // 2
+                while len(self._entries) > keep:
+                    self._entries.popleft()
+                self._tree = BKTree()
+                for entry_hash, entry_value in self._entries:
+                    self._tree.add(entry_hash, entry_value)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "max_distance": self.max_distance,
+                "algorithm": self.algorithm
+            }
@@ -0,0 +1,444 @@
+"""
+Preprocesamiento de Imágenes para OCR
+
+Una sola canalización compartida por ScreenshotAnalyzer y OCREngine. Cada
+receta (contraste, filtro de nitidez 3x3, mediana, umbral y reescalado por
+DPI) se compila en una lista de etapas que trabajan sobre arrays NumPy:
+las etapas intermedias escriben en búferes preasignados (por hilo y por
+tamaño de imagen) y solo la salida final es un array nuevo. Con OpenCV las
+etapas usan sus funciones nativas (equivalentes salvo redondeo); sin
+OpenCV hay equivalentes vectorizados en NumPy que reproducen píxel a píxel
+la cadena PIL (``preprocess_pil``), que es la que se aplica sin NumPy.
+
+Recetas disponibles (``RECIPES``):
+    screenshot: contraste 2.0, SHARPEN y umbral fijo 150 (capturas)
+    document: contraste 2.0, nitidez 1.5 y mediana 3x3 (texto general)
+    otsu: contraste 1.5, nitidez y umbral de Otsu
+    adaptive: nitidez y umbral adaptativo (fondos con degradados o temas oscuros)
+    small_text: como otsu, reescalando a 300 DPI equivalentes
+"""
+
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from PIL import Image, ImageChops, ImageEnhance, ImageFilter
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    import cv2
+    CV2_AVAILABLE = NUMPY_AVAILABLE
+except ImportError:
+    CV2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Resolución asumida para capturas sin metadatos de DPI
+SCREEN_DPI = 96
+
+# Límites del reescalado para texto pequeño
+MAX_UPSCALE = 3.0
+MAX_UPSCALED_PIXELS = 16_000_000
+
+# Umbral adaptativo: lado de la ventana y desplazamiento sobre la media local
+ADAPTIVE_BLOCK = 31
+ADAPTIVE_C = 10
+
+
+@dataclass(frozen=True)
+class Recipe:
+    """Receta de preprocesamiento"""
+    contrast: float = 1.0                      # Factor como ImageEnhance.Contrast
+    kernel: Optional[str] = None               # Filtro 3x3 de KERNELS
+    median: bool = False                       # Mediana 3x3
+    threshold: Union[None, int, str] = None    # Umbral fijo, "otsu" o "adaptive"
+    target_dpi: Optional[int] = None           # Reescalar hasta este DPI equivalente
+
+
+RECIPES: Dict[str, Recipe] = {
+    "screenshot": Recipe(contrast=2.0, kernel="sharpen", threshold=150),
+    "document": Recipe(contrast=2.0, kernel="sharpness", median=True),
+    "otsu": Recipe(contrast=1.5, kernel="sharpness", threshold="otsu"),
+    "adaptive": Recipe(kernel="sharpness", threshold="adaptive"),
+    "small_text": Recipe(contrast=1.5, kernel="sharpness", threshold="otsu", target_dpi=300),
+}
+
+# Núcleos 3x3 (fila a fila): ImageFilter.SHARPEN e ImageEnhance.Sharpness(1.5),
+# que mezcla la imagen con su versión SMOOTH: 1.5 * original - 0.5 * SMOOTH
+KERNELS: Dict[str, Tuple[float, ...]] = {
+    "sharpen": tuple(v / 16 for v in (-2, -2, -2, -2, 32, -2, -2, -2, -2)),
+    "sharpness": tuple(1.5 * (i == 4) - 0.5 * v / 13 for i, v in enumerate((1, 1, 1, 1, 5, 1, 1, 1, 1))),
+}
+
+
+def get_recipe(recipe: Union[str, Recipe]) -> Recipe:
+    """
+    Resuelve una receta por nombre.
+
+    Raises:
+        ValueError: Si el nombre no corresponde a ninguna receta
+    """
+    if isinstance(recipe, Recipe):
+        return recipe
+    try:
+        return RECIPES[recipe]
+    except KeyError:
+        raise ValueError(f"Receta de preprocesamiento desconocida: {recipe!r} "
+                         f"(disponibles: {', '.join(RECIPES)})") from None
+
+
+def upscale_factor(image: Image.Image, recipe: Recipe) -> float:
+    """
+    Factor de reescalado para llevar la imagen al DPI objetivo de la receta.
+
+    Usa el DPI de los metadatos (o SCREEN_DPI) y se limita a MAX_UPSCALE y a
+    MAX_UPSCALED_PIXELS píxeles de salida.
+    """
+    if not recipe.target_dpi:
+        return 1.0
+    dpi = image.info.get("dpi", (SCREEN_DPI,))[0] or SCREEN_DPI
+    scale = min(MAX_UPSCALE, recipe.target_dpi / float(dpi))
+    pixels = image.width * image.height
+    if pixels * scale * scale > MAX_UPSCALED_PIXELS:
+        scale = (MAX_UPSCALED_PIXELS / pixels) ** 0.5
+    return scale if scale > 1.0 else 1.0
+
+
+def otsu_threshold(histogram) -> int:
+    """Umbral de Otsu a partir de un histograma de 256 niveles"""
+    if NUMPY_AVAILABLE:
+        hist = np.asarray(histogram, dtype=np.float64)
+        levels = np.arange(256, dtype=np.float64)
+        weight = np.cumsum(hist)
+        total = weight[-1]
+        cumulative_mean = np.cumsum(hist * levels)
+        background = weight[:-1]
+        foreground = total - background
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_bg = cumulative_mean[:-1] / background
+            mean_fg = (cumulative_mean[-1] - cumulative_mean[:-1]) / foreground
+            variance = np.nan_to_num(background * foreground * (mean_bg - mean_fg) ** 2)
+        return int(np.argmax(variance)) + 1  # Primer nivel del primer plano
+
+    total = sum(histogram)
+    total_mean = sum(i * h for i, h in enumerate(histogram))
+    weight = cumulative = 0.0
+    best, best_variance = 128, -1.0
+    for level in range(255):
+        weight += histogram[level]
+        cumulative += level * histogram[level]
+        if weight == 0 or weight == total:
+            continue
+        variance = weight * (total - weight) * (cumulative / weight - (total_mean - cumulative) / (total - weight)) ** 2
+        if variance > best_variance:
+            best, best_variance = level + 1, variance
+    return best
+
+
+def preprocess_pil(image: Image.Image, recipe: Union[str, Recipe] = "document") -> Image.Image:
+    """
+    Cadena PIL equivalente a la receta (una imagen nueva por paso).
+
+    Se usa cuando NumPy no está disponible y como referencia en
+    ``scripts/benchmark_preprocessing.py``.
+    """
+    recipe = get_recipe(recipe)
+    gray = image.convert("L")
+    scale = upscale_factor(image, recipe)
+    if scale > 1.0:
+        gray = gray.resize((round(gray.width * scale), round(gray.height * scale)), Image.BICUBIC)
+    if recipe.contrast != 1.0:
+        gray = ImageEnhance.Contrast(gray).enhance(recipe.contrast)
+    if recipe.kernel is not None:
+        gray = gray.filter(ImageFilter.Kernel((3, 3), KERNELS[recipe.kernel], scale=1))
+    if recipe.median:
+        gray = gray.filter(ImageFilter.MedianFilter(size=3))
+    if recipe.threshold == "adaptive":
+        # gray - media_local + C > 0  <=>  gray > media_local - C
+        local_mean = gray.filter(ImageFilter.BoxBlur(ADAPTIVE_BLOCK // 2))
+        gray = ImageChops.subtract(gray, local_mean, 1.0, ADAPTIVE_C).point(lambda v: 255 if v > 0 else 0)
+    elif recipe.threshold is not None:
+        threshold = otsu_threshold(gray.histogram()) if recipe.threshold == "otsu" else recipe.threshold
+        gray = gray.point(lambda v: 0 if v < threshold else 255)
+    return gray
+
+
+# === Etapas NumPy/OpenCV: stage(src, dst, buffers) escribe en dst ===
+
+class _Buffers:
+    """Búferes de trabajo para un tamaño de imagen (uno por hilo)"""
+
+    def __init__(self, shape: Tuple[int, int]):
+        self.shape = shape
+        self.stages = [np.empty(shape, dtype=np.uint8) for _ in range(2)]
+        self._scratch: Dict[str, "np.ndarray"] = {}
+
+    def scratch(self, name: str, shape: Tuple[int, int], dtype: str = "uint8") -> "np.ndarray":
+        array = self._scratch.get(name)
+        if array is None:
+            array = self._scratch[name] = np.empty(shape, dtype=dtype)
+        return array
+
+    def padded(self, src: "np.ndarray") -> "np.ndarray":
+        """Copia de ``src`` con un borde replicado de 1 píxel"""
+        height, width = src.shape
+        pad = self.scratch("pad", (height + 2, width + 2))
+        pad[1:-1, 1:-1] = src
+        pad[0, 1:-1], pad[-1, 1:-1] = src[0], src[-1]
+        pad[:, 0], pad[:, -1] = pad[:, 1], pad[:, -2]
+        return pad
+
+
+def _lut_stage(lut: "np.ndarray") -> Callable:
+    def stage(src, dst, buffers):
+        if CV2_AVAILABLE:
+            cv2.LUT(src, lut, dst=dst)
+        else:
+            np.take(lut, src, out=dst)
+    return stage
+
+
+def _contrast_lut(src: "np.ndarray", factor: float) -> "np.ndarray":
+    # Como ImageEnhance.Contrast: Image.blend (float32, truncando) con una
+    # imagen uniforme de la media redondeada
+    histogram = np.bincount(src.ravel(), minlength=256)
+    mean = np.float32(int(float(histogram @ np.arange(256)) / src.size + 0.5))
+    levels = np.arange(256, dtype=np.float32)
+    return np.clip(mean + np.float32(factor) * (levels - mean), 0, 255).astype(np.uint8)
+
+
+def _threshold_lut(threshold: int) -> "np.ndarray":
+    return np.where(np.arange(256) < threshold, 0, 255).astype(np.uint8)
+
+
+def _contrast_stage(factor: float, threshold: Optional[int]) -> Callable:
+    def stage(src, dst, buffers):
+        lut = _contrast_lut(src, factor)
+        if threshold is not None:
+            lut = _threshold_lut(threshold)[lut]  # Contraste y umbral fusionados
+        _lut_stage(lut)(src, dst, buffers)
+    return stage
+
+
+def _kernel_stage(kernel: Tuple[float, ...]) -> Callable:
+    # ImageFilter.Kernel aplica la primera fila del núcleo a la fila inferior
+    matrix = np.array(kernel, dtype=np.float32).reshape(3, 3)
+    flipped = np.ascontiguousarray(matrix[::-1])
+
+    def stage(src, dst, buffers):
+        if CV2_AVAILABLE:
+            cv2.filter2D(src, -1, flipped, dst=dst, borderType=cv2.BORDER_REPLICATE)
+            return
+        # Mismo orden de operaciones float32 que ImagingFilter3x3, de modo que
+        # el resultado coincide con PIL píxel a píxel (bordes sin filtrar)
+        np.copyto(dst, src)
+        height, width = src.shape[0] - 2, src.shape[1] - 2
+        if height <= 0 or width <= 0:
+            return
+        acc = buffers.scratch("acc", (height, width), "float32")
+        row = buffers.scratch("row", (height, width), "float32")
+        tmp = buffers.scratch("tmp", (height, width), "float32")
+        acc.fill(0.5)  # Redondeo al truncar
+        for ky, dy in ((0, 2), (1, 1), (2, 0)):
+            rows = src[dy:dy + height]
+            np.multiply(rows[:, :width], matrix[ky, 0], out=row)
+            np.multiply(rows[:, 1:width + 1], matrix[ky, 1], out=tmp)
+            row += tmp
+            np.multiply(rows[:, 2:], matrix[ky, 2], out=tmp)
+            row += tmp
+            acc += row
+        np.clip(acc, 0, 255, out=acc)
+        np.copyto(dst[1:-1, 1:-1], acc, casting="unsafe")
+    return stage
+
+
+def _min3(a, b, c, out):
+    np.minimum(a, b, out=out)
+    np.minimum(out, c, out=out)
+
+
+def _max3(a, b, c, out):
+    np.maximum(a, b, out=out)
+    np.maximum(out, c, out=out)
+
+
+def _med3(a, b, c, out, tmp):
+    np.minimum(a, b, out=tmp)
+    np.maximum(a, b, out=out)
+    np.minimum(out, c, out=out)
+    np.maximum(tmp, out, out=out)
+
+
+def _median_stage(src, dst, buffers):
+    if CV2_AVAILABLE:
+        cv2.medianBlur(src, 3, dst=dst)
+        return
+    # Mediana exacta de 9: mediana de (máx. de mínimos, mediana de medianas,
+    # mín. de máximos) de las ternas horizontales de tres filas consecutivas
+    height, width = src.shape
+    pad = buffers.padded(src)
+    left, center, right = pad[:, :-2], pad[:, 1:-1], pad[:, 2:]
+    lows, mids, highs, tmp = (buffers.scratch(name, (height + 2, width)) for name in ("lo", "mid", "hi", "tmp8"))
+    _min3(left, center, right, lows)
+    _max3(left, center, right, highs)
+    _med3(left, center, right, mids, tmp)
+    max_low, min_high = (buffers.scratch(name, (height, width)) for name in ("max_lo", "min_hi"))
+    _max3(lows[:-2], lows[1:-1], lows[2:], max_low)
+    _min3(highs[:-2], highs[1:-1], highs[2:], min_high)
+    med_mid = tmp[:height]
+    _med3(mids[:-2], mids[1:-1], mids[2:], med_mid, lows[:height])
+    _med3(max_low, med_mid, min_high, dst, highs[:height])
+
+
+def _threshold_stage(threshold: int) -> Callable:
+    lut = _threshold_lut(threshold)
+
+    def stage(src, dst, buffers):
+        if CV2_AVAILABLE:
+            cv2.threshold(src, threshold - 1, 255, cv2.THRESH_BINARY, dst=dst)
+        else:
+            np.take(lut, src, out=dst)
+    return stage
+
+
+def _otsu_stage(src, dst, buffers):
+    if CV2_AVAILABLE:
+        cv2.threshold(src, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU, dst=dst)
+        return
+    threshold = otsu_threshold(np.bincount(src.ravel(), minlength=256))
+    np.take(_threshold_lut(threshold), src, out=dst)
+
+
+def _box_blur_rows(src: "np.ndarray") -> "np.ndarray":
+    # Suma deslizante de ADAPTIVE_BLOCK píxeles por fila (borde replicado) y
+    # división en coma fija de 24 bits, como ImagingHorizontalBoxBlur
+    radius = ADAPTIVE_BLOCK // 2
+    padded = np.pad(src, ((0, 0), (radius, radius)), mode="edge")
+    sums = np.zeros((src.shape[0], padded.shape[1] + 1), dtype=np.int64)
+    np.cumsum(padded, axis=1, dtype=np.int64, out=sums[:, 1:])
+    window = sums[:, ADAPTIVE_BLOCK:] - sums[:, :-ADAPTIVE_BLOCK]
+    weight = int((1 << 24) / ADAPTIVE_BLOCK)
+    return ((window * weight + (1 << 23)) >> 24).astype(np.uint8)
+
+
+def _adaptive_stage(src, dst, buffers):
+    if CV2_AVAILABLE:
+        cv2.adaptiveThreshold(src, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY,
+                              ADAPTIVE_BLOCK, ADAPTIVE_C, dst=dst)
+        return
+    # Media local como ImageFilter.BoxBlur: pasada horizontal y vertical,
+    # cada una redondeada a uint8 con la misma aritmética entera que PIL
+    local_mean = _box_blur_rows(_box_blur_rows(src).T).T
+    # src - media + C > 0  <=>  src + C > media
+    above = src.astype(np.int16) + ADAPTIVE_C > local_mean
+    np.multiply(above, 255, out=dst, casting="unsafe")
+
+
+class Preprocessor:
+    """
+    Canalización de preprocesamiento compilada a partir de una receta.
+
+    Es segura entre hilos: los búferes intermedios son por hilo y la imagen
+    devuelta nunca comparte memoria con ellos.
+    """
+
+    def __init__(self, recipe: Union[str, Recipe] = "document"):
+        self.recipe = get_recipe(recipe)
+        self._stages = self._compile(self.recipe) if NUMPY_AVAILABLE else []
+        self._local = threading.local()
+
+    @staticmethod
+    def _compile(recipe: Recipe) -> List[Callable]:
+        stages: List[Callable] = []
+        threshold = recipe.threshold
+        if recipe.contrast != 1.0:
+            fuse = isinstance(threshold, int) and recipe.kernel is None and not recipe.median
+            stages.append(_contrast_stage(recipe.contrast, threshold if fuse else None))
+            if fuse:
+                threshold = None
+        if recipe.kernel is not None:
+            stages.append(_kernel_stage(KERNELS[recipe.kernel]))
+        if recipe.median:
+            stages.append(_median_stage)
+        if threshold == "otsu":
+            stages.append(_otsu_stage)
+        elif threshold == "adaptive":
+            stages.append(_adaptive_stage)
+        elif threshold is not None:
+            stages.append(_threshold_stage(int(threshold)))
+        return stages
+
+    def _buffers(self, shape: Tuple[int, int]) -> _Buffers:
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None or buffers.shape != shape:
+            buffers = self._local.buffers = _Buffers(shape)
+        return buffers
+
+    def process_array(self, gray: "np.ndarray") -> "np.ndarray":
+        """
+        Aplica las etapas a un array uint8 (alto, ancho) en escala de grises.
+
+        Returns:
+            Array nuevo con el resultado (``gray`` si la receta no tiene etapas)
+        """
+        if not self._stages:
+            return gray
+        gray = np.ascontiguousarray(gray, dtype=np.uint8)
+        buffers = self._buffers(gray.shape)
+        last = len(self._stages) - 1
+        src = gray
+        for index, stage in enumerate(self._stages):
+            dst = np.empty_like(gray) if index == last else buffers.stages[index % 2]
+            stage(src, dst, buffers)
+            src = dst
+        return src
+
+    def __call__(self, image: Image.Image, gray: Optional["np.ndarray"] = None) -> Image.Image:
+        """
+        Preprocesa una imagen PIL.
+
+        Args:
+            image: Imagen de origen
+            gray: Escala de grises de ``image`` ya calculada (opcional, p. ej.
+                  ``Frame.gray``); evita volver a convertir la imagen
+
+        Returns:
+            Imagen PIL en modo "L" (0/255 si la receta umbraliza)
+        """
+        if not NUMPY_AVAILABLE:
+            return preprocess_pil(image, self.recipe)
+
+        scale = upscale_factor(image, self.recipe)
+        if scale > 1.0 and not CV2_AVAILABLE:
+            gray_image = Image.fromarray(gray) if gray is not None else image.convert("L")
+            gray = np.asarray(gray_image.resize(
+                (round(image.width * scale), round(image.height * scale)), Image.BICUBIC))
+        else:
+            if gray is None:
+                gray = np.asarray(image.convert("L"))
+            if scale > 1.0:
+                gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+        return Image.fromarray(self.process_array(gray))
+
+
+_preprocessors: Dict[Recipe, Preprocessor] = {}
+
+
+def get_preprocessor(recipe: Union[str, Recipe] = "document") -> Preprocessor:
+    """Preprocesador compartido para una receta"""
+    recipe = get_recipe(recipe)
+    preprocessor = _preprocessors.get(recipe)
+    if preprocessor is None:
+        preprocessor = _preprocessors.setdefault(recipe, Preprocessor(recipe))
+    return preprocessor
+
+
+def preprocess(image: Image.Image, recipe: Union[str, Recipe] = "document") -> Image.Image:
+    """Preprocesa una imagen con la receta indicada"""
+    return get_preprocessor(recipe)(image)
@@ -0,0 +1,184 @@
+"""
+Registro de Plantillas de Prompts
+
+Los prompts se compilan una sola vez por combinación de (nivel, estilo,
+idioma) y se reutilizan en todas las solicitudes. Cada prompt se divide en
+un prefijo estable (instrucciones del sistema, formato de respuesta) y la
+parte variable (contenido del usuario), que va siempre al final para que el
+proveedor pueda servir el prefijo desde su caché de prompts:
+- OpenAI cachea automáticamente prefijos idénticos de 1024+ tokens
+- Anthropic cachea el prefijo hasta un bloque marcado con ``cache_control``
+  si alcanza ANTHROPIC_MIN_CACHEABLE_TOKENS
+
+Con los prompts actuales (sistema e instrucciones suman unos cientos de
+tokens) ningún proveedor llega a su mínimo, así que la caché de prompts no
+interviene: ``text_block`` solo marca un bloque cuando el prefijo estimado
+lo alcanza, y las métricas ``cached_input_tokens`` reflejan lo que el
+proveedor reporta (hoy, cero).
+
+Las funciones reciben los valores de los enums (``context.style.value``...)
+para no depender de ai_engine.
+"""
+
+import textwrap
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from .rate_limiter import estimate_tokens
+
+# Prefijo mínimo que Anthropic cachea (1024 tokens en Sonnet y Opus, 2048 en Haiku)
+ANTHROPIC_MIN_CACHEABLE_TOKENS = 1024
+
+IMAGE_ANALYSIS_SYSTEM_PROMPT = (
+    "Eres un asistente educativo experto en analizar contenido visual y extraer "
+    "información relevante para crear explicaciones pedagógicas."
+)
+
+LEVEL_DESCRIPTIONS = {
+    "elementary": "estudiantes de primaria (6-12 años)",
+    "middle_school": "estudiantes de secundaria (12-15 años)",
+    "high_school": "estudiantes de preparatoria (15-18 años)",
+    "university": "estudiantes universitarios",
+    "professional": "profesionales y autodidactas avanzados"
+}
+
+STYLE_INSTRUCTIONS = {
+    "simple": "Usa lenguaje muy simple y ejemplos cotidianos",
+    "detailed": "Proporciona explicaciones completas con múltiples niveles de detalle",
+    "step_by_step": "Divide la explicación en pasos numerados y secuenciales",
+    "conceptual": "Enfócate en la comprensión profunda de los conceptos fundamentales",
+    "practical": "Enfatiza aplicaciones prácticas y ejemplos del mundo real",
+    "visual": "Describe visualmente y sugiere diagramas o representaciones visuales"
+}
+
+_SYSTEM_TEMPLATE = """\
+Eres TE-explico, un asistente educativo avanzado especializado en crear explicaciones pedagógicas adaptativas.
+
+Tu objetivo es generar explicaciones claras, precisas y adaptadas al nivel de {target_audience}.
+
+Principios pedagógicos:
+1. Claridad: Usa lenguaje apropiado para el nivel educativo
+2. Estructura: Organiza la información de manera lógica y progresiva
+3. Contextualización: Conecta conceptos nuevos con conocimientos previos
+4. Ejemplos: Proporciona ejemplos relevantes y comprensibles
+5. Verificación: Incluye preguntas para verificar comprensión
+6. Motivación: Muestra la relevancia y aplicación práctica
+
+Siempre responde en {language} con un tono amigable pero profesional."""
+
+_IMAGE_ANALYSIS_TEMPLATE = textwrap.dedent("""\
+    Analiza esta imagen educativa y extrae:
+    1. Tema o materia identificada
+    2. Conceptos clave presentes
+    3. Tipo de contenido (diagrama, texto, fórmula, gráfico, etc.)
+    4. Nivel de complejidad estimado
+    5. Elementos visuales importantes
+    6. Texto visible (si hay)
+
+    Contexto: Nivel educativo {level}, Idioma {language}
+
+    Responde en formato JSON con las claves: subject, key_concepts, content_type, complexity, visual_elements, text_content""")
+
+_EXPLANATION_TEMPLATE = textwrap.dedent("""\
+    Genera una explicación educativa completa sobre el contenido indicado al final.
+
+    Parámetros:
+    - Nivel educativo: {level}
+    - Estilo: {style} - {style_instructions}
+    - Idioma: {language}
+
+    Genera un JSON con la siguiente estructura:
+    {{
+        "content": "Explicación completa y detallada",
+        "summary": "Resumen breve (2-3 oraciones)",
+        "key_concepts": ["Concepto 1", "Concepto 2", ...],
+        "difficulty_level": "fácil|medio|difícil|avanzado",
+        "estimated_time": tiempo_estimado_en_minutos,
+        "follow_up_questions": ["Pregunta 1", "Pregunta 2", ...],
+        "resources": [
+            {{"title": "Título del recurso", "type": "video|artículo|ejercicio", "description": "Descripción"}}
+        ],
+        "confidence_score": 0.0-1.0
+    }}""")
+
+_ENHANCE_TEMPLATE = textwrap.dedent("""\
+    Explicación actual:
+    {explanation}
+
+    Feedback del usuario:
+    {feedback}
+
+    Por favor, mejora la explicación incorporando el feedback del usuario.
+    Mantén el nivel educativo: {level}""")
+
+
+@lru_cache(maxsize=256)
+def system_prompt(level: str, language: str) -> str:
+    """Prompt de sistema para explicaciones (estable por nivel e idioma)"""
+    return _SYSTEM_TEMPLATE.format(
+        target_audience=LEVEL_DESCRIPTIONS.get(level, "estudiantes"),
+        language=language
+    )
+
+
+@lru_cache(maxsize=256)
+def image_analysis_prompt(level: str, language: str) -> str:
+    """Instrucciones del análisis de imagen (estables por nivel e idioma)"""
+    return _IMAGE_ANALYSIS_TEMPLATE.format(level=level, language=language)
+
+
+@lru_cache(maxsize=256)
+def explanation_instructions(level: str, style: str, language: str) -> str:
+    """Instrucciones y formato de respuesta de una explicación (prefijo estable)"""
+    return _EXPLANATION_TEMPLATE.format(
+        level=level,
+        style=style,
+        style_instructions=STYLE_INSTRUCTIONS.get(style, ""),
+        language=language
+    )
+
+
+def explanation_input(content: str,
+                      subject_area: Optional[str] = None,
+                      previous_context: Optional[str] = None) -> str:
+    """Parte variable de una explicación: contexto de la solicitud y contenido"""
+    parts = []
+    if subject_area:
+        parts.append(f"Área de estudio: {subject_area}")
+    if previous_context:
+        parts.append(f"Contexto previo: {previous_context}")
+    parts.append(f"Contenido a explicar:\n{content}")
+    return "\n".join(parts)
+
+
+def enhance_prompt(explanation: str, feedback: str, level: str) -> str:
+    """Prompt para mejorar una explicación con el feedback del usuario"""
+    return _ENHANCE_TEMPLATE.format(explanation=explanation, feedback=feedback, level=level)
+
+
+def text_block(text: str, prefix_tokens: int = 0) -> Dict[str, Any]:
+    """
+    Bloque de texto de Anthropic, marcado con ``cache_control`` solo si el
+    prefijo que cierra (``prefix_tokens`` anteriores más el propio bloque)
+    alcanza el mínimo cacheable; por debajo el marcador no tendría efecto.
+    """
+    block: Dict[str, Any] = {"type": "text", "text": text}
+    if prefix_tokens + estimate_tokens(text) >= ANTHROPIC_MIN_CACHEABLE_TOKENS:
+        block["cache_control"] = {"type": "ephemeral"}
+    return block
+
+
+def anthropic_system(text: str) -> List[Dict[str, Any]]:
+    """Prompt de sistema de Anthropic (marcado para caché si alcanza el mínimo)"""
+    return [text_block(text)]
+
+
+def get_template_statistics() -> Dict[str, Any]:
+    """Plantillas compiladas y reutilizaciones por tipo de prompt"""
+    stats = {}
+    for name, compiled in (("system", system_prompt),
+                           ("image_analysis", image_analysis_prompt),
+                           ("explanation", explanation_instructions)):
+        info = compiled.cache_info()
+        stats[name] = {"compiled": info.currsize, "reused": info.hits}
+    return stats
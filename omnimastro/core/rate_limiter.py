@@ -0,0 +1,232 @@
+"""
+Limitación de Tasa por Proveedor de IA
+
+- TokenBucket: cuotas de solicitudes/minuto y tokens/minuto
+- AdaptiveConcurrency: control AIMD de llamadas simultáneas, que crece
+  con cada éxito y se reduce ante respuestas 429 o latencia degradada
+- ProviderLimiter: combina ambos para un proveedor
+
+Todas las esperas se basan en futures del event loop en curso, de modo
+que los limitadores pueden reutilizarse entre distintos ``asyncio.run``.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Aproximación habitual: ~4 caracteres por token
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estima los tokens de un texto a partir de su longitud"""
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Detecta errores 429 de los SDK de OpenAI/Anthropic"""
+    if getattr(error, "status_code", None) == 429:
+        return True
+    return type(error).__name__ == "RateLimitError"
+
+
+@dataclass
+class RateLimit:
+    """Cuota de un proveedor (None = sin límite)"""
+    requests_per_minute: Optional[float] = None
+    tokens_per_minute: Optional[float] = None
+
+
+class TokenBucket:
+    """Cubeta de tokens con recarga continua"""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate_per_minute: Unidades recargadas por minuto
+            capacity: Ráfaga máxima (por defecto, la cuota de un minuto)
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, amount: float) -> float:
+        """
+        Intenta consumir unidades.
+
+        Returns:
+            float: 0 si se consumieron, o segundos a esperar antes de reintentar
+        """
+        amount = min(amount, self.capacity)
+        self._refill()
+        if self._tokens >= amount:
+            self._tokens -= amount
+            return 0.0
+        return (amount - self._tokens) / self.rate
+
+    async def acquire(self, amount: float = 1) -> float:
+        """
+        Espera hasta poder consumir unidades.
+
+        Returns:
+            float: Segundos esperados
+        """
+        waited = 0.0
+        while True:
+            delay = self.try_acquire(amount)
+            if delay == 0:
+                return waited
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def drain(self) -> None:
+        """Vacía la cubeta (tras un 429 todos los llamadores esperan la recarga)"""
+        self._refill()
+        self._tokens = 0.0
+
+
+class AdaptiveConcurrency:
+    """
+    Límite de concurrencia AIMD.
+
+    Aumento aditivo de ~1 llamada por "ronda" completada con éxito y
+    disminución multiplicativa ante 429 o cuando la latencia reciente supera
+    en ``latency_tolerance`` veces a la latencia base.
+    """
+
+    def __init__(self,
+                 initial_limit: float = 4,
+                 min_limit: float = 1,
+                 max_limit: float = 32,
+                 backoff: float = 0.5,
+                 latency_tolerance: float = 2.0):
+        """
+        Args:
+            initial_limit: Límite inicial
+            min_limit: Límite mínimo
+            max_limit: Límite máximo
+            backoff: Factor multiplicativo ante un 429
+            latency_tolerance: Latencia relativa a la base que se considera congestión
+        """
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._recent_latency: Optional[float] = None
+        self._baseline_latency: Optional[float] = None
+
+    async def acquire(self) -> None:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Se nos cedió el hueco justo al cancelar: devolverlo
+                self.release()
+            elif future in self._waiters:
+                self._waiters.remove(future)
+            raise
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    def on_success(self, latency: float) -> None:
+        """Registra una llamada correcta y ajusta el límite"""
+        # Media móvil rápida (latencia reciente) frente a lenta (base)
+        if self._baseline_latency is None:
+            self._recent_latency = self._baseline_latency = latency
+        else:
+            self._recent_latency = 0.7 * self._recent_latency + 0.3 * latency
+            self._baseline_latency = 0.98 * self._baseline_latency + 0.02 * latency
+
+        if self._recent_latency > self.latency_tolerance * self._baseline_latency:
+            self.limit = max(self.min_limit, self.limit * 0.9)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        self._wake()
+
+    def on_throttle(self) -> None:
+        """Reduce el límite tras un 429"""
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+
+
+class ProviderLimiter:
+    """Cuotas de solicitudes/tokens y concurrencia adaptativa de un proveedor"""
+
+    def __init__(self, rate_limit: Optional[RateLimit] = None, max_concurrency: int = 8):
+        rate_limit = rate_limit or RateLimit()
+        self.requests = TokenBucket(rate_limit.requests_per_minute) if rate_limit.requests_per_minute else None
+        self.tokens = TokenBucket(rate_limit.tokens_per_minute) if rate_limit.tokens_per_minute else None
+        self.concurrency = AdaptiveConcurrency(
+            initial_limit=max(1, max_concurrency // 2),
+            max_limit=max_concurrency
+        )
+        self._stats = {"calls": 0, "throttled": 0, "queue_wait_seconds": 0.0}
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int = 0) -> AsyncIterator[None]:
+        """
+        Reserva cuota y un hueco de concurrencia para una llamada.
+
+        Args:
+            estimated_tokens: Tokens estimados (entrada + salida) de la llamada
+        """
+        start = time.monotonic()
+        if self.requests is not None:
+            await self.requests.acquire(1)
+        if self.tokens is not None and estimated_tokens:
+            await self.tokens.acquire(estimated_tokens)
+        await self.concurrency.acquire()
+        self._stats["queue_wait_seconds"] += time.monotonic() - start
+
+        call_start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            if is_rate_limit_error(e):
+                self._stats["throttled"] += 1
+                self.concurrency.on_throttle()
+                for bucket in (self.requests, self.tokens):
+                    if bucket is not None:
+                        bucket.drain()
+            raise
+        else:
+            self.concurrency.on_success(time.monotonic() - call_start)
+        finally:
+            self._stats["calls"] += 1
+            self.concurrency.release()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "concurrency_limit": round(self.concurrency.limit, 2),
+            "in_flight": self.concurrency.in_flight
+        }
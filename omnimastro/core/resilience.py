@@ -0,0 +1,239 @@
+"""
+Reintentos y Plazos para Llamadas a Proveedores
+
+- Plazos (deadlines) absolutos que se propagan por contextvar desde el
+  pipeline (explain_screenshot) a todas las llamadas que lanza, incluidas
+  las tareas creadas por el camino
+- RetryPolicy: reintentos con backoff exponencial y jitter completo solo
+  para errores transitorios (429, 5xx, timeouts y errores de conexión),
+  respetando la cabecera Retry-After
+- Cada intento tiene un timeout, de modo que una conexión colgada no
+  retiene indefinidamente un hueco del limitador; los streams lo aplican
+  a su duración total con iterate_with_timeout
+"""
+
+import asyncio
+import email.utils
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, Optional, TypeVar
+
+from .rate_limiter import is_rate_limit_error
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Códigos HTTP transitorios (529 = Anthropic sobrecargado)
+RETRIABLE_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504, 529})
+
+# Errores de red/timeout de los SDK (comparados por nombre para no importarlos)
+RETRIABLE_ERROR_NAMES = frozenset({
+    "APITimeoutError", "APIConnectionError", "InternalServerError", "OverloadedError",
+    "ConnectError", "ReadTimeout", "ConnectTimeout", "RemoteProtocolError"
+})
+
+
+class DeadlineExceeded(TimeoutError):
+    """El plazo de la operación se agotó"""
+
+
+class AttemptTimeout(TimeoutError):
+    """Un intento superó ``RetryPolicy.attempt_timeout`` (cuenta como fallo del proveedor)"""
+
+
+_deadline: ContextVar[Optional[float]] = ContextVar("omnimastro_deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[Optional[float]]:
+    """
+    Establece un plazo para todo lo que se ejecute dentro del bloque.
+
+    Un plazo anidado nunca amplía el exterior. Con ``seconds=None`` se
+    mantiene el plazo actual.
+
+    Yields:
+        float: Instante límite (time.monotonic) o None si no hay plazo
+    """
+    current = _deadline.get()
+    if seconds is None:
+        yield current
+        return
+
+    limit = time.monotonic() + seconds
+    if current is not None:
+        limit = min(limit, current)
+    token = _deadline.set(limit)
+    try:
+        yield limit
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """Segundos hasta el plazo actual (puede ser negativo) o None si no hay plazo"""
+    limit = _deadline.get()
+    return None if limit is None else limit - time.monotonic()
+
+
+def check_deadline() -> None:
+    """Lanza DeadlineExceeded si el plazo actual ya se agotó"""
+    remaining = remaining_time()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded("Plazo agotado")
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    code = getattr(error, "status_code", None)
+    if code is None:
+        code = getattr(getattr(error, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_retriable_error(error: BaseException) -> bool:
+    """Indica si un error es transitorio y merece reintentarse"""
+    if isinstance(error, DeadlineExceeded):
+        return False
+    if is_rate_limit_error(error) or isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    code = status_code(error)
+    if code is not None:
+        return code in RETRIABLE_STATUS_CODES
+    return type(error).__name__ in RETRIABLE_ERROR_NAMES
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Lee Retry-After (segundos o fecha HTTP) o retry-after-ms de la respuesta del error"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+
+    try:
+        value = headers.get("retry-after-ms")
+        if value is not None:
+            return max(0.0, float(value) / 1000)
+
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            parsed = email.utils.parsedate_to_datetime(value)
+            return max(0.0, parsed.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class RetryPolicy:
+    """Política de reintentos de una llamada"""
+    max_attempts: int = 3
+    base_delay: float = 0.5  # Espera base del backoff (segundos)
+    max_delay: float = 20.0  # Espera máxima entre intentos
+    attempt_timeout: Optional[float] = 120.0  # Timeout de cada intento (None = sin límite)
+
+    def backoff(self, attempt: int) -> float:
+        """Espera antes del intento ``attempt + 1`` (jitter completo)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+async def call_with_retry(func: Callable[[], Awaitable[Any]],
+                          policy: RetryPolicy,
+                          on_retry: Optional[Callable[[int, BaseException, float], None]] = None) -> Any:
+    """
+    Ejecuta ``func`` con timeout por intento, reintentos y el plazo actual.
+
+    Args:
+        func: Función sin argumentos que crea la corrutina de un intento
+        policy: Política de reintentos
+        on_retry: Callback (intento, error, espera) antes de cada reintento
+
+    Returns:
+        Resultado del primer intento correcto
+
+    Raises:
+        DeadlineExceeded: Si el plazo se agota (encadenado al último error)
+        AttemptTimeout: Si el último intento superó attempt_timeout
+        El error del último intento si no es transitorio o se agotan los intentos
+    """
+    attempt = 0
+    while True:
+        check_deadline()
+        timeout = policy.attempt_timeout
+        remaining = remaining_time()
+        deadline_bound = remaining is not None and (timeout is None or remaining < timeout)
+        if deadline_bound:
+            timeout = remaining
+
+        try:
+            if timeout is None:
+                return await func()
+            return await asyncio.wait_for(func(), timeout=timeout)
+        except asyncio.TimeoutError as e:
+            if deadline_bound:
+                raise DeadlineExceeded(f"Plazo agotado tras {attempt + 1} intento(s)") from e
+            error: BaseException = AttemptTimeout(f"Intento {attempt + 1} superó {timeout:.1f}s")
+            error.__cause__ = e
+        except Exception as e:
+            error = e
+
+        attempt += 1
+        if attempt >= policy.max_attempts or not is_retriable_error(error):
+            raise error
+
+        delay = max(policy.backoff(attempt - 1), retry_after_seconds(error) or 0.0)
+        remaining = remaining_time()
+        if remaining is not None and delay >= remaining:
+            raise DeadlineExceeded("Plazo insuficiente para reintentar") from error
+
+        if on_retry is not None:
+            on_retry(attempt, error, delay)
+        logger.warning(f"Error transitorio ({type(error).__name__}: {error}); "
+                       f"reintento {attempt}/{policy.max_attempts - 1} en {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+
+async def iterate_with_timeout(iterator: AsyncIterator[T], timeout: Optional[float]) -> AsyncIterator[T]:
+    """
+    Itera un stream con un límite total de ``timeout`` segundos y el plazo actual.
+
+    Cada elemento se espera como mucho hasta el límite más cercano; al salir
+    (también por error o cancelación) se cierra el iterador, de modo que un
+    stream colgado no retiene su conexión ni su hueco del limitador.
+
+    Raises:
+        DeadlineExceeded: Si el plazo se agota durante el stream
+        AttemptTimeout: Si el stream supera ``timeout``
+    """
+    limit = None if timeout is None else time.monotonic() + timeout
+    try:
+        while True:
+            check_deadline()
+            wait = None if limit is None else limit - time.monotonic()
+            remaining = remaining_time()
+            deadline_bound = remaining is not None and (wait is None or remaining < wait)
+            if deadline_bound:
+                wait = remaining
+
+            try:
+                if wait is None:
+                    item = await iterator.__anext__()
+                else:
+                    item = await asyncio.wait_for(iterator.__anext__(), timeout=max(0.0, wait))
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError as e:
+                if deadline_bound:
+                    raise DeadlineExceeded("Plazo agotado durante el stream") from e
+                raise AttemptTimeout(f"El stream superó {timeout:.1f}s") from e
+            yield item
+    finally:
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
@@ -0,0 +1,247 @@
+"""
+Caché de Respuestas de Explicación
+
+Evita llamadas repetidas al proveedor para el mismo contenido y contexto:
+- Nivel exacto: clave = contenido normalizado + campos del contexto,
+  persistido en disco mediante AnalysisCache
+- Nivel de similitud (opcional, desactivado por defecto): MinHash sobre
+  shingles de caracteres del texto con índice LSH por bandas; funciona sin
+  embeddings ni red. Solo se reutiliza una entrada si sus cifras y
+  operadores coinciden exactamente, porque dos ejercicios que difieren en un
+  signo tienen una similitud de Jaccard casi total
+"""
+
+import hashlib
+import logging
+import re
+import struct
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from ..shared.cache import AnalysisCache
+from ..shared.utils import calculate_bytes_hash
+
+logger = logging.getLogger(__name__)
+
+# Primo de Mersenne para las permutaciones universales de MinHash
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Cifras y operadores: deben coincidir para reutilizar una respuesta similar
+_MATH_TOKENS = re.compile(r"[\d=+\-*/^²³√−×÷<>]")
+
+
+def normalize_content(text: str) -> str:
+    """Minúsculas y espacios colapsados para comparar contenido"""
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def math_fingerprint(text: str) -> str:
+    """Secuencia de cifras y operadores del texto (sin el resto de caracteres)"""
+    return "".join(_MATH_TOKENS.findall(text))
+
+
+def shingles(text: str, size: int = 5) -> Set[str]:
+    """
+    Shingles de caracteres del texto normalizado. Los de caracteres toleran
+    mejor que los de palabras los errores típicos de OCR.
+    """
+    text = normalize_content(text)
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class MinHasher:
+    """Firmas MinHash con permutaciones (a*x + b) mod p deterministas"""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        self.num_perm = num_perm
+        self._permutations: List[Tuple[int, int]] = []
+        for i in range(num_perm):
+            digest = hashlib.sha256(f"{seed}:{i}".encode()).digest()
+            a, b = struct.unpack("<QQ", digest[:16])
+            self._permutations.append((a % (_MERSENNE_PRIME - 1) + 1, b % _MERSENNE_PRIME))
+
+    def signature(self, tokens: Set[str]) -> List[int]:
+        """Calcula la firma MinHash de un conjunto de shingles"""
+        hashes = [
+            struct.unpack("<I", hashlib.blake2b(t.encode("utf-8"), digest_size=4).digest())[0]
+            for t in tokens
+        ]
+        if not hashes:
+            return [_MAX_HASH] * self.num_perm
+
+        return [
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._permutations
+        ]
+
+    @staticmethod
+    def similarity(sig_a: Sequence[int], sig_b: Sequence[int]) -> float:
+        """Estimación de la similitud de Jaccard entre dos firmas"""
+        if not sig_a:
+            return 0.0
+        return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+class ExplanationCache:
+    """
+    Caché de resultados de generate_explanation.
+
+    Los valores son diccionarios (``ExplanationResult.to_dict()``); el nivel
+    exacto los guarda en memoria y disco, y el nivel de similitud mantiene
+    en memoria las firmas MinHash de las entradas recientes.
+    """
+
+    def __init__(self,
+                 store: Optional[AnalysisCache] = None,
+                 enable_similarity: bool = False,
+                 similarity_threshold: float = 0.9,
+                 num_perm: int = 64,
+                 bands: int = 8,
+                 max_similarity_entries: int = 5000):
+        """
+        Inicializa la caché.
+
+        Args:
+            store: Caché exacta subyacente (por defecto namespace 'explanations' en DATA_DIR)
+            enable_similarity: Si se activa el nivel MinHash (desactivado por defecto)
+            similarity_threshold: Jaccard estimado mínimo para reutilizar una respuesta
+            num_perm: Número de permutaciones MinHash
+            bands: Bandas LSH (num_perm debe ser múltiplo)
+            max_similarity_entries: Máximo de firmas en el índice de similitud
+        """
+        if num_perm % bands != 0:
+            raise ValueError("num_perm debe ser múltiplo de bands")
+
+        self.store = store or AnalysisCache(namespace="explanations")
+        self.enable_similarity = enable_similarity
+        self.similarity_threshold = similarity_threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_similarity_entries = max_similarity_entries
+
+        self._hasher = MinHasher(num_perm)
+        self._signatures: "OrderedDict[str, Tuple[str, List[int], str]]" = OrderedDict()
+        self._buckets: Dict[Tuple[str, int, Tuple[int, ...]], Set[str]] = defaultdict(set)
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "similar_hits": 0, "misses": 0}
+
+    @staticmethod
+    def _context_key(context_fields: Sequence[Any]) -> str:
+        return AnalysisCache.make_key("context", fields=list(context_fields))
+
+    def make_key(self, content: str, context_fields: Sequence[Any]) -> str:
+        """Clave exacta: hash del contenido normalizado + contexto"""
+        digest = calculate_bytes_hash(normalize_content(content).encode("utf-8"))
+        return AnalysisCache.make_key(digest, operation="generate_explanation",
+                                      context=list(context_fields))
+
+    def get(self, content: str, context_fields: Sequence[Any]) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        Busca una respuesta para el contenido y contexto.
+
+        Args:
+            content: Contenido a explicar
+            context_fields: Campos del contexto que afectan a la respuesta
+
+        Returns:
+            (datos del resultado, similitud) o None. La similitud es 1.0 en
+            aciertos exactos.
+        """
+        exact = self.store.get(self.make_key(content, context_fields))
+        if exact is not None:
+            with self._lock:
+                self._stats["exact_hits"] += 1
+            return exact, 1.0
+
+        if self.enable_similarity:
+            match = self._find_similar(content, context_fields)
+            if match is not None:
+                with self._lock:
+                    self._stats["similar_hits"] += 1
+                return match
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def set(self, content: str, context_fields: Sequence[Any], data: Dict[str, Any]) -> None:
+        """
+        Almacena una respuesta.
+
+        Args:
+            content: Contenido explicado
+            context_fields: Campos del contexto
+            data: Resultado serializable (ExplanationResult.to_dict())
+        """
+        key = self.make_key(content, context_fields)
+        self.store.set(key, data)
+
+        if self.enable_similarity:
+            signature = self._hasher.signature(shingles(content))
+            self._index(key, self._context_key(context_fields), signature, math_fingerprint(content))
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "similarity_entries": len(self._signatures),
+                "store": self.store.get_statistics()
+            }
+
+    def _band_keys(self, context_key: str, signature: List[int]) -> List[Tuple[str, int, Tuple[int, ...]]]:
+        return [
+            (context_key, band, tuple(signature[band * self.rows:(band + 1) * self.rows]))
+            for band in range(self.bands)
+        ]
+
+    def _index(self, key: str, context_key: str, signature: List[int], fingerprint: str) -> None:
+        with self._lock:
+            if key in self._signatures:
+                self._unindex(key)
+            self._signatures[key] = (context_key, signature, fingerprint)
+            for band_key in self._band_keys(context_key, signature):
+                self._buckets[band_key].add(key)
+
+            while len(self._signatures) > self.max_similarity_entries:
+                self._unindex(next(iter(self._signatures)))
+
+    def _unindex(self, key: str) -> None:
+        context_key, signature, _ = self._signatures.pop(key)
+        for band_key in self._band_keys(context_key, signature):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def _find_similar(self, content: str, context_fields: Sequence[Any]) -> Optional[Tuple[Dict[str, Any], float]]:
+        context_key = self._context_key(context_fields)
+        signature = self._hasher.signature(shingles(content))
+        fingerprint = math_fingerprint(content)
+
+        with self._lock:
+            candidates: Set[str] = set()
+            for band_key in self._band_keys(context_key, signature):
+                candidates.update(self._buckets.get(band_key, ()))
+
+            # Solo candidatos con las mismas cifras y operadores
+            scored = sorted(
+                ((MinHasher.similarity(signature, self._signatures[key][1]), key)
+                 for key in candidates if self._signatures[key][2] == fingerprint),
+                reverse=True
+            )
+
+        for similarity, key in scored:
+            if similarity < self.similarity_threshold:
+                break
+            data = self.store.get(key)
+            if data is not None:
+                logger.info(f"Respuesta similar encontrada en caché (similitud {similarity:.2f})")
+                return data, similarity
+        return None
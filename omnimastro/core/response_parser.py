@@ -0,0 +1,432 @@
+"""
+Parser de Respuestas JSON de los Modelos
+
+Extrae el objeto JSON de la respuesta de un proveedor en un solo recorrido:
+- Acepta JSON directo, envuelto en vallas ```json o precedido de texto
+- Repara objetos cortados por ``max_tokens`` (cierra strings, listas y
+  objetos y descarta el último token incompleto)
+- Valida y normaliza el resultado con un esquema compilado para las formas
+  de análisis de imagen y de explicación
+- Usa orjson o msgspec si están instalados para decodificar más rápido
+
+Cada resultado se contabiliza (directo, extraído, reparado, descartado),
+de modo que se puede medir cuántas respuestas pagadas acaban sustituidas
+por un marcador de posición.
+"""
+
+import json
+import logging
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    _fast_loads = orjson.loads
+    _DECODE_ERRORS: Tuple[type, ...] = (ValueError,)
+    FAST_JSON_BACKEND: Optional[str] = "orjson"
+except ImportError:
+    try:
+        import msgspec
+        _fast_loads = msgspec.json.decode
+        _DECODE_ERRORS = (ValueError, msgspec.DecodeError)
+        FAST_JSON_BACKEND = "msgspec"
+    except ImportError:
+        _fast_loads = json.loads
+        _DECODE_ERRORS = (ValueError,)
+        FAST_JSON_BACKEND = None
+
+# Caracteres relevantes para delimitar objetos (el resto se salta de golpe)
+_OBJECT_TOKENS = re.compile(r'[{}"\\]')
+_STRUCTURE_TOKENS = re.compile(r'[{}\[\]"\\]')
+
+_COMPLETE_NUMBER = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?')
+_TRAILING_BARE_TOKEN = re.compile(r'[\w.+-]+$')
+_LEADING_INT = re.compile(r'-?\d+')
+
+
+def loads(text: str) -> Any:
+    """Decodifica JSON con el backend más rápido disponible"""
+    return _fast_loads(text)
+
+
+def find_json_objects(text: str) -> Tuple[List[Tuple[int, int]], Optional[int]]:
+    """
+    Localiza los objetos JSON de nivel superior en un solo recorrido.
+
+    Returns:
+        (spans, truncated_start): lista de (inicio, fin) de los objetos
+        balanceados y el inicio de un objeto sin cerrar al final del texto
+        (o None)
+    """
+    spans: List[Tuple[int, int]] = []
+    depth = 0
+    start = 0
+    in_string = False
+    skip_until = -1
+
+    for match in _OBJECT_TOKENS.finditer(text):
+        pos = match.start()
+        if pos < skip_until:
+            continue
+        char = match.group()
+
+        if in_string:
+            if char == "\\":
+                skip_until = pos + 2
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            # Fuera de un objeto las comillas son texto libre
+            in_string = depth > 0
+        elif char == "{":
+            if depth == 0:
+                start = pos
+            depth += 1
+        elif char == "}" and depth > 0:
+            depth -= 1
+            if depth == 0:
+                spans.append((start, pos + 1))
+
+    return spans, (start if depth > 0 else None)
+
+
+def repair_truncated(fragment: str) -> str:
+    """
+    Completa un objeto JSON cortado: cierra el string abierto, descarta el
+    último token incompleto (clave sin valor, literal o número a medias,
+    coma final) y cierra las listas y objetos pendientes.
+    """
+    stack: List[str] = []
+    in_string = False
+    string_start = -1
+    skip_until = -1
+
+    for match in _STRUCTURE_TOKENS.finditer(fragment):
+        pos = match.start()
+        if pos < skip_until:
+            continue
+        char = match.group()
+        if in_string:
+            if char == "\\":
+                skip_until = pos + 2
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+            string_start = pos
+        elif char in "{[":
+            stack.append(char)
+        elif stack:
+            stack.pop()
+
+    text = fragment
+    if in_string:
+        if skip_until > len(text):
+            text = text[:-1]  # Escape a medias
+        text += '"'
+
+    while True:
+        text = text.rstrip()
+        if text.endswith(","):
+            text = text[:-1]
+        elif text.endswith(":"):
+            text = text[:-1]
+        elif text.endswith('"') and stack and stack[-1] == "{":
+            # Un string precedido de '{' o ',' dentro de un objeto es una clave sin valor
+            before = text[:string_start].rstrip()
+            if before.endswith(("{", ",")):
+                text = before
+            break
+        else:
+            token = _TRAILING_BARE_TOKEN.search(text)
+            if (token is not None and token.group() not in ("true", "false", "null")
+                    and not _COMPLETE_NUMBER.fullmatch(token.group())):
+                text = text[:token.start()]
+                continue
+            break
+
+    text = text.rstrip()
+    if text.endswith(","):
+        text = text[:-1]
+    return text + "".join("}" if opener == "{" else "]" for opener in reversed(stack))
+
+
+# --- Esquemas -------------------------------------------------------------
+
+def _as_str(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if value is None:
+        raise ValueError("nulo")
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def _as_str_list(value: Any) -> List[str]:
+    if isinstance(value, str):
+        return [value]
+    if not isinstance(value, list):
+        raise ValueError("no es una lista")
+    return [_as_str(item) for item in value if item is not None]
+
+
+def _as_list(value: Any) -> List[Any]:
+    if not isinstance(value, list):
+        raise ValueError("no es una lista")
+    return value
+
+
+def _as_int(value: Any) -> int:
+    if isinstance(value, bool):
+        raise ValueError("booleano")
+    if isinstance(value, (int, float)):
+        return int(value)
+    # "15 minutos" -> 15
+    match = _LEADING_INT.search(_as_str(value))
+    if match is None:
+        raise ValueError("no es un entero")
+    return int(match.group())
+
+
+def _as_unit_float(value: Any) -> float:
+    if isinstance(value, bool):
+        raise ValueError("booleano")
+    number = float(value)
+    if number > 1 and number <= 100:
+        number /= 100  # Porcentaje
+    return min(1.0, max(0.0, number))
+
+
+def _as_resources(value: Any) -> List[Dict[str, str]]:
+    resources = []
+    for item in _as_list(value):
+        if isinstance(item, dict):
+            resources.append({str(k): _as_str(v) for k, v in item.items() if v is not None})
+        elif isinstance(item, str):
+            resources.append({"title": item})
+    return resources
+
+
+@dataclass(frozen=True)
+class SchemaField:
+    """Campo de un esquema: conversor, valor por defecto y obligatoriedad"""
+    name: str
+    convert: Callable[[Any], Any]
+    default: Callable[[], Any]
+    required: bool = False
+
+
+class Schema:
+    """
+    Esquema compilado: cada campo se convierte con su función y, si falta o
+    no es válido, toma su valor por defecto. Los campos desconocidos se
+    conservan.
+    """
+
+    def __init__(self, name: str, fields: Sequence[SchemaField]):
+        self.name = name
+        self.fields = tuple(fields)
+        self.required = frozenset(f.name for f in self.fields if f.required)
+
+    def validate(self, data: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        Normaliza un objeto.
+
+        Returns:
+            (datos normalizados, lista de problemas encontrados)
+        """
+        result = dict(data)
+        problems: List[str] = []
+        for schema_field in self.fields:
+            value = data.get(schema_field.name)
+            if value is None:
+                if schema_field.required:
+                    problems.append(f"falta {schema_field.name}")
+                result[schema_field.name] = schema_field.default()
+                continue
+            try:
+                result[schema_field.name] = schema_field.convert(value)
+            except (TypeError, ValueError) as e:
+                problems.append(f"{schema_field.name}: {e}")
+                result[schema_field.name] = schema_field.default()
+        return result, problems
+
+    def missing_required(self, data: Dict[str, Any]) -> List[str]:
+        """Campos obligatorios ausentes o nulos"""
+        return [name for name in self.required if data.get(name) is None]
+
+
+ANALYSIS_SCHEMA = Schema("analysis", [
+    SchemaField("subject", _as_str, lambda: "No identificado"),
+    SchemaField("key_concepts", _as_str_list, list),
+    SchemaField("content_type", _as_str, lambda: "text"),
+    SchemaField("complexity", _as_str, lambda: "medium"),
+    SchemaField("visual_elements", _as_list, list),
+    SchemaField("text_content", _as_str, str),
+])
+
+EXPLANATION_SCHEMA = Schema("explanation", [
+    SchemaField("content", _as_str, str, required=True),
+    SchemaField("summary", _as_str, str),
+    SchemaField("key_concepts", _as_str_list, list),
+    SchemaField("difficulty_level", _as_str, lambda: "medium"),
+    SchemaField("estimated_time", _as_int, lambda: 10),
+    SchemaField("follow_up_questions", _as_str_list, list),
+    SchemaField("resources", _as_resources, list),
+    SchemaField("confidence_score", _as_unit_float, lambda: 0.8),
+])
+
+
+# --- Contadores -----------------------------------------------------------
+
+class ParseStats:
+    """Resultados del parseo por esquema (thread-safe)"""
+
+    OUTCOMES = ("direct", "extracted", "repaired", "fallback")
+
+    def __init__(self):
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, schema: str, outcome: str, invalid_fields: int = 0) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(schema, {**{o: 0 for o in self.OUTCOMES}, "invalid_fields": 0})
+            counts[outcome] += 1
+            counts["invalid_fields"] += invalid_fields
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {schema: dict(counts) for schema, counts in self._counts.items()}
+        for counts in stats.values():
+            total = sum(counts[o] for o in self.OUTCOMES)
+            counts["fallback_ratio"] = counts["fallback"] / total if total else 0.0
+        return stats
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = {}
+
+
+_stats = ParseStats()
+
+
+# --- Parseo ---------------------------------------------------------------
+
+@dataclass
+class ParseResult:
+    """Objeto extraído de una respuesta"""
+    data: Dict[str, Any]
+    outcome: str  # 'direct', 'extracted', 'repaired' o 'fallback'
+    problems: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.outcome != "fallback"
+
+
+def _try_object(text: str) -> Optional[Dict[str, Any]]:
+    try:
+        value = loads(text)
+    except _DECODE_ERRORS:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+def extract_object(text: str) -> Tuple[Optional[Dict[str, Any]], str]:
+    """
+    Extrae el objeto JSON de una respuesta.
+
+    Returns:
+        (objeto o None, resultado: 'direct', 'extracted', 'repaired' o 'fallback')
+    """
+    stripped = text.strip()
+    if stripped.startswith("{"):
+        data = _try_object(stripped)
+        if data is not None:
+            return data, "direct"
+
+    spans, truncated_start = find_json_objects(text)
+    for start, end in spans:
+        data = _try_object(text[start:end])
+        if data is not None:
+            return data, "extracted"
+
+    if truncated_start is not None:
+        data = _try_object(repair_truncated(text[truncated_start:]))
+        if data is not None:
+            return data, "repaired"
+
+    return None, "fallback"
+
+
+def parse_response(text: str,
+                   schema: Schema,
+                   fallback: Callable[[str], Dict[str, Any]]) -> ParseResult:
+    """
+    Extrae, repara y valida el objeto de una respuesta.
+
+    Args:
+        text: Texto de la respuesta del modelo
+        schema: Esquema del objeto esperado
+        fallback: Construye el objeto a partir del texto si no hay JSON utilizable
+
+    Returns:
+        ParseResult con los datos normalizados
+    """
+    data, outcome = extract_object(text or "")
+    problems: List[str] = []
+    if data is not None:
+        if schema.missing_required(data):
+            data, outcome = None, "fallback"
+        else:
+            data, problems = schema.validate(data)
+
+    if data is None:
+        data, _ = schema.validate(fallback(text or ""))
+        logger.warning(f"Respuesta sin JSON válido ({schema.name}); usando marcador de posición")
+    elif outcome == "repaired":
+        logger.info(f"Respuesta truncada reparada ({schema.name})")
+
+    _stats.record(schema.name, outcome, invalid_fields=len(problems))
+    return ParseResult(data, outcome, problems)
+
+
+def _analysis_fallback(text: str) -> Dict[str, Any]:
+    return {"text_content": text}
+
+
+def _explanation_fallback(text: str) -> Dict[str, Any]:
+    return {
+        "content": text,
+        "summary": text[:200] + "..." if len(text) > 200 else text,
+        "confidence_score": 0.7
+    }
+
+
+def parse_analysis(text: str) -> Dict[str, Any]:
+    """Objeto de análisis de imagen de una respuesta (con valores por defecto)"""
+    return parse_response(text, ANALYSIS_SCHEMA, _analysis_fallback).data
+
+
+def parse_explanation(text: str) -> Dict[str, Any]:
+    """Objeto de explicación de una respuesta (con valores por defecto)"""
+    return parse_explanation_result(text).data
+
+
+def parse_explanation_result(text: str) -> ParseResult:
+    """Como parse_explanation, pero indica si se recurrió al marcador de posición"""
+    return parse_response(text, EXPLANATION_SCHEMA, _explanation_fallback)
+
+
+def get_parser_statistics() -> Dict[str, Any]:
+    """Resultados del parseo por esquema y backend JSON en uso"""
+    return {"backend": FAST_JSON_BACKEND or "json", "schemas": _stats.get_statistics()}
+
+
+def reset_parser_statistics() -> None:
+    _stats.reset()
@@ -0,0 +1,322 @@
+"""
+Enrutador de Proveedores por Salud, Latencia y Coste
+
+Mantiene por proveedor y operación medias móviles exponenciales (EWMA) de
+latencia, tasa de error y coste por token, y ordena los proveedores con un
+objetivo ponderado. Un circuit breaker expulsa temporalmente a los
+proveedores con fallos repetidos; tras el enfriamiento se deja pasar una
+llamada de prueba antes de readmitirlos. La prueba se reserva al despachar
+la llamada (``dispatch``) y se resuelve con ``record_success``,
+``record_failure`` o, si la llamada se cancela, ``release_probe``.
+"""
+
+import logging
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Precio por millón de tokens (entrada, salida) en USD
+MODEL_PRICING_PER_MTOK: Dict[str, Tuple[float, float]] = {
+    "gpt-4o": (2.50, 10.00),
+    "claude-3-5-sonnet-20241022": (3.00, 15.00),
+}
+
+
+# Fracción del precio de entrada cobrada por los tokens leídos de la caché de prompts
+CACHED_INPUT_PRICE_FACTOR: Dict[str, float] = {
+    "gpt-4o": 0.5,
+    "claude-3-5-sonnet-20241022": 0.1,
+}
+
+# Descuento de las APIs de lotes (OpenAI Batch y Anthropic Message Batches)
+BATCH_PRICE_FACTOR = 0.5
+
+
+def estimate_cost(model: Optional[str],
+                  input_tokens: int,
+                  output_tokens: int,
+                  cached_input_tokens: int = 0) -> float:
+    """
+    Coste estimado de una llamada en USD.
+
+    Args:
+        model: Modelo usado
+        input_tokens: Tokens de entrada totales (incluidos los cacheados)
+        output_tokens: Tokens de salida
+        cached_input_tokens: Tokens de entrada servidos desde la caché de prompts
+
+    Returns:
+        float: Coste, o 0.0 si el modelo no tiene precio conocido
+    """
+    input_price, output_price = MODEL_PRICING_PER_MTOK.get(model, (0.0, 0.0))
+    cached_price = input_price * CACHED_INPUT_PRICE_FACTOR.get(model, 1.0)
+    return ((input_tokens - cached_input_tokens) * input_price
+            + cached_input_tokens * cached_price
+            + output_tokens * output_price) / 1_000_000
+
+
+@dataclass
+class RouterWeights:
+    """Pesos del objetivo (menor puntuación = mejor proveedor)"""
+    latency: float = 1.0  # Sobre la latencia relativa al más rápido
+    cost: float = 0.5  # Sobre el coste por token relativo al más barato
+    errors: float = 4.0  # Sobre la tasa de error (0-1)
+
+
+class CircuitBreaker:
+    """Circuit breaker cerrado / abierto / semiabierto"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, cooldown_seconds: float = 30.0):
+        """
+        Args:
+            failure_threshold: Fallos consecutivos que abren el circuito
+            cooldown_seconds: Tiempo de expulsión antes de la llamada de prueba
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        """Indica si se puede enviar una llamada al proveedor"""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown_seconds:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN:
+            return not self._probe_in_flight
+        return self.state == self.CLOSED
+
+    def on_dispatch(self) -> None:
+        if self.state == self.HALF_OPEN:
+            self._probe_in_flight = True
+
+    def release(self) -> None:
+        """Libera la llamada de prueba sin resolverla (p. ej. cancelada)"""
+        if self.state == self.HALF_OPEN:
+            self._probe_in_flight = False
+
+    def on_success(self) -> None:
+        self.consecutive_failures = 0
+        self.state = self.CLOSED
+
+    def on_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class ProviderHealth:
+    """EWMA de latencia, tasa de error y coste por token de un proveedor/operación"""
+
+    def __init__(self, alpha: float, cost_per_token: Optional[float] = None):
+        self.alpha = alpha
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.cost_per_token = cost_per_token
+        self.calls = 0
+        self.updated_at = 0.0
+
+    def _ewma(self, current: Optional[float], sample: float) -> float:
+        return sample if current is None else (1 - self.alpha) * current + self.alpha * sample
+
+    def record(self, latency: float, error: bool, cost_per_token: Optional[float] = None) -> None:
+        self.calls += 1
+        self.updated_at = time.monotonic()
+        self.error_rate = self._ewma(self.error_rate if self.calls > 1 else None, 1.0 if error else 0.0)
+        if not error:
+            self.latency = self._ewma(self.latency, latency)
+            if cost_per_token is not None:
+                self.cost_per_token = self._ewma(self.cost_per_token, cost_per_token)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "latency": self.latency,
+            "error_rate": round(self.error_rate, 4),
+            "cost_per_token": self.cost_per_token,
+            "calls": self.calls
+        }
+
+
+class ProviderRouter:
+    """
+    Ordena proveedores por un objetivo ponderado de latencia, errores y coste.
+
+    Los proveedores sin datos recientes (``stale_seconds``) se puntúan de
+    forma optimista, de modo que se vuelven a probar periódicamente.
+    """
+
+    def __init__(self,
+                 weights: Optional[RouterWeights] = None,
+                 alpha: float = 0.2,
+                 failure_threshold: int = 5,
+                 cooldown_seconds: float = 30.0,
+                 stale_seconds: float = 300.0,
+                 preference: Sequence[str] = ("anthropic", "openai")):
+        """
+        Inicializa el enrutador.
+
+        Args:
+            weights: Pesos del objetivo
+            alpha: Factor de suavizado de las EWMA
+            failure_threshold: Fallos consecutivos que expulsan a un proveedor
+            cooldown_seconds: Duración de la expulsión
+            stale_seconds: Antigüedad tras la que la latencia observada se ignora
+            preference: Orden de desempate entre proveedores con igual puntuación
+        """
+        self.weights = weights or RouterWeights()
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.stale_seconds = stale_seconds
+        self.preference = list(preference)
+
+        self._models: Dict[str, Optional[str]] = {}
+        self._health: Dict[Tuple[str, str], ProviderHealth] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._decisions: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._last_scores: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, provider: str, model: Optional[str] = None) -> None:
+        """Registra un proveedor y su modelo (para el coste inicial por token)"""
+        with self._lock:
+            self._models[provider] = model
+            self._breaker(provider)
+
+    def _breaker(self, provider: str) -> CircuitBreaker:
+        if provider not in self._breakers:
+            self._breakers[provider] = CircuitBreaker(self.failure_threshold, self.cooldown_seconds)
+        return self._breakers[provider]
+
+    def _get_health(self, provider: str, operation: str) -> ProviderHealth:
+        key = (provider, operation)
+        if key not in self._health:
+            # Coste inicial: precio de entrada, que domina en prompts con imagen
+            prior = estimate_cost(self._models.get(provider), 1, 0) or None
+            self._health[key] = ProviderHealth(self.alpha, prior)
+        return self._health[key]
+
+    def _scores(self, candidates: Sequence[str], operation: str) -> Dict[str, float]:
+        now = time.monotonic()
+        health = {p: self._get_health(p, operation) for p in candidates}
+        fresh = {
+            p: h for p, h in health.items()
+            if h.calls and now - h.updated_at < self.stale_seconds
+        }
+
+        best_latency = min((h.latency for h in fresh.values() if h.latency is not None), default=None)
+        costs = [h.cost_per_token for h in health.values() if h.cost_per_token]
+        best_cost = min(costs, default=None)
+
+        scores = {}
+        for provider, h in health.items():
+            latency_ratio = 1.0
+            if provider in fresh and fresh[provider].latency is not None and best_latency:
+                latency_ratio = fresh[provider].latency / best_latency
+            cost_ratio = h.cost_per_token / best_cost if h.cost_per_token and best_cost else 1.0
+            error_rate = h.error_rate if provider in fresh else 0.0
+            scores[provider] = (
+                self.weights.latency * latency_ratio
+                + self.weights.cost * cost_ratio
+                + self.weights.errors * error_rate
+            )
+        return scores
+
+    def rank(self, candidates: Sequence[str], operation: str) -> List[str]:
+        """
+        Ordena los proveedores para una operación, del mejor al peor.
+
+        Los proveedores con el circuito abierto van al final; solo se usan si
+        no queda ninguno disponible.
+        """
+        with self._lock:
+            return self._rank(candidates, operation)[0]
+
+    def select(self, candidates: Sequence[str], operation: str) -> str:
+        """
+        Elige el proveedor para una llamada y registra la decisión.
+
+        No reserva la llamada de prueba de un circuito semiabierto: eso se
+        hace en ``dispatch``, justo antes de enviar la solicitud.
+        """
+        with self._lock:
+            ranked, scores = self._rank(candidates, operation)
+            chosen = ranked[0]
+            self._decisions[operation][chosen] += 1
+            self._last_scores[operation] = {p: round(s, 4) for p, s in scores.items()}
+            return chosen
+
+    def dispatch(self, provider: str) -> None:
+        """Marca el envío de una solicitud (reserva la prueba si el circuito está semiabierto)"""
+        with self._lock:
+            self._breaker(provider).on_dispatch()
+
+    def release_probe(self, provider: str) -> None:
+        """Libera la prueba de una solicitud despachada que no llegó a resolverse (cancelada)"""
+        with self._lock:
+            self._breaker(provider).release()
+
+    def _rank(self, candidates: Sequence[str], operation: str) -> Tuple[List[str], Dict[str, float]]:
+        if not candidates:
+            raise RuntimeError("No hay proveedores de IA disponibles")
+        for provider in candidates:
+            self._breaker(provider)
+        scores = self._scores(candidates, operation)
+
+        def order(provider: str) -> Tuple[bool, float, int]:
+            rank = self.preference.index(provider) if provider in self.preference else len(self.preference)
+            return (not self._breakers[provider].allow(), scores[provider], rank)
+
+        return sorted(candidates, key=order), scores
+
+    def record_success(self,
+                       provider: str,
+                       operation: str,
+                       latency: float,
+                       input_tokens: int = 0,
+                       output_tokens: int = 0) -> None:
+        """Registra una llamada correcta con su latencia y tokens estimados"""
+        with self._lock:
+            cost_per_token = None
+            total_tokens = input_tokens + output_tokens
+            if total_tokens:
+                cost_per_token = estimate_cost(self._models.get(provider), input_tokens, output_tokens) / total_tokens
+            self._get_health(provider, operation).record(latency, False, cost_per_token or None)
+            self._breaker(provider).on_success()
+
+    def record_failure(self, provider: str, operation: str, latency: float) -> None:
+        """Registra una llamada fallida"""
+        with self._lock:
+            self._get_health(provider, operation).record(latency, True)
+            breaker = self._breaker(provider)
+            was_open = breaker.state == CircuitBreaker.OPEN
+            breaker.on_failure()
+            if breaker.state == CircuitBreaker.OPEN and not was_open:
+                logger.warning(f"Proveedor {provider} expulsado durante {self.cooldown_seconds:.0f}s "
+                               f"tras {breaker.consecutive_failures} fallos")
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "decisions": {op: dict(counts) for op, counts in self._decisions.items()},
+                "last_scores": dict(self._last_scores),
+                "health": {f"{p}.{op}": h.snapshot() for (p, op), h in self._health.items()},
+                "circuit_breakers": {
+                    p: {"state": b.state, "consecutive_failures": b.consecutive_failures, "trips": b.trips}
+                    for p, b in self._breakers.items()
+                }
+            }
@@ -4,13 +4,14 @@ Integrates OCR and image analysis for educational content extraction.
 """
 
 import logging
+import math
 from typing import Dict, List, Optional, Tuple, Any
 from pathlib import Path
 import base64
 from io import BytesIO
 
 try:
-    from PIL import Image, ImageEnhance, ImageFilter
+    from PIL import Image
     PIL_AVAILABLE = True
 except ImportError:
     PIL_AVAILABLE = False
@@ -31,25 +32,120 @@ except ImportError:
     CV2_AVAILABLE = False
     logging.warning("OpenCV not available. Advanced image processing will be limited.")
 
+from .frame import NUMPY_AVAILABLE, Frame
+from .layout import DETECTION_MAX_WIDTH, FULL_FRAME_RATIO, coverage, detect_text_blocks
+from .ocr_backend import OCRWorkerPool
+from .ocr_engine import recognize_packed
+from .ocr_result import OCRResult, OCRWord, run_image_to_data
+from .perceptual_hash import NearDuplicateIndex
+from .preprocessing import get_preprocessor
+from ..shared.cache import AnalysisCache
+from ..shared.utils import calculate_bytes_hash, calculate_file_hash
+
 
 logger = logging.getLogger(__name__)
 
 
+def _scale_rect(rect: Tuple[int, int, int, int],
+                scale: Tuple[float, float],
+                size: Tuple[int, int]) -> Tuple[int, int, int, int]:
+    """Map an (x, y, width, height) rect onto an image resized by ``scale``, covering it fully."""
+    x, y, width, height = rect
+    left, top = int(x * scale[0]), int(y * scale[1])
+    right = min(size[0], math.ceil((x + width) * scale[0]))
+    bottom = min(size[1], math.ceil((y + height) * scale[1]))
+    return left, top, right - left, bottom - top
+
+
+def _unscale_words(words: List[OCRWord], scale: Tuple[float, float]) -> None:
+    """Map word boxes from a resized image back to original image coordinates (in place)."""
+    for word in words:
+        word.left = round(word.left / scale[0])
+        word.top = round(word.top / scale[1])
+        word.width = max(1, round(word.width / scale[0]))
+        word.height = max(1, round(word.height / scale[1]))
+
+
+class AnalysisSession:
+    """
+    Per-screenshot state shared by every analysis stage.
+    
+    OCR is run lazily the first time a detector asks for it and the result
+    (text, confidence and word boxes) is reused by all later stages, so a
+    screenshot costs a single OCR pass no matter how many detectors read it.
+    Pixel views (grayscale, edges, pyramid) are likewise shared through
+    ``frame``.
+    """
+    
+    def __init__(self, analyzer: "ScreenshotAnalyzer", image: "Image.Image",
+                 frame: Optional[Frame] = None):
+        """
+        Create a session for one image.
+        
+        Args:
+            analyzer: Analyzer that owns the OCR configuration
+            image: PIL Image object being analyzed
+            frame: Decoded frame for ``image`` (created if not given)
+        """
+        self.analyzer = analyzer
+        self.image = image
+        self.frame = frame if frame is not None else Frame(image)
+        self._text_result: Optional[Dict[str, Any]] = None
+    
+    @property
+    def text_result(self) -> Dict[str, Any]:
+        """OCR result for the image, computed on first access."""
+        if self._text_result is None:
+            self._text_result = self.analyzer._extract_text(self.frame)
+        return self._text_result
+    
+    @property
+    def text(self) -> str:
+        """Plain text extracted by OCR."""
+        return self.text_result.get("text", "")
+
+
 class ScreenshotAnalyzer:
     """
     Analyzes screenshots to extract text, diagrams, formulas, and educational content.
     Combines OCR with image analysis for comprehensive content extraction.
     """
     
-    def __init__(self, tesseract_cmd: Optional[str] = None, language: str = 'spa'):
+    def __init__(self,
+                 tesseract_cmd: Optional[str] = None,
+                 language: str = 'spa',
+                 ocr_pool: Optional[OCRWorkerPool] = None,
+                 cache: Optional[AnalysisCache] = None,
+                 near_duplicates: Optional[NearDuplicateIndex] = None,
+                 layout_ocr: bool = True,
+                 ocr_recipe: str = "screenshot"):
         """
         Initialize the Screenshot Analyzer.
         
         Args:
             tesseract_cmd: Path to tesseract executable (optional)
             language: OCR language code (default: 'spa' for Spanish)
+            ocr_pool: Pool of persistent Tesseract workers (optional, e.g.
+                      ``get_ocr_pool(['spa'])``). Without it every OCR pass
+                      spawns a new tesseract process.
+            cache: Content-addressed cache for full analysis results (optional)
+            near_duplicates: Perceptual-hash index used to reuse the analysis of
+                             near-identical screenshots before running OCR (optional)
+            layout_ocr: OCR only the detected text blocks instead of the full
+                        frame (requires OpenCV; falls back to a full-frame pass)
+            ocr_recipe: Preprocessing recipe applied before OCR (see
+                        ``preprocessing.RECIPES``, e.g. "otsu" or "adaptive")
+        
+        Raises:
+            ValueError: If ``ocr_recipe`` is not a known recipe
         """
         self.language = language
+        self.ocr_pool = ocr_pool
+        self.cache = cache
+        self.near_duplicates = near_duplicates
+        self.layout_ocr = layout_ocr
+        self.ocr_recipe = ocr_recipe
+        self._preprocessor = get_preprocessor(ocr_recipe)
         
         if TESSERACT_AVAILABLE and tesseract_cmd:
             pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
@@ -59,6 +155,11 @@ class ScreenshotAnalyzer:
         logger.info(f"ScreenshotAnalyzer initialized with language: {language}")
         logger.info(f"PIL Available: {PIL_AVAILABLE}, Tesseract: {TESSERACT_AVAILABLE}, OpenCV: {CV2_AVAILABLE}")
     
+    @property
+    def ocr_available(self) -> bool:
+        """Whether OCR can run (pytesseract installed or a worker pool given)."""
+        return TESSERACT_AVAILABLE or self.ocr_pool is not None
+    
     def analyze_screenshot(self, image_path: str) -> Dict[str, Any]:
         """
         Main method to analyze a screenshot comprehensively.
@@ -75,46 +176,112 @@ class ScreenshotAnalyzer:
             return {"error": "PIL/Pillow is not available"}
         
         try:
-            image = Image.open(image_path)
-            
-            # Perform various analyses
-            results = {
-                "image_info": self._get_image_info(image),
-                "text_extraction": self._extract_text(image),
-                "content_detection": self._detect_content_types(image),
-                "text_regions": self._detect_text_regions(image),
-                "quality_assessment": self._assess_quality(image),
-                "educational_elements": self._detect_educational_elements(image)
-            }
-            
-            logger.info("Screenshot analysis completed successfully")
-            return results
+            digest = calculate_file_hash(image_path) if self.cache is not None else None
+            return self._analyze(lambda: Image.open(image_path), digest)
+        except Exception as e:
+            logger.error(f"Error analyzing screenshot: {e}")
+            return {"error": str(e)}
+    
+    def analyze_image_data(self, image_data: bytes) -> Dict[str, Any]:
+        """
+        Analyze a screenshot held in memory (same results as analyze_screenshot).
+        
+        Blocking; callers on an event loop should run it in an executor.
+        
+        Args:
+            image_data: Encoded image bytes
             
+        Returns:
+            Dictionary containing analysis results
+        """
+        if not PIL_AVAILABLE:
+            return {"error": "PIL/Pillow is not available"}
+        
+        try:
+            digest = calculate_bytes_hash(image_data) if self.cache is not None else None
+            return self._analyze(lambda: Image.open(BytesIO(image_data)), digest)
         except Exception as e:
             logger.error(f"Error analyzing screenshot: {e}")
             return {"error": str(e)}
     
-    def _get_image_info(self, image: Image.Image) -> Dict[str, Any]:
-        """Extract basic image information."""
+    def _analyze(self, open_image, digest: Optional[str]) -> Dict[str, Any]:
+        """Run the full analysis pipeline with cache and near-duplicate lookups."""
+        cache_key = None
+        if self.cache is not None:
+            cache_key = AnalysisCache.make_key(
+                digest,
+                operation="screenshot_analysis",
+                language=self.language,
+                psm="per_block" if self.layout_ocr else 6,
+                preprocessing=self.ocr_recipe,
+                layout="roi" if self.layout_ocr else "full"
+            )
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info("Screenshot analysis served from cache")
+                return cached
+        
+        image = open_image()
+        frame = Frame(image)
+        
+        near_hash = None
+        if self.near_duplicates is not None:
+            near_hash = self.near_duplicates.compute_hash(frame.gray_image if NUMPY_AVAILABLE else image)
+            match = self.near_duplicates.lookup_hash(
+                near_hash, lambda entry: entry["language"] == self.language
+            )
+            if match is not None:
+                distance, entry = match
+                logger.info(f"Near-duplicate screenshot found (distance {distance}), reusing analysis")
+                results = entry["results"]
+                results["image_info"] = self._get_image_info(frame)
+                results["near_duplicate"] = {"distance": distance}
+                return results
+        
+        session = AnalysisSession(self, image, frame)
+        
+        # Perform various analyses (OCR and pixel views are computed once and shared)
+        results = {
+            "image_info": self._get_image_info(frame),
+            "text_extraction": session.text_result,
+            "content_detection": self._detect_content_types(session),
+            "text_regions": self._detect_text_regions(frame),
+            "quality_assessment": self._assess_quality(frame),
+            "educational_elements": self._detect_educational_elements(session)
+        }
+        
+        if cache_key is not None:
+            self.cache.set(cache_key, results)
+        if near_hash is not None:
+            self.near_duplicates.add_hash(
+                near_hash, {"language": self.language, "results": results}
+            )
+        
+        logger.info("Screenshot analysis completed successfully")
+        return results
+    
+    def _get_image_info(self, frame: Frame) -> Dict[str, Any]:
+        """Extract basic image information (decoded size computed, not serialized)."""
+        image = frame.image
         return {
             "width": image.width,
             "height": image.height,
             "format": image.format,
             "mode": image.mode,
-            "size_bytes": len(image.tobytes())
+            "size_bytes": frame.size_bytes
         }
     
-    def _extract_text(self, image: Image.Image) -> Dict[str, Any]:
+    def _extract_text(self, frame: Frame) -> Dict[str, Any]:
         """
         Extract text from image using OCR.
         
         Args:
-            image: PIL Image object
+            frame: Decoded frame of the screenshot
             
         Returns:
             Dictionary with extracted text and metadata
         """
-        if not TESSERACT_AVAILABLE:
+        if not self.ocr_available:
             return {
                 "text": "",
                 "confidence": 0,
@@ -124,48 +291,36 @@ class ScreenshotAnalyzer:
         
         try:
             # Preprocess image for better OCR
-            processed_image = self._preprocess_for_ocr(image)
-            
-            # Extract text with details
-            text = pytesseract.image_to_string(
-                processed_image,
-                lang=self.language,
-                config='--psm 6'  # Assume uniform text block
-            )
-            
-            # Get confidence scores
-            data = pytesseract.image_to_data(
-                processed_image,
-                lang=self.language,
-                output_type=pytesseract.Output.DICT
-            )
-            
-            # Calculate average confidence
-            confidences = [int(conf) for conf in data['conf'] if conf != '-1']
-            avg_confidence = sum(confidences) / len(confidences) if confidences else 0
+            processed_image = self._preprocess_for_ocr(frame)
+            
+            # OCR only the detected text blocks when possible
+            ocr_result, layout = self._run_layout_ocr(frame, processed_image)
+            if ocr_result is None:
+                # Single image_to_data pass: text, confidence and boxes
+                ocr_result = self._run_ocr(processed_image, '--psm 6')  # Assume uniform text block
+            scale = self._ocr_scale(frame, processed_image)
+            if scale != (1.0, 1.0):
+                # The recipe upscaled the image: report boxes in frame coordinates
+                _unscale_words(ocr_result.words, scale)
+            text = ocr_result.text
             
             # Extract words with positions
-            words = []
-            n_boxes = len(data['text'])
-            for i in range(n_boxes):
-                if int(data['conf'][i]) > 60:  # Confidence threshold
-                    words.append({
-                        "text": data['text'][i],
-                        "confidence": int(data['conf'][i]),
-                        "bbox": {
-                            "x": data['left'][i],
-                            "y": data['top'][i],
-                            "width": data['width'][i],
-                            "height": data['height'][i]
-                        }
-                    })
+            words = [
+                {
+                    "text": word.text,
+                    "confidence": word.confidence,
+                    "bbox": word.bbox
+                }
+                for word in ocr_result.words_above(60)  # Confidence threshold
+            ]
             
             return {
                 "text": text.strip(),
-                "confidence": avg_confidence,
-                "word_count": len(text.split()),
+                "confidence": ocr_result.confidence,
+                "word_count": ocr_result.word_count,
                 "words": words,
-                "method": "tesseract_ocr"
+                "method": "tesseract_ocr_roi" if layout and layout["ocr"] == "roi" else "tesseract_ocr",
+                "layout": layout
             }
             
         except Exception as e:
@@ -176,39 +331,93 @@ class ScreenshotAnalyzer:
                 "error": str(e)
             }
     
-    def _preprocess_for_ocr(self, image: Image.Image) -> Image.Image:
+    def _run_layout_ocr(self,
+                        frame: Frame,
+                        processed_image: Image.Image) -> Tuple[Optional[OCRResult], Optional[Dict[str, Any]]]:
         """
-        Preprocess image to improve OCR accuracy.
+        OCR restricted to the text blocks found by the layout pre-pass.
+        
+        Each block is recognized with its own PSM (line, word or uniform
+        block), either as a ``rect`` request to the worker pool or, without a
+        pool, packed into canvases with the other blocks of the same PSM
+        (single lines and words get a canvas each). Results are stitched in
+        reading order, each block tagged with its own region index.
+        Blocks are detected on the frame and mapped onto ``processed_image``,
+        which the recipe may have upscaled; word boxes are returned in
+        ``processed_image`` coordinates.
         
         Args:
-            image: Original PIL Image
+            frame: Decoded frame of the original image (used for block detection)
+            processed_image: Preprocessed image that is actually OCR'd
             
         Returns:
-            Preprocessed PIL Image
+            Tuple (OCRResult or None when a full-frame pass should be used,
+            layout summary or None when the pre-pass did not run)
         """
-        # Convert to grayscale
-        gray = image.convert('L')
-        
-        # Enhance contrast
-        enhancer = ImageEnhance.Contrast(gray)
-        enhanced = enhancer.enhance(2.0)
+        if not self.layout_ocr or not CV2_AVAILABLE:
+            return None, None
+        
+        blocks = detect_text_blocks(frame.gray, small=frame.downscaled(DETECTION_MAX_WIDTH))
+        pixel_ratio = coverage(blocks, frame.size)
+        layout = {"blocks": len(blocks), "pixel_ratio": round(pixel_ratio, 4), "ocr": "roi"}
+        if not blocks or pixel_ratio > FULL_FRAME_RATIO:
+            # Nothing found (avoid missing faint text) or mostly text: one full pass
+            layout["ocr"] = "full"
+            return None, layout
+        
+        scale = self._ocr_scale(frame, processed_image)
+        rects = [_scale_rect(block.rect, scale, processed_image.size) for block in blocks]
+        configs = [f"--psm {block.psm}" for block in blocks]
+        
+        if self.ocr_pool is not None:
+            futures = [
+                self.ocr_pool.submit(processed_image, self.language, config, rect=rect)
+                for config, rect in zip(configs, rects)
+            ]
+            results = [future.result() for future in futures]
+        else:
+            results = recognize_packed(processed_image, rects, self._run_ocr, configs=configs)
         
-        # Sharpen
-        sharpened = enhanced.filter(ImageFilter.SHARPEN)
+        # Stitch in reading order: each detected block is its own region
+        words = []
+        for index, result in enumerate(results):
+            for word in result.words:
+                word.region = index + 1
+                words.append(word)
         
-        # Optional: Apply threshold for better text detection
-        # This converts to pure black and white
-        threshold = 150
-        processed = sharpened.point(lambda x: 0 if x < threshold else 255, '1')
+        logger.info(f"Layout OCR: {len(blocks)} blocks, {pixel_ratio:.1%} of the frame")
+        return OCRResult(words=words), layout
+    
+    @staticmethod
+    def _ocr_scale(frame: Frame, processed_image: Image.Image) -> Tuple[float, float]:
+        """Horizontal and vertical resize applied by the OCR recipe."""
+        return processed_image.width / frame.width, processed_image.height / frame.height
+    
+    def _run_ocr(self, image: Image.Image, config: str) -> OCRResult:
+        """Run one OCR pass, through the worker pool when available."""
+        if self.ocr_pool is not None:
+            return self.ocr_pool.image_to_data(image, self.language, config)
+        return run_image_to_data(image, self.language, config)
+    
+    def _preprocess_for_ocr(self, frame: Frame) -> Image.Image:
+        """
+        Preprocess image to improve OCR accuracy.
         
-        return processed
+        Args:
+            frame: Decoded frame of the original image
+            
+        Returns:
+            Preprocessed grayscale PIL Image (0/255 for thresholding recipes)
+        """
+        # Fused grayscale/contrast/sharpen/threshold pipeline (see preprocessing.py)
+        return self._preprocessor(frame.image, gray=frame.gray if NUMPY_AVAILABLE else None)
     
-    def _detect_text_regions(self, image: Image.Image) -> List[Dict[str, Any]]:
+    def _detect_text_regions(self, frame: Frame) -> List[Dict[str, Any]]:
         """
         Detect regions in the image that contain text.
         
         Args:
-            image: PIL Image object
+            frame: Decoded frame of the screenshot
             
         Returns:
             List of text region bounding boxes
@@ -217,16 +426,9 @@ class ScreenshotAnalyzer:
             return []
         
         try:
-            # Convert PIL to OpenCV format
-            img_array = np.array(image)
-            if len(img_array.shape) == 3:
-                gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-            else:
-                gray = img_array
-            
             # Apply adaptive thresholding
             thresh = cv2.adaptiveThreshold(
-                gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                frame.gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
                 cv2.THRESH_BINARY_INV, 11, 2
             )
             
@@ -241,7 +443,7 @@ class ScreenshotAnalyzer:
                 x, y, w, h = cv2.boundingRect(contour)
                 
                 # Filter by size (likely text regions)
-                if w > 20 and h > 10 and w < image.width * 0.9:
+                if w > 20 and h > 10 and w < frame.width * 0.9:
                     regions.append({
                         "bbox": {"x": int(x), "y": int(y), "width": int(w), "height": int(h)},
                         "area": int(w * h),
@@ -257,12 +459,12 @@ class ScreenshotAnalyzer:
             logger.error(f"Error detecting text regions: {e}")
             return []
     
-    def _detect_content_types(self, image: Image.Image) -> Dict[str, bool]:
+    def _detect_content_types(self, session: AnalysisSession) -> Dict[str, bool]:
         """
         Detect types of content present in the image.
         
         Args:
-            image: PIL Image object
+            session: Analysis session holding the image and its OCR result
             
         Returns:
             Dictionary indicating presence of different content types
@@ -276,13 +478,12 @@ class ScreenshotAnalyzer:
             "has_tables": False
         }
         
-        if not TESSERACT_AVAILABLE:
+        if not self.ocr_available:
             return content_types
         
         try:
-            # Extract text for analysis
-            text_result = self._extract_text(image)
-            text = text_result.get("text", "")
+            # Reuse the session OCR result
+            text = session.text
             
             # Check for text
             content_types["has_text"] = len(text.strip()) > 0
@@ -301,17 +502,16 @@ class ScreenshotAnalyzer:
             
             # Use image analysis for diagrams and charts
             if CV2_AVAILABLE:
-                img_array = np.array(image.convert('L'))
+                gray = session.frame.gray
                 
                 # Detect lines (common in diagrams and charts)
-                edges = cv2.Canny(img_array, 50, 150)
-                lines = cv2.HoughLinesP(edges, 1, np.pi/180, 100, minLineLength=50, maxLineGap=10)
+                lines = cv2.HoughLinesP(session.frame.edges, 1, np.pi/180, 100, minLineLength=50, maxLineGap=10)
                 
                 if lines is not None and len(lines) > 10:
                     content_types["has_diagrams"] = True
                 
                 # Detect circles (common in diagrams)
-                circles = cv2.HoughCircles(img_array, cv2.HOUGH_GRADIENT, 1, 20,
+                circles = cv2.HoughCircles(gray, cv2.HOUGH_GRADIENT, 1, 20,
                                           param1=50, param2=30, minRadius=10, maxRadius=100)
                 
                 if circles is not None and len(circles) > 0:
@@ -323,12 +523,12 @@ class ScreenshotAnalyzer:
             logger.error(f"Error detecting content types: {e}")
             return content_types
     
-    def _assess_quality(self, image: Image.Image) -> Dict[str, Any]:
+    def _assess_quality(self, frame: Frame) -> Dict[str, Any]:
         """
         Assess the quality of the screenshot for text extraction.
         
         Args:
-            image: PIL Image object
+            frame: Decoded frame of the screenshot
             
         Returns:
             Dictionary with quality metrics
@@ -343,7 +543,7 @@ class ScreenshotAnalyzer:
         
         try:
             # Check resolution
-            pixels = image.width * image.height
+            pixels = frame.width * frame.height
             if pixels >= 1920 * 1080:
                 quality["resolution"] = "high"
             elif pixels >= 1280 * 720:
@@ -351,9 +551,8 @@ class ScreenshotAnalyzer:
             else:
                 quality["resolution"] = "low"
             
-            # Convert to grayscale for analysis
-            gray = image.convert('L')
-            img_array = np.array(gray)
+            # Shared grayscale view
+            img_array = frame.gray
             
             # Calculate brightness (average pixel value)
             brightness = np.mean(img_array)
@@ -382,12 +581,12 @@ class ScreenshotAnalyzer:
             logger.error(f"Error assessing quality: {e}")
             return quality
     
-    def _detect_educational_elements(self, image: Image.Image) -> Dict[str, Any]:
+    def _detect_educational_elements(self, session: AnalysisSession) -> Dict[str, Any]:
         """
         Detect specific educational elements in the screenshot.
         
         Args:
-            image: PIL Image object
+            session: Analysis session holding the image and its OCR result
             
         Returns:
             Dictionary with detected educational elements
@@ -401,11 +600,11 @@ class ScreenshotAnalyzer:
             "language": self.language
         }
         
-        if not TESSERACT_AVAILABLE:
+        if not self.ocr_available:
             return elements
         
         try:
-            text = self._extract_text(image).get("text", "").lower()
+            text = session.text.lower()
             
             # Detect questions
             question_markers = ['?', '¿', 'pregunta', 'cuestión', 'problema', 'ejercicio']
@@ -460,11 +659,7 @@ class ScreenshotAnalyzer:
         # Build structured explanation
         explanation = {
             "extracted_text": analysis["text_extraction"].get("text", ""),
-            "content_summary": {
-                "type": self._determine_content_type(analysis),
-                "topics": analysis["educational_elements"].get("topics", []),
-                "complexity": self._estimate_complexity(analysis)
-            },
+            "content_summary": self.summarize_content(analysis),
             "teaching_suggestions": self._generate_teaching_suggestions(analysis),
             "quality_notes": self._get_quality_notes(analysis),
             "raw_analysis": analysis
@@ -472,6 +667,22 @@ class ScreenshotAnalyzer:
         
         return explanation
     
+    def summarize_content(self, analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Summarize an analysis result (type, topics and complexity).
+        
+        Args:
+            analysis: Result of analyze_screenshot / analyze_image_data
+            
+        Returns:
+            Dictionary with the content summary
+        """
+        return {
+            "type": self._determine_content_type(analysis),
+            "topics": analysis["educational_elements"].get("topics", []),
+            "complexity": self._estimate_complexity(analysis)
+        }
+    
     def _determine_content_type(self, analysis: Dict[str, Any]) -> str:
         """Determine the primary type of content in the screenshot."""
         content_detection = analysis.get("content_detection", {})
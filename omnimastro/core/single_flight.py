@@ -0,0 +1,90 @@
+"""
+Coalescencia de Llamadas Idénticas en Curso (single-flight)
+
+Si llegan a la vez varias solicitudes idénticas (misma imagen o contenido,
+mismo contexto y operación), solo la primera llama al proveedor; las demás
+esperan su resultado y reciben una copia independiente. Funciona con o sin
+caché: cubre precisamente la ventana en la que la caché aún está vacía.
+
+Si el líder se cancela o agota su propio plazo, un seguidor que siga activo
+toma el relevo y repite la llamada con su propio plazo.
+"""
+
+import asyncio
+import copy
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+from .resilience import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Agrupa llamadas concurrentes con la misma clave en una sola ejecución"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._followers: Dict[Hashable, int] = {}
+        self._stats = {"leaders": 0, "followers": 0, "takeovers": 0}
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Ejecuta ``func`` o espera a la ejecución en curso con la misma clave.
+
+        Args:
+            key: Clave de la llamada (digest, contexto, operación)
+            func: Función sin argumentos que crea la corrutina
+
+        Returns:
+            El resultado de la ejecución compartida (los seguidores reciben
+            una copia profunda, el líder el objeto original)
+        """
+        future = self._inflight.get(key)
+        if future is not None:
+            return await self._follow(key, future, func)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self._followers[key] = 0
+        self._stats["leaders"] += 1
+
+        try:
+            result = await func()
+        except (asyncio.CancelledError, DeadlineExceeded):
+            # El plazo es del líder, no de los seguidores: se les trata igual
+            # que una cancelación para que uno de ellos tome el relevo
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Marcada como recuperada aunque no haya seguidores
+            raise
+        else:
+            # Instantánea previa a que el líder pueda modificar su resultado
+            future.set_result(copy.deepcopy(result) if self._followers[key] else None)
+            return result
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+                del self._followers[key]
+
+    async def _follow(self, key: Hashable, future: asyncio.Future, func: Callable[[], Awaitable[T]]) -> T:
+        self._followers[key] += 1
+        self._stats["followers"] += 1
+        # asyncio.wait no cancela el futuro compartido si se cancela este
+        # llamador, y retorna normalmente si quien se canceló fue el líder
+        await asyncio.wait({future})
+        if future.cancelled():
+            # El líder fue cancelado, pero este llamador no: tomar el relevo
+            self._stats["takeovers"] += 1
+            return await self.do(key, func)
+        return copy.deepcopy(future.result())
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {**self._stats, "in_flight": len(self._inflight)}
@@ -0,0 +1,179 @@
+"""
+Uso de Tokens por Llamada
+
+Los proveedores reportan el uso real de cada respuesta (tokens de entrada,
+de salida y los servidos desde la caché de prompts del proveedor) mediante
+``record_usage``, además de los tokens estimados de imagen y el tiempo de
+parseo de la respuesta; el motor abre un ``UsageRecorder`` por llamada con
+``track_usage`` (o ``track_stream_usage`` para un stream) y agrega los
+totales por proveedor.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, asdict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class TokenUsage:
+    """Tokens de una respuesta"""
+    input_tokens: int = 0  # Entrada total, incluida la servida desde caché
+    output_tokens: int = 0
+    cached_input_tokens: int = 0  # Leídos de la caché de prompts del proveedor
+    cache_write_tokens: int = 0  # Escritos en la caché (Anthropic)
+
+    @property
+    def uncached_input_tokens(self) -> int:
+        return self.input_tokens - self.cached_input_tokens
+
+    def __add__(self, other: "TokenUsage") -> "TokenUsage":
+        return TokenUsage(
+            self.input_tokens + other.input_tokens,
+            self.output_tokens + other.output_tokens,
+            self.cached_input_tokens + other.cached_input_tokens,
+            self.cache_write_tokens + other.cache_write_tokens
+        )
+
+    def to_dict(self) -> Dict[str, int]:
+        return {**asdict(self), "uncached_input_tokens": self.uncached_input_tokens}
+
+
+def usage_from_openai(usage: Any) -> Optional[TokenUsage]:
+    """Convierte ``response.usage`` de OpenAI (prompt caching automático)"""
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    return TokenUsage(
+        input_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+        output_tokens=getattr(usage, "completion_tokens", 0) or 0,
+        cached_input_tokens=getattr(details, "cached_tokens", 0) or 0
+    )
+
+
+def usage_from_anthropic(usage: Any) -> Optional[TokenUsage]:
+    """
+    Convierte ``response.usage`` de Anthropic. Su ``input_tokens`` excluye
+    los tokens leídos y escritos en caché, que se suman aquí al total.
+    """
+    if usage is None:
+        return None
+    cache_read = getattr(usage, "cache_read_input_tokens", 0) or 0
+    cache_write = getattr(usage, "cache_creation_input_tokens", 0) or 0
+    return TokenUsage(
+        input_tokens=(getattr(usage, "input_tokens", 0) or 0) + cache_read + cache_write,
+        output_tokens=getattr(usage, "output_tokens", 0) or 0,
+        cached_input_tokens=cache_read,
+        cache_write_tokens=cache_write
+    )
+
+
+class UsageRecorder:
+    """Acumula el uso reportado durante una llamada"""
+
+    def __init__(self):
+        self.records: List[TokenUsage] = []
+        self.image_tokens = 0
+        self.parse_seconds = 0.0
+
+    @property
+    def total(self) -> Optional[TokenUsage]:
+        if not self.records:
+            return None
+        total = TokenUsage()
+        for record in self.records:
+            total = total + record
+        return total
+
+
+_current_recorder: ContextVar[Optional[UsageRecorder]] = ContextVar("omnimastro_usage", default=None)
+
+
+def record_usage(usage: Optional[TokenUsage]) -> None:
+    """Registra el uso de una respuesta en la llamada en curso (si se está midiendo)"""
+    recorder = _current_recorder.get()
+    if recorder is not None and usage is not None:
+        recorder.records.append(usage)
+
+
+def record_image_tokens(tokens: int) -> None:
+    """Registra los tokens estimados de una imagen enviada en la llamada en curso"""
+    recorder = _current_recorder.get()
+    if recorder is not None:
+        recorder.image_tokens += tokens
+
+
+@contextmanager
+def measure_parse() -> Iterator[None]:
+    """Mide el tiempo de parseo de una respuesta dentro de la llamada en curso"""
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        recorder = _current_recorder.get()
+        if recorder is not None:
+            recorder.parse_seconds += time.monotonic() - start
+
+
+@contextmanager
+def track_usage(recorder: Optional[UsageRecorder] = None) -> Iterator[UsageRecorder]:
+    """
+    Mide el uso de tokens de las respuestas recibidas dentro del bloque.
+
+    El bloque no debe contener ``yield`` de un generador asíncrono: el
+    consumidor lo reanuda desde su propio contexto (ver track_stream_usage).
+    """
+    recorder = recorder if recorder is not None else UsageRecorder()
+    token = _current_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current_recorder.reset(token)
+
+
+async def track_stream_usage(stream: AsyncIterator[T], recorder: UsageRecorder) -> AsyncIterator[T]:
+    """
+    Itera un stream midiendo en ``recorder`` el uso reportado al producir
+    cada elemento. El recorder solo está activo mientras se espera al
+    stream, nunca entre elementos, así que no se filtra al código del
+    consumidor ni a otros streams intercalados.
+    """
+    try:
+        while True:
+            with track_usage(recorder):
+                try:
+                    item = await stream.__anext__()
+                except StopAsyncIteration:
+                    return
+            yield item
+    finally:
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+class UsageTotals:
+    """Totales de uso por proveedor (thread-safe)"""
+
+    def __init__(self):
+        self._totals: Dict[str, TokenUsage] = {}
+        self._lock = threading.Lock()
+
+    def add(self, provider: str, usage: TokenUsage) -> None:
+        with self._lock:
+            self._totals[provider] = self._totals.get(provider, TokenUsage()) + usage
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            totals = dict(self._totals)
+        stats = {}
+        for provider, usage in totals.items():
+            stats[provider] = {
+                **usage.to_dict(),
+                "cached_ratio": usage.cached_input_tokens / usage.input_tokens if usage.input_tokens else 0.0
+            }
+        return stats
@@ -0,0 +1,260 @@
+"""
+Caché de Análisis Direccionada por Contenido
+
+Caché de dos niveles para resultados de análisis (OCR, análisis de
+capturas, respuestas de IA) con clave = hash del contenido de la imagen
+más los parámetros relevantes:
+- Nivel en memoria: LRU acotado por entradas y bytes
+- Nivel en disco: archivos bajo DATA_DIR/cache/<namespace>
+- Expiración por TTL y contadores de aciertos/fallos
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+from .utils import ensure_directory
+
+logger = logging.getLogger(__name__)
+
+
+def _json_default(value: Any) -> Any:
+    """Serializa escalares de NumPy y otros tipos con ``item()``"""
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+class AnalysisCache:
+    """
+    Caché LRU en memoria con respaldo opcional en disco.
+
+    Los valores deben ser serializables a JSON; se guardan serializados,
+    así cada lectura devuelve una copia independiente que el llamador
+    puede modificar sin afectar a la caché.
+    """
+
+    def __init__(self,
+                 namespace: str,
+                 max_entries: int = 256,
+                 max_memory_bytes: int = 64 * 1024 * 1024,
+                 ttl_seconds: Optional[float] = None,
+                 disk_dir: Optional[Union[str, Path]] = None,
+                 use_disk: bool = True,
+                 max_disk_bytes: int = 512 * 1024 * 1024):
+        """
+        Inicializa la caché.
+
+        Args:
+            namespace: Nombre del espacio (ej: 'ocr', 'screenshot_analysis')
+            max_entries: Máximo de entradas en memoria
+            max_memory_bytes: Máximo de bytes serializados en memoria
+            ttl_seconds: Tiempo de vida de las entradas (None = sin expiración)
+            disk_dir: Directorio base del nivel en disco (por defecto DATA_DIR/cache)
+            use_disk: Si se usa el nivel en disco
+            max_disk_bytes: Tamaño máximo del nivel en disco
+        """
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.max_memory_bytes = max_memory_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_bytes = max_disk_bytes
+
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+        self.disk_dir: Optional[Path] = None
+        if use_disk:
+            if disk_dir is None:
+                from .config import DATA_DIR
+                disk_dir = DATA_DIR / "cache"
+            self.disk_dir = ensure_directory(Path(disk_dir) / namespace)
+
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "expired": 0
+        }
+
+    @staticmethod
+    def make_key(digest: str, **params: Any) -> str:
+        """
+        Construye una clave a partir del hash del contenido y los parámetros.
+
+        Args:
+            digest: Hash del contenido (imagen, texto...)
+            **params: Parámetros que afectan al resultado (idioma, PSM, modelo...)
+
+        Returns:
+            str: Clave hexadecimal estable
+        """
+        payload = json.dumps(params, sort_keys=True, default=str)
+        return hashlib.sha256(f"{digest}:{payload}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Obtiene un valor de la caché (memoria primero, luego disco).
+
+        Args:
+            key: Clave generada con make_key
+
+        Returns:
+            El valor almacenado o None si no existe o expiró
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, payload = entry
+                if self._is_expired(created):
+                    self._remove_memory(key)
+                    self._stats["expired"] += 1
+                else:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return json.loads(payload)
+
+            stored = self._read_disk(key)
+            if stored is not None:
+                created, payload = stored
+                self._store_memory(key, created, payload)
+                self._stats["disk_hits"] += 1
+                return json.loads(payload)
+
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Almacena un valor en ambos niveles.
+
+        Args:
+            key: Clave generada con make_key
+            value: Valor serializable a JSON
+        """
+        try:
+            payload = json.dumps(value, ensure_ascii=False, default=_json_default)
+        except (TypeError, ValueError) as e:
+            logger.debug(f"Valor no cacheable en {self.namespace}: {e}")
+            return
+
+        created = time.time()
+        with self._lock:
+            self._store_memory(key, created, payload)
+            self._write_disk(key, created, payload)
+            self._stats["sets"] += 1
+
+    def clear(self) -> None:
+        """Vacía ambos niveles"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            if self.disk_dir is not None:
+                for path in self.disk_dir.glob("*/*.cache"):
+                    path.unlink(missing_ok=True)
+                self._disk_bytes = 0
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Obtiene contadores de aciertos, fallos y ocupación"""
+        with self._lock:
+            hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+            lookups = hits + self._stats["misses"]
+            return {
+                **self._stats,
+                "hits": hits,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes or 0
+            }
+
+    def _is_expired(self, created: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created > self.ttl_seconds
+
+    def _store_memory(self, key: str, created: float, payload: str) -> None:
+        if key in self._memory:
+            self._remove_memory(key)
+
+        self._memory[key] = (created, payload)
+        self._memory_bytes += len(payload)
+
+        while self._memory and (len(self._memory) > self.max_entries or
+                                self._memory_bytes > self.max_memory_bytes):
+            oldest = next(iter(self._memory))
+            self._remove_memory(oldest)
+            self._stats["evictions"] += 1
+
+    def _remove_memory(self, key: str) -> None:
+        _, payload = self._memory.pop(key)
+        self._memory_bytes -= len(payload)
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.cache"
+
+    def _read_disk(self, key: str) -> Optional[Tuple[float, str]]:
+        if self.disk_dir is None:
+            return None
+
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                created = float(f.readline())
+                payload = f.read()
+        except (OSError, ValueError):
+            return None
+
+        if self._is_expired(created):
+            path.unlink(missing_ok=True)
+            self._stats["expired"] += 1
+            return None
+
+        return created, payload
+
+    def _write_disk(self, key: str, created: float, payload: str) -> None:
+        if self.disk_dir is None:
+            return
+
+        path = self._disk_path(key)
+        previous_size = path.stat().st_size if path.exists() else 0
+        try:
+            ensure_directory(path.parent)
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(f"{created}\n")
+                f.write(payload)
+            tmp_path.replace(path)
+        except (OSError, ValueError) as e:
+            # ValueError incluye UnicodeEncodeError (p. ej. un surrogate suelto en el payload)
+            logger.warning(f"No se pudo escribir caché en disco: {e}")
+            return
+
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(p.stat().st_size for p in self.disk_dir.glob("*/*.cache"))
+        else:
+            self._disk_bytes += path.stat().st_size - previous_size
+
+        if self._disk_bytes > self.max_disk_bytes:
+            self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        """Elimina los archivos más antiguos hasta bajar del límite"""
+        files = sorted(self.disk_dir.glob("*/*.cache"), key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in files)
+
+        for path in files:
+            if total <= self.max_disk_bytes:
+                break
+            total -= path.stat().st_size
+            path.unlink(missing_ok=True)
+            self._stats["evictions"] += 1
+
+        self._disk_bytes = total
@@ -27,6 +27,21 @@ def calculate_file_hash(file_path: Union[str, Path], algorithm: str = "sha256")
     
     return hash_func.hexdigest()
 
+def calculate_bytes_hash(data: Union[bytes, bytearray, memoryview], algorithm: str = "sha256") -> str:
+    """
+    Calcula el hash de datos en memoria.
+    
+    Args:
+        data: Bytes a resumir
+        algorithm: Algoritmo de hash (sha256, md5, etc.)
+    
+    Returns:
+        str: Hash hexadecimal de los datos
+    """
+    hash_func = hashlib.new(algorithm)
+    hash_func.update(data)
+    return hash_func.hexdigest()
+
 def ensure_directory(path: Union[str, Path]) -> Path:
     """
     Asegura que un directorio existe, creándolo si es necesario.
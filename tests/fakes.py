@@ -0,0 +1,94 @@
+"""Proveedor de IA falso para probar el motor sin red ni SDKs"""
+
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from omnimastro.core.ai_engine import AIEngine, AIProvider, AIProviderInterface, AnalysisContext, ExplanationResult
+from omnimastro.core.usage import TokenUsage, record_usage
+
+EXPLANATION = {
+    "content": "Se factoriza la ecuación y se igualan los factores a cero.",
+    "summary": "Ecuación de segundo grado",
+    "key_concepts": ["factorización"],
+    "difficulty_level": "medium",
+    "estimated_time": 5,
+}
+
+
+class FakeProvider(AIProviderInterface):
+    """
+    Proveedor que responde tras ``delay`` segundos o lanza ``error``.
+
+    Cuenta las llamadas recibidas; ``chunks`` fija los fragmentos de texto
+    que emite ``stream_explanation`` (por defecto la explicación en JSON),
+    ``text`` la respuesta cruda que parsea ``generate_explanation`` y
+    ``usage`` el uso que reporta cada respuesta o fragmento.
+    """
+
+    def __init__(self,
+                 provider: AIProvider = AIProvider.OPENAI,
+                 delay: float = 0.0,
+                 error: Optional[BaseException] = None,
+                 chunks: Optional[List[str]] = None,
+                 usage: Optional[TokenUsage] = None,
+                 text: Optional[str] = None):
+        self.provider = provider
+        self.model = f"fake-{provider.value}"
+        self.delay = delay
+        self.error = error
+        self.chunks = chunks
+        self.usage = usage
+        self.text = text
+        self.calls = 0
+
+    def is_available(self) -> bool:
+        return True
+
+    async def aclose(self) -> None:
+        pass
+
+    async def _respond(self) -> None:
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        record_usage(self.usage)
+
+    async def analyze_image(self, image_data: bytes, context: AnalysisContext) -> Dict[str, Any]:
+        await self._respond()
+        return {"subject": "math", "complexity": "medium", "text_content": "x² + 5x - 6 = 0"}
+
+    async def generate_explanation(self, content: str, context: AnalysisContext) -> ExplanationResult:
+        await self._respond()
+        if self.text is None:
+            return self._create_explanation_result(dict(EXPLANATION), self.provider)
+        parsed = self._parse_explanation_result(self.text)
+        return self._create_explanation_result(parsed.data, self.provider, parse_fallback=not parsed.ok)
+
+    async def enhance_explanation(self, explanation: str, feedback: str, context: AnalysisContext) -> str:
+        await self._respond()
+        return explanation
+
+    def _explanation_request(self, content: str, context: AnalysisContext) -> Dict[str, Any]:
+        return {"model": self.model, "content": content, "level": context.education_level.value}
+
+    async def stream_explanation(self, content: str, context: AnalysisContext) -> AsyncIterator[str]:
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        for chunk in self.chunks if self.chunks is not None else [json.dumps(EXPLANATION, ensure_ascii=False)]:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            record_usage(self.usage)
+            yield chunk
+
+
+def make_engine(*providers: FakeProvider, **kwargs: Any) -> AIEngine:
+    """Motor sin claves cuyos únicos proveedores son ``providers``"""
+    engine = AIEngine(openai_key="", anthropic_key="", **kwargs)
+    engine.providers = {p.provider: p for p in providers}
+    for p in providers:
+        engine.router.register(p.provider.value, p.model)
+    return engine
@@ -0,0 +1,157 @@
+"""Trabajos de lotes: envío, consulta y reanudación desde el archivo de estado"""
+
+import asyncio
+import json
+
+import pytest
+
+from omnimastro.core.ai_engine import AIProvider
+from omnimastro.core.batch_jobs import BatchBackend, BatchItemResult, BatchStatus, BulkExplanationJob
+
+from tests.fakes import EXPLANATION, FakeProvider, make_engine
+
+
+class MemoryBatchBackend(BatchBackend):
+    """Servidor de lotes en memoria: los lotes terminan al consultarlos ``rounds`` veces"""
+
+    provider = AIProvider.OPENAI
+
+    def __init__(self, rounds: int = 1):
+        self.rounds = rounds
+        self.batches = {}  # batch_id -> {"requests", "submission_id", "polls"}
+        self.submissions = 0
+
+    def request_line(self, custom_id, params):
+        return {"custom_id": custom_id, "body": params}
+
+    async def submit(self, path, submission_id):
+        self.submissions += 1
+        batch_id = f"batch_{len(self.batches)}"
+        with open(path, encoding="utf-8") as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+        self.batches[batch_id] = {"requests": requests, "submission_id": submission_id, "polls": 0}
+        return batch_id
+
+    async def find(self, submission_id, since):
+        for batch_id, batch in self.batches.items():
+            if batch["submission_id"] == submission_id:
+                return batch_id
+        return None
+
+    async def status(self, batch_id):
+        batch = self.batches[batch_id]
+        batch["polls"] += 1
+        ended = batch["polls"] >= self.rounds
+        return BatchStatus(batch_id, "completed" if ended else "in_progress", ended)
+
+    async def results(self, batch_id):
+        return [
+            BatchItemResult(request["custom_id"], text=json.dumps({**EXPLANATION, "summary": request["body"]["content"]}))
+            for request in self.batches[batch_id]["requests"]
+        ]
+
+
+class Crash(Exception):
+    pass
+
+
+def _add_pages(job):
+    for page in ("x + 1 = 2", "2x = 4", "x + 1 = 2"):
+        job.add(page, key=page)
+
+
+def test_submit_poll_and_resume_round_trip(tmp_path):
+    async def scenario():
+        engine, backend = make_engine(FakeProvider()), MemoryBatchBackend(rounds=2)
+        path = tmp_path / "libro.json"
+        job = BulkExplanationJob(engine, path, backend=backend)
+        _add_pages(job)
+        assert len(await job.submit()) == 1
+        assert not await job.poll()
+
+        resumed = BulkExplanationJob(engine, path, backend=backend)
+        assert await resumed.submit() == []
+        assert await resumed.poll()
+        return backend, resumed
+
+    backend, job = asyncio.run(scenario())
+    assert backend.submissions == 1
+    assert len(backend.batches["batch_0"]["requests"]) == 2  # Páginas repetidas se envían una vez
+    results = job.results_by_key()
+    assert sorted(results) == ["2x = 4", "x + 1 = 2"]
+    assert results["2x = 4"].result.summary == "2x = 4"
+    assert job.get_statistics()["requests"] == {"succeeded": 2}
+
+
+def test_crash_between_submit_and_save_does_not_resubmit(tmp_path, monkeypatch):
+    async def scenario():
+        engine, backend = make_engine(FakeProvider()), MemoryBatchBackend()
+        path = tmp_path / "libro.json"
+        job = BulkExplanationJob(engine, path, backend=backend)
+        _add_pages(job)
+
+        submit = backend.submit
+
+        async def submit_then_crash(*args):
+            await submit(*args)
+            raise Crash()  # El proceso cae antes de guardar el id del lote
+
+        monkeypatch.setattr(backend, "submit", submit_then_crash)
+        with pytest.raises(Crash):
+            await job.submit()
+        monkeypatch.setattr(backend, "submit", submit)
+
+        resumed = BulkExplanationJob(engine, path, backend=backend)
+        assert await resumed.submit() == ["batch_0"]
+        assert await resumed.poll()
+        return backend, resumed
+
+    backend, job = asyncio.run(scenario())
+    assert backend.submissions == 1
+    assert len(job.results()) == 2
+
+
+def test_unlocated_interrupted_submission_is_resent(tmp_path, monkeypatch):
+    async def scenario():
+        engine, backend = make_engine(FakeProvider()), MemoryBatchBackend()
+        path = tmp_path / "libro.json"
+        job = BulkExplanationJob(engine, path, backend=backend)
+        _add_pages(job)
+
+        async def lost_submit(*args):
+            raise Crash()  # Caída antes de que el proveedor reciba el lote
+
+        monkeypatch.setattr(backend, "submit", lost_submit)
+        with pytest.raises(Crash):
+            await job.submit()
+        monkeypatch.undo()
+
+        resumed = BulkExplanationJob(engine, path, backend=backend)
+        assert await resumed.submit() == ["batch_0"]
+        assert await resumed.poll()
+        return backend, resumed
+
+    backend, job = asyncio.run(scenario())
+    assert backend.submissions == 1
+    assert len(job.results()) == 2
+
+
+def test_unparseable_item_is_errored(tmp_path):
+    class GarbageBackend(MemoryBatchBackend):
+        async def results(self, batch_id):
+            items = await super().results(batch_id)
+            items[0].text = "Lo siento, no puedo"
+            return items
+
+    async def scenario():
+        engine = make_engine(FakeProvider())
+        job = BulkExplanationJob(engine, tmp_path / "libro.json", backend=GarbageBackend())
+        _add_pages(job)
+        await job.run(poll_interval=0)
+        return engine, job
+
+    engine, job = asyncio.run(scenario())
+    assert job.get_statistics()["requests"] == {"errored": 1, "succeeded": 1}
+    assert sum(1 for r in job.results() if r.error is not None) == 1
+    assert engine.metrics.counter_total("batch_requests", status="error") == 1
+    assert engine.metrics.counter_total("batch_requests", status="ok") == 1
@@ -0,0 +1,10 @@
+"""Caché de análisis en memoria y disco"""
+
+from omnimastro.shared.cache import AnalysisCache
+
+
+def test_unencodable_payload_is_kept_in_memory_only(tmp_path):
+    cache = AnalysisCache(namespace="test", disk_dir=tmp_path)
+    cache.set("key", {"content": "\ud800"})
+    assert cache.get("key") == {"content": "\ud800"}
+    assert not list(tmp_path.glob("*/*.cache"))
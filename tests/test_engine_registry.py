@@ -0,0 +1,37 @@
+"""Motores compartidos por event loop"""
+
+import asyncio
+
+from omnimastro.core import ai_engine
+from omnimastro.core.ai_engine import close_engines, engine_scope, get_engine
+
+
+def test_shared_engine_is_reused_within_a_loop():
+    async def scenario():
+        engine = get_engine()
+        assert get_engine() is engine
+        await close_engines()
+        return engine
+
+    assert asyncio.run(scenario())._closed
+
+
+def test_engine_scope_closes_the_loop_engines():
+    async def scenario():
+        async with engine_scope():
+            engine = get_engine()
+            assert not engine._closed
+        return engine
+
+    first = asyncio.run(scenario())
+    assert first._closed
+    assert asyncio.run(scenario()) is not first
+
+
+def test_engines_obtained_without_a_loop_are_closed_at_exit():
+    engine = get_engine()
+    assert get_engine() is engine
+    ai_engine._close_engines_at_exit()
+    assert engine._closed
+    assert get_engine() is not engine
+    ai_engine._close_engines_at_exit()
@@ -0,0 +1,66 @@
+"""Explicación concurrente de muchas capturas"""
+
+import asyncio
+
+from omnimastro.core.ai_engine import AnalysisContext, EducationLevel
+
+from tests.fakes import FakeProvider, make_engine
+
+
+def _engine_with_delays(monkeypatch):
+    """Motor cuyo pipeline tarda ``image[0]`` centésimas y falla con b"!" """
+    engine = make_engine(FakeProvider())
+    state = {"running": 0, "peak": 0, "contexts": []}
+
+    async def explain_screenshot(image_data, context=None, provider=None):
+        state["running"] += 1
+        state["peak"] = max(state["peak"], state["running"])
+        try:
+            state["contexts"].append(context)
+            if context is not None:
+                context.subject_area = "modificado"
+            await asyncio.sleep(image_data[0] / 100)
+            if image_data.endswith(b"!"):
+                raise ValueError("imagen ilegible")
+            return image_data
+        finally:
+            state["running"] -= 1
+
+    monkeypatch.setattr(engine, "explain_screenshot", explain_screenshot)
+    return engine, state
+
+
+def test_results_arrive_as_they_finish_with_their_input_index(monkeypatch):
+    engine, _ = _engine_with_delays(monkeypatch)
+    images = [bytes([3]), bytes([1]), bytes([2]) + b"!", bytes([0])]
+
+    async def scenario():
+        return [item async for item in engine.explain_many(images)]
+
+    items = asyncio.run(scenario())
+
+    assert [item.index for item in items] == [3, 1, 2, 0]
+    assert [item.result for item in items if item.ok] == [images[3], images[1], images[0]]
+    assert isinstance(items[2].error, ValueError) and items[2].result is None
+
+
+def test_sync_variant_returns_input_order(monkeypatch):
+    engine, _ = _engine_with_delays(monkeypatch)
+    images = [bytes([delay]) for delay in (4, 0, 2, 1)]
+
+    items = engine.explain_many_sync(images)
+
+    assert [item.index for item in items] == [0, 1, 2, 3]
+    assert [item.result for item in items] == images
+
+
+def test_concurrency_is_bounded_and_contexts_are_copied(monkeypatch):
+    engine, state = _engine_with_delays(monkeypatch)
+    contexts = [AnalysisContext(EducationLevel.HIGH_SCHOOL, subject_area="álgebra") for _ in range(10)]
+
+    items = engine.explain_many_sync((bytes([1]) for _ in range(10)), contexts, max_concurrency=3)
+
+    assert len(items) == 10 and all(item.ok for item in items)
+    assert state["peak"] == 3
+    assert all(context.subject_area == "álgebra" for context in contexts)
+    assert not {id(c) for c in state["contexts"]} & {id(c) for c in contexts}
@@ -0,0 +1,55 @@
+"""Vistas compartidas de un fotograma"""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from omnimastro.core import frame as frame_module
+from omnimastro.core.frame import Frame
+
+
+def _photo(width=200, height=120, mode="RGB"):
+    rng = np.random.default_rng(0)
+    return Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8)).convert(mode)
+
+
+def test_views_are_computed_once_and_shared():
+    frame = Frame(_photo())
+
+    assert frame.rgb is frame.rgb
+    assert frame.gray is frame.gray
+    assert frame.gray_image is frame.gray_image
+    assert frame.pyramid(2) is frame.pyramid(2)
+    assert np.array_equal(frame.gray, np.asarray(frame.image.convert("L")))
+    assert np.array_equal(np.asarray(frame.gray_image), frame.gray)
+
+
+@pytest.mark.parametrize("mode", ["RGB", "RGBA", "L", "1"])
+def test_size_bytes_matches_decoded_pixels(mode):
+    image = _photo(mode=mode)
+    assert Frame(image).size_bytes == len(image.tobytes())
+
+
+def test_grayscale_frame_reuses_the_image():
+    image = _photo(mode="L")
+    frame = Frame(image)
+    assert frame.gray_image is image
+    assert frame.downscaled(500) is frame.gray
+
+
+def test_pyramid_halves_each_level(monkeypatch):
+    monkeypatch.setattr(frame_module, "CV2_AVAILABLE", False)
+    frame = Frame(_photo(201, 121))
+
+    assert [frame.pyramid(level).shape for level in range(4)] == [(121, 201), (60, 100), (30, 50), (15, 25)]
+    expected = frame.gray[:2, :2].mean()
+    assert abs(int(frame.pyramid(1)[0, 0]) - expected) <= 0.5
+
+
+def test_downscaled_without_opencv_uses_nearest_wider_level(monkeypatch):
+    monkeypatch.setattr(frame_module, "CV2_AVAILABLE", False)
+    frame = Frame(_photo(200, 120))
+
+    assert frame.downscaled(60) is frame.pyramid(1)  # 100 px: la mitad ya no llega a 60
+    assert frame.downscaled(50) is frame.pyramid(2)
+    assert frame.downscaled(200) is frame.gray
@@ -0,0 +1,49 @@
+"""Latencias de llamadas canceladas en el seguimiento del hedging"""
+
+import asyncio
+
+from omnimastro.core.hedging import LatencyTracker
+
+from tests.fakes import FakeProvider, make_engine
+
+KEY = ("openai", "generate_explanation")
+
+
+def _tracker(*samples: float) -> LatencyTracker:
+    tracker = LatencyTracker()
+    for seconds in samples:
+        tracker.record(KEY, seconds)
+    return tracker
+
+
+def test_censored_sample_below_quantile_is_dropped():
+    tracker = _tracker(*[1.0] * 10)
+    assert not tracker.record_censored(KEY, 0.2, 0.9)
+    assert tracker.count(KEY) == 10
+    assert tracker.quantile(KEY, 0.5) == 1.0
+
+
+def test_censored_sample_past_quantile_is_recorded():
+    tracker = _tracker(*[1.0] * 10)
+    assert tracker.record_censored(KEY, 3.0, 0.9)
+    assert tracker.count(KEY) == 11
+
+
+def test_censored_sample_without_history_is_dropped():
+    assert not LatencyTracker().record_censored(KEY, 3.0, 0.9)
+
+
+def test_early_cancellation_does_not_lower_p90():
+    async def scenario():
+        engine = make_engine(FakeProvider(delay=10.0))
+        for _ in range(10):
+            engine._latency.record(KEY, 1.0)
+        task = asyncio.ensure_future(engine.generate_explanation("x + 1 = 2"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return engine._latency
+
+    latency = asyncio.run(scenario())
+    assert latency.count(KEY) == 10
+    assert latency.quantile(KEY, 0.9) == 1.0
@@ -0,0 +1,68 @@
+"""Preparación de imágenes antes de las llamadas de visión"""
+
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from omnimastro.core.image_prep import detect_image_format, estimate_image_tokens, prepare_image
+
+
+def _encode(image, fmt="PNG", **params) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, fmt, **params)
+    return buffer.getvalue()
+
+
+def _photo(width, height, mode="RGB"):
+    rng = np.random.default_rng(0)
+    channels = 4 if mode == "RGBA" else 3
+    return Image.fromarray(rng.integers(0, 256, (height, width, channels), dtype=np.uint8), mode)
+
+
+def test_format_is_detected_from_magic_bytes():
+    image = Image.new("RGB", (4, 4), "white")
+    assert [detect_image_format(_encode(image, fmt)) for fmt in ("PNG", "JPEG", "GIF", "WEBP")] == \
+        ["png", "jpeg", "gif", "webp"]
+    assert detect_image_format(b"RIFF\x00\x00\x00\x00WAVE") is None
+
+
+def test_token_estimates_follow_provider_formulas():
+    assert estimate_image_tokens("openai", 1024, 768) == 85 + 170 * 4
+    assert estimate_image_tokens("anthropic", 1500, 750) == 1500
+    assert estimate_image_tokens("anthropic", 0, 750) is None
+    assert estimate_image_tokens("otro", 100, 100) is None
+
+
+def test_large_photo_is_resized_flattened_and_sent_as_jpeg():
+    data = _encode(_photo(3000, 2000, "RGBA"))
+
+    anthropic = prepare_image(data, "anthropic")
+    openai = prepare_image(data, "openai")
+
+    assert anthropic.media_type == "image/jpeg" and anthropic.original_format == "png"
+    assert max(anthropic.width, anthropic.height) <= 1568
+    assert anthropic.width * anthropic.height <= 1_150_000
+    assert min(openai.width, openai.height) == 768 and openai.detail == "high"
+    assert Image.open(BytesIO(anthropic.data)).mode == "RGB"
+    assert anthropic.report()["reduction"] > 0.5
+
+
+def test_ui_capture_borders_are_cropped_and_kept_as_png():
+    page = Image.new("RGB", (1200, 900), (30, 30, 30))
+    ImageDraw.Draw(page).rectangle((100, 100, 699, 399), fill="white", outline="black")
+    data = _encode(page, "BMP")
+
+    prepared = prepare_image(data, "anthropic")
+
+    assert prepared.media_type == "image/png"
+    assert (prepared.width, prepared.height) == (600, 300)
+
+
+def test_undecodable_or_already_small_images_are_sent_as_is():
+    garbage = prepare_image(b"\x89PNG\r\n\x1a\nroto", "openai")
+    assert garbage.data == b"\x89PNG\r\n\x1a\nroto" and garbage.media_type == "image/png"
+
+    small = _encode(_photo(64, 64), "JPEG", quality=30)
+    prepared = prepare_image(small, "anthropic", crop_borders=False)
+    assert prepared.data == small and prepared.media_type == "image/jpeg"
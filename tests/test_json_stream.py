@@ -0,0 +1,31 @@
+"""Parser JSON incremental de las respuestas en streaming"""
+
+import json
+
+import pytest
+
+from omnimastro.core.json_stream import StreamingJSONParser
+
+
+def _parse(text: str, step: int):
+    parser = StreamingJSONParser()
+    deltas = {}
+    for i in range(0, len(text), step):
+        for event in parser.feed(text[i:i + step]):
+            if event.kind == "delta":
+                deltas[event.field] = deltas.get(event.field, "") + event.text
+    return parser.close(), deltas
+
+
+@pytest.mark.parametrize("step", [1, 2, 5, 1000])
+def test_surrogate_pairs_are_combined(step):
+    data = {"summary": "Raíz 𝑥 ≥ 0 😀", "content": "fin"}
+    text = json.dumps(data, ensure_ascii=True)
+    values, deltas = _parse(text, step)
+    assert values == data
+    assert deltas["summary"] == data["summary"]
+
+
+def test_lone_surrogates_are_replaced():
+    values, _ = _parse('{"summary": "a\\udc00b\\ud800", "content": "\\ud83d\\n"}', 1)
+    assert values == {"summary": "a�b�", "content": "�\n"}
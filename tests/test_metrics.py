@@ -0,0 +1,75 @@
+"""Contadores, histogramas y exportación Prometheus"""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from omnimastro.core.ai_engine import AIProvider, AnalysisContext, EducationLevel
+from omnimastro.core.metrics import LogHistogram, MetricsStore, render_prometheus
+from omnimastro.core.router import estimate_cost
+from omnimastro.core.usage import TokenUsage
+
+from tests.fakes import FakeProvider, make_engine
+
+
+@pytest.mark.parametrize("relative_error", [0.01, 0.05])
+def test_histogram_quantiles_stay_within_relative_error(relative_error):
+    samples = np.random.default_rng(0).lognormal(-2, 1.5, 5000)
+    histogram = LogHistogram(relative_error)
+    for value in samples:
+        histogram.record(float(value))
+
+    for q in (0.5, 0.9, 0.99):
+        exact = float(np.quantile(samples, q, method="higher"))  # Rango q * (n - 1) + 1
+        assert abs(histogram.quantile(q) - exact) <= relative_error * exact * 1.001
+    assert histogram.count == 5000 and histogram.max == pytest.approx(samples.max())
+    assert LogHistogram().quantile(0.5) is None
+
+
+def test_zero_samples_and_counter_label_filters():
+    store = MetricsStore()
+    for value in (0.0, 0.0, 2.0):
+        store.observe("latency", value, provider="openai")
+    store.increment("calls", provider="openai", status="ok")
+    store.increment("calls", 2, provider="anthropic", status="ok")
+    store.increment("calls", provider="openai", status="error")
+
+    assert store.counter_total("calls") == 4
+    assert store.counter_total("calls", status="ok") == 3
+    assert store.counter_total("calls", provider="openai", status="error") == 1
+    summary = store.snapshot()["histograms"]["latency{provider=openai}"]
+    assert summary["p50"] == 0.0 and summary["p99"] == pytest.approx(2.0, rel=0.01)
+
+
+def test_prometheus_text_format():
+    store = MetricsStore()
+    store.increment("calls", provider='open"ai', level="alto\nmedio")
+    store.observe("latency_seconds", 0.5, provider="openai")
+
+    text = render_prometheus(store, prefix="om")
+
+    assert '# TYPE om_calls_total counter\nom_calls_total{level="alto\\nmedio",provider="open\\"ai"} 1\n' in text
+    assert '# TYPE om_latency_seconds summary\n' in text
+    [median] = [line for line in text.splitlines() if line.startswith('om_latency_seconds{provider="openai",quantile="0.5"} ')]
+    assert float(median.split()[-1]) == pytest.approx(0.5, rel=0.01)
+    assert 'om_latency_seconds_sum{provider="openai"} 0.5\nom_latency_seconds_count{provider="openai"} 1\n' in text
+
+
+def test_engine_records_reported_usage_per_call():
+    usage = TokenUsage(input_tokens=1200, output_tokens=300, cached_input_tokens=1000)
+    provider = FakeProvider(usage=usage)
+    provider.model = "gpt-4o"
+    engine = make_engine(provider)
+    context = AnalysisContext(EducationLevel.HIGH_SCHOOL)
+
+    asyncio.run(engine.generate_explanation("x² + 5x + 6 = 0", context, AIProvider.OPENAI))
+
+    metrics = engine.metrics
+    labels = {"provider": "openai", "operation": "generate_explanation", "level": "high_school"}
+    assert metrics.counter_total("provider_calls", status="ok", **labels) == 1
+    assert metrics.counter_total("input_tokens", **labels) == 1200
+    assert metrics.counter_total("cached_input_tokens", **labels) == 1000
+    assert metrics.counter_total("output_tokens", **labels) == 300
+    assert metrics.counter_total("cost_usd", **labels) == pytest.approx(estimate_cost("gpt-4o", 1200, 300, 1000))
+    assert "omnimastro_call_latency_seconds_count" in engine.export_metrics()
@@ -0,0 +1,113 @@
+"""Pool de workers OCR con backends falsos"""
+
+import os
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+from omnimastro.core import ocr_engine
+from omnimastro.core.ocr_backend import OCRBackend, OCRWorkerPool, PytesseractBackend
+from omnimastro.core.ocr_result import OCRResult, OCRWord
+
+
+class FakeBackend(OCRBackend):
+    """Reconoce una "palabra" con el tamaño de la imagen (o región) y su configuración"""
+
+    name = "fake"
+    created = []
+
+    def __init__(self, lang, config, delay=0.0):
+        self.lang, self.config, self.delay = lang, config, delay
+        self.thread = threading.current_thread().name
+        self.closed = False
+        FakeBackend.created.append(self)
+
+    def image_to_data(self, image, lang, config, rect=None):
+        if self.delay:
+            time.sleep(self.delay)
+        if image == "boom":
+            raise ValueError("imagen no válida")
+        x, y, w, h = rect or (0, 0, image.width, image.height)
+        return OCRResult(words=[OCRWord(f"{lang}|{config}|{self.thread}", 90.0, x, y, w, h)])
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def factory():
+    FakeBackend.created = []
+    return FakeBackend
+
+
+def test_every_worker_builds_its_backend_before_init_returns(factory):
+    pool = OCRWorkerPool("spa", workers=3, backend_factory=factory)
+    try:
+        assert len(factory.created) == 3
+        assert pool.backend_name == "fake"
+    finally:
+        pool.close()
+    assert all(backend.closed for backend in factory.created)
+
+
+def test_requests_run_on_resident_backends_with_defaults_and_overrides(factory):
+    pool = OCRWorkerPool("spa", config="--psm 6", workers=2, backend_factory=factory)
+    try:
+        image = Image.new("L", (40, 20))
+        default = pool.image_to_data(image).words[0]
+        region = pool.image_to_data(image, "eng", "--psm 7", rect=(5, 6, 10, 8)).words[0]
+    finally:
+        pool.close()
+    assert default.text.startswith("spa|--psm 6|ocr-worker-")
+    assert region.text.startswith("eng|--psm 7|")
+    assert (region.left, region.top, region.width, region.height) == (5, 6, 10, 8)
+    assert len(factory.created) == 2
+
+
+def test_errors_reach_the_caller_and_worker_survives(factory):
+    pool = OCRWorkerPool("spa", workers=1, backend_factory=factory)
+    try:
+        with pytest.raises(ValueError):
+            pool.image_to_data("boom")
+        assert pool.image_to_data(Image.new("L", (4, 4))).word_count == 1
+    finally:
+        pool.close()
+    with pytest.raises(RuntimeError):
+        pool.submit(Image.new("L", (4, 4)))
+
+
+def test_workers_recognize_in_parallel():
+    pool = OCRWorkerPool("spa", workers=4, backend_factory=lambda lang, config: FakeBackend(lang, config, 0.1))
+    try:
+        start = time.monotonic()
+        futures = [pool.submit(Image.new("L", (4, 4))) for _ in range(4)]
+        threads = {future.result().words[0].text.split("|")[2] for future in futures}
+        elapsed = time.monotonic() - start
+    finally:
+        pool.close()
+    assert len(threads) == 4
+    assert elapsed < 0.35
+
+
+def test_thread_limit_is_scoped_to_tesseract_processes(monkeypatch):
+    monkeypatch.delenv("OMP_THREAD_LIMIT", raising=False)
+    backend = PytesseractBackend(thread_limit=1)
+    assert backend._env["OMP_THREAD_LIMIT"] == "1"
+    assert PytesseractBackend()._env is None
+    pool = OCRWorkerPool("spa", workers=2)
+    pool.close()
+    assert "OMP_THREAD_LIMIT" not in os.environ
+
+
+def test_engine_without_tesseract_starts_no_pool(monkeypatch):
+    monkeypatch.setattr(ocr_engine.OCREngine, "_check_tesseract", lambda self: False)
+    monkeypatch.setattr(ocr_engine, "TESSEROCR_AVAILABLE", False)
+    monkeypatch.setattr(ocr_engine, "_ocr_engine_instances", {})
+    monkeypatch.setattr(ocr_engine, "_ocr_pools", {})
+
+    engine = ocr_engine.get_ocr_engine(["spa"])
+    assert engine.pool is None
+    assert ocr_engine._ocr_pools == {}
+    assert ocr_engine.get_ocr_engine(["spa"]) is engine
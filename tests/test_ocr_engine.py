@@ -0,0 +1,185 @@
+"""OCREngine sin Tesseract: pasadas OCR simuladas"""
+
+from concurrent.futures import Future
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from omnimastro.core import ocr_engine
+from omnimastro.core.ocr_engine import OCREngine, crop_image, image_digest, load_image, recognize_packed
+from omnimastro.core.ocr_result import OCRResult, OCRWord
+
+
+def _engine(monkeypatch, run_ocr, **kwargs):
+    """Motor con Tesseract "disponible" cuya pasada OCR es ``run_ocr(image)``"""
+    monkeypatch.setattr(OCREngine, "_check_tesseract", lambda self: True)
+    engine = OCREngine(**kwargs)
+    engine._tesseract_available = True
+    monkeypatch.setattr(engine, "_run_ocr", run_ocr)
+    return engine
+
+
+def test_confidence_ignores_words_without_positive_confidence(monkeypatch):
+    words = [OCRWord("x²", 90.0, 0, 0, 10, 10), OCRWord("~", 0.0, 12, 0, 4, 10),
+             OCRWord("=", 70.0, 20, 0, 8, 10), OCRWord("?", -1.0, 30, 0, 4, 10)]
+    engine = _engine(monkeypatch, lambda image: OCRResult(words=words))
+
+    result = engine.extract_text_with_confidence(Image.new("L", (40, 10), 255), preprocess=False)
+
+    assert result == {"text": "x² =", "confidence": 80.0,
+                      "words": [("x²", 90.0), ("=", 70.0)], "word_count": 2}
+
+
+def test_packed_canvases_group_regions_by_config():
+    image = Image.new("L", (200, 200), 255)
+    boxes = [(0, 0, 50, 20), (0, 40, 50, 20), (0, 80, 50, 60), (0, 160, 50, 20)]
+    configs = ["--psm 6", "--psm 7", "--psm 6", "--psm 7"]
+    canvases = []
+
+    def run_ocr(canvas, config):
+        canvases.append((config, canvas.height))
+        return OCRResult()
+
+    results = recognize_packed(image, boxes, run_ocr, configs=configs)
+
+    assert len(results) == 4
+    assert sorted(canvases) == [("--psm 6", 16 + 20 + 16 + 60 + 16), ("--psm 7", 52), ("--psm 7", 52)]
+
+
+def _pixels():
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, (30, 40, 3), dtype=np.uint8)
+
+
+def _png(array) -> bytes:
+    buffer = BytesIO()
+    Image.fromarray(array).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("wrap", [bytes, bytearray, memoryview])
+def test_load_image_from_encoded_buffers(wrap):
+    pixels = _pixels()
+    image = load_image(wrap(_png(pixels)))
+    assert np.array_equal(np.asarray(image), pixels)
+
+
+def test_load_image_from_path_pil_and_arrays(tmp_path):
+    pixels = _pixels()
+    path = tmp_path / "captura.png"
+    path.write_bytes(_png(pixels))
+    pil = Image.fromarray(pixels)
+
+    assert np.array_equal(np.asarray(load_image(path)), pixels)
+    assert np.array_equal(np.asarray(load_image(str(path))), pixels)
+    assert load_image(pil) is pil
+    assert np.array_equal(np.asarray(load_image(pixels)), pixels)
+    assert np.array_equal(np.asarray(load_image(pixels[:, ::2, 0])), pixels[:, ::2, 0])  # Vista no contigua
+    with pytest.raises(TypeError):
+        load_image(42)
+
+
+@pytest.mark.parametrize("region", [(5, 3, 10, 7), (0, 0, 40, 30), (39, 29, 1, 1)])
+def test_crop_image_matches_pil_crop_for_every_source(region):
+    pixels = _pixels()
+    x, y, w, h = region
+    expected = pixels[y:y + h, x:x + w]
+    padded = np.pad(pixels, ((2, 2), (3, 3), (0, 0)))
+    for source in (pixels, padded[2:-2, 3:-3], Image.fromarray(pixels), _png(pixels), memoryview(_png(pixels))):
+        crop = crop_image(source, region)
+        assert crop.size == (w, h)
+        assert np.array_equal(np.asarray(crop), expected)
+
+
+def test_crop_of_array_does_not_alias_source():
+    pixels = _pixels()
+    crop = crop_image(pixels, (0, 0, 4, 4))
+    pixels[:4, :4] = 0
+    assert np.asarray(crop).any()
+
+
+def test_image_digest_depends_on_content_not_container():
+    pixels = _pixels()
+    encoded = _png(pixels)
+    assert image_digest(encoded) == image_digest(memoryview(encoded)) == image_digest(bytearray(encoded))
+    assert image_digest(pixels) == image_digest(Image.fromarray(pixels))
+    changed = pixels.copy()
+    changed[0, 0] ^= 1
+    assert image_digest(changed) != image_digest(pixels)
+
+
+def _striped_page():
+    """Página blanca con una franja de gris distinto por región"""
+    image = Image.new("L", (120, 400), 255)
+    for level, (x, y, w, h) in zip((10, 20, 30, 40), [(10, 300, 50, 30), (5, 10, 100, 40),
+                                                       (60, 150, 40, 20), (0, 360, 30, 40)]):
+        image.paste(level, (x, y, x + w, y + h))
+    return image
+
+
+def _read_stripes(canvas):
+    """OCR simulado: una palabra por franja gris, con su nivel como texto"""
+    pixels = np.asarray(canvas.convert("L"))
+    words = []
+    for top in range(pixels.shape[0]):
+        row = pixels[top]
+        if row.min() < 255 and (top == 0 or pixels[top - 1].min() == 255):
+            bottom = top
+            while bottom < pixels.shape[0] and pixels[bottom].min() < 255:
+                bottom += 1
+            columns = np.flatnonzero(row < 255)
+            words.append(OCRWord(str(int(row[columns[0]])), 90.0, int(columns[0]), top,
+                                 int(columns[-1] - columns[0] + 1), bottom - top))
+    return OCRResult(words=words)
+
+
+def test_packed_regions_keep_order_and_map_words_back(monkeypatch):
+    monkeypatch.setattr(ocr_engine, "MAX_CANVAS_HEIGHT", 100)  # Varios lienzos
+    canvases = []
+
+    def run_ocr(canvas):
+        canvases.append(canvas.size)
+        return _read_stripes(canvas)
+
+    boxes = [(10, 300, 50, 30), None, (5, 10, 100, 40), (60, 150, 40, 20), (0, 360, 30, 40)]
+    results = recognize_packed(_striped_page(), boxes, run_ocr)
+
+    assert len(canvases) > 1
+    assert [r.text for r in results] == ["10", "", "20", "30", "40"]
+    for box, result in zip(boxes, results):
+        if box is not None:
+            assert [(w.left, w.top, w.width, w.height) for w in result.words] == [box]
+
+
+def test_extract_regions_clips_to_the_image(monkeypatch):
+    engine = _engine(monkeypatch, _read_stripes)
+    regions = [(0, 360, 30, 100), (500, 500, 10, 10), (-20, -20, 10, 10), (0, 0, 0, 5)]
+
+    results = engine.extract_regions(_striped_page(), regions, preprocess=False)
+
+    assert [r["region"] for r in results] == regions
+    assert [(r["text"], r["word_count"]) for r in results] == [("40", 1), ("", 0), ("", 0), ("", 0)]
+
+
+def test_pooled_regions_are_submitted_as_rectangles_in_order(monkeypatch):
+    page = _striped_page()
+    submitted = []
+
+    class FakePool:
+        backend_name = "pytesseract"
+
+        def submit(self, image, lang, config, rect=None):
+            submitted.append(rect)
+            x, y, w, h = rect
+            future = Future()
+            future.set_result(_read_stripes(image.crop((x, y, x + w, y + h))))
+            return future
+
+    engine = _engine(monkeypatch, None, pool=FakePool())
+    results = engine.extract_regions(page, [(60, 150, 40, 20), (200, 0, 5, 5), (10, 300, 50, 30)],
+                                     preprocess=False)
+
+    assert submitted == [(60, 150, 40, 20), (10, 300, 50, 30)]
+    assert [r["text"] for r in results] == ["30", "", "10"]
@@ -0,0 +1,93 @@
+"""Pruebas del índice de capturas casi duplicadas"""
+
+from io import BytesIO
+
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+from omnimastro.core.perceptual_hash import NearDuplicateIndex, hamming_distance
+
+
+def _font(size: int):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1
+        return ImageFont.load_default()
+
+
+def _worksheet(equation: str, size=(1280, 720)) -> Image.Image:
+    """Misma hoja de ejercicios con distinta ecuación"""
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, size[0], 60), fill=(40, 70, 140))
+    draw.text((40, 15), "Álgebra - Hoja 4", fill="white", font=_font(28))
+    draw.text((80, 140), "Ejercicio 1. Resuelve la ecuación:", fill="black", font=_font(28))
+    draw.text((120, 220), equation, fill="black", font=_font(40))
+    for row in range(6):
+        draw.line((80, 330 + row * 50, size[0] - 80, 330 + row * 50), fill=(200, 200, 200), width=2)
+    return image
+
+
+def _encode(image: Image.Image, fmt: str = "PNG", **params) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, fmt, **params)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("algorithm", ["dhash", "phash"])
+def test_same_layout_with_different_equation_is_not_reused(algorithm):
+    index = NearDuplicateIndex(algorithm=algorithm)
+    pages = [_encode(_worksheet(eq)) for eq in ("x² + 5x + 6 = 0", "x² + 5x - 6 = 0", "2x² - 3x + 7 = 0")]
+    fingerprints = [index.compute_hash(page) for page in pages]
+
+    # El hash perceptual por sí solo no distingue las páginas
+    assert hamming_distance(fingerprints[0].hash, fingerprints[1].hash) <= index.max_distance
+
+    index.add_hash(fingerprints[0], {"page": 0})
+    assert index.lookup_hash(fingerprints[1]) is None
+    assert index.lookup_hash(fingerprints[2]) is None
+    assert index.get_statistics()["rejected"] >= 1
+
+
+def test_recompressed_screenshot_is_reused():
+    index = NearDuplicateIndex()
+    page = _worksheet("x² + 5x + 6 = 0")
+    index.add_hash(index.compute_hash(_encode(page)), {"page": 0})
+
+    match = index.lookup_hash(index.compute_hash(_encode(page, "JPEG", quality=85)))
+    assert match is not None and match[1] == {"page": 0}
+
+
+def _with_cursor(image: Image.Image, x: int, y: int) -> Image.Image:
+    image = image.copy()
+    ImageDraw.Draw(image).polygon([(x, y), (x, y + 19), (x + 5, y + 14), (x + 9, y + 21), (x + 11, y + 20),
+                                   (x + 8, y + 13), (x + 14, y + 13)], fill="black", outline="white")
+    return image
+
+
+def test_screenshot_with_moved_cursor_is_reused():
+    index = NearDuplicateIndex()
+    page = _worksheet("x² + 5x + 6 = 0")
+    index.add_hash(index.compute_hash(_encode(_with_cursor(page, 600, 500))), {"page": 0})
+
+    for x, y in ((1000, 650), (500, 20)):  # Sobre fondo blanco y sobre la cabecera
+        match = index.lookup_hash(index.compute_hash(_encode(_with_cursor(page, x, y))))
+        assert match is not None and match[1] == {"page": 0}
+
+
+@pytest.mark.parametrize("before, after", [("x = 1", "x = 7"), ("x = 1", "x = 12"), ("x = 2", "x = -2")])
+def test_single_changed_character_is_not_reused(before, after):
+    index = NearDuplicateIndex()
+    index.add_hash(index.compute_hash(_worksheet(before)), {"page": 0})
+    assert index.lookup_hash(index.compute_hash(_worksheet(after))) is None
+
+
+def test_lookup_returns_independent_copy():
+    index = NearDuplicateIndex()
+    fingerprint = index.compute_hash(_worksheet("x = 1"))
+    index.add_hash(fingerprint, {"results": {"text": "x = 1"}})
+
+    _, first = index.lookup_hash(fingerprint)
+    first["results"]["image_info"] = {"width": 1}
+    _, second = index.lookup_hash(fingerprint)
+    assert second == {"results": {"text": "x = 1"}}
@@ -0,0 +1,29 @@
+"""La canalización NumPy sin OpenCV reproduce la cadena PIL píxel a píxel"""
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from omnimastro.core import preprocessing
+from omnimastro.core.preprocessing import RECIPES, Preprocessor, preprocess_pil
+
+
+def _images():
+    rng = np.random.default_rng(0)
+    yield Image.fromarray(rng.integers(0, 256, (120, 157), dtype=np.uint8)).convert("RGB")
+    yield Image.fromarray(rng.normal(128, 40, (97, 131)).clip(0, 255).astype(np.uint8)).convert("RGB")
+    text = Image.new("RGB", (300, 120), (240, 240, 235))
+    draw = ImageDraw.Draw(text)
+    draw.text((10, 10), "x² + 5x - 6 = 0", fill=(20, 20, 20))
+    draw.rectangle((200, 60, 280, 110), fill=(90, 120, 200))
+    yield text
+    yield Image.new("RGB", (2, 2), (128, 64, 32))
+
+
+@pytest.mark.parametrize("recipe", sorted(RECIPES))
+def test_numpy_fallback_matches_pil_chain(monkeypatch, recipe):
+    monkeypatch.setattr(preprocessing, "CV2_AVAILABLE", False)
+    preprocessor = Preprocessor(recipe)
+    for image in _images():
+        expected = np.asarray(preprocess_pil(image, recipe))
+        assert np.array_equal(np.asarray(preprocessor(image)), expected), image.size
@@ -0,0 +1,16 @@
+"""Marcadores de caché de prompts de Anthropic"""
+
+from omnimastro.core import prompts
+
+
+def test_current_prefix_is_below_minimum_and_not_marked():
+    system = prompts.system_prompt("high_school", "es")
+    instructions = prompts.explanation_instructions("high_school", "detailed", "es")
+    block = prompts.text_block(instructions, prefix_tokens=prompts.estimate_tokens(system))
+    assert "cache_control" not in block
+    assert "cache_control" not in prompts.anthropic_system(system)[0]
+
+
+def test_prefix_reaching_minimum_is_marked():
+    block = prompts.text_block("ejemplo " * 600, prefix_tokens=prompts.ANTHROPIC_MIN_CACHEABLE_TOKENS // 2)
+    assert block["cache_control"] == {"type": "ephemeral"}
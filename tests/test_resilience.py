@@ -0,0 +1,93 @@
+"""Reintentos con timeout por intento, Retry-After y plazos"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from omnimastro.core.resilience import (
+    AttemptTimeout, DeadlineExceeded, RetryPolicy, call_with_retry, deadline, is_retriable_error
+)
+
+FAST = RetryPolicy(max_attempts=3, base_delay=0.0, attempt_timeout=1.0)
+
+
+class HTTPError(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.status_code = status
+        self.response = SimpleNamespace(status_code=status, headers=headers or {})
+
+
+class Flaky:
+    """Falla con ``errors`` por orden y después retorna ``"ok"``"""
+
+    def __init__(self, *errors, delay=0.0):
+        self.errors = list(errors)
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def test_transient_errors_are_retried():
+    func = Flaky(HTTPError(503), ConnectionError("reset"))
+    assert asyncio.run(call_with_retry(func, FAST)) == "ok"
+    assert func.calls == 3
+
+
+def test_non_retriable_error_is_raised_at_once():
+    func = Flaky(HTTPError(400))
+    with pytest.raises(HTTPError):
+        asyncio.run(call_with_retry(func, FAST))
+    assert func.calls == 1
+
+
+def test_last_error_is_raised_when_attempts_run_out():
+    func = Flaky(*(HTTPError(500) for _ in range(3)))
+    with pytest.raises(HTTPError):
+        asyncio.run(call_with_retry(func, FAST))
+    assert func.calls == 3
+
+
+def test_retry_after_sets_minimum_delay():
+    delays = []
+    func = Flaky(HTTPError(429, {"retry-after-ms": "30"}))
+    result = asyncio.run(call_with_retry(func, FAST, on_retry=lambda attempt, error, delay: delays.append(delay)))
+    assert result == "ok"
+    assert delays == [pytest.approx(0.03)]
+
+
+def test_attempt_timeout_is_retriable_and_raised_last():
+    func = Flaky(delay=10.0)
+    policy = RetryPolicy(max_attempts=2, base_delay=0.0, attempt_timeout=0.02)
+    with pytest.raises(AttemptTimeout):
+        asyncio.run(call_with_retry(func, policy))
+    assert func.calls == 2
+
+
+def test_deadline_bounds_the_attempt():
+    async def scenario():
+        with deadline(0.05):
+            await call_with_retry(Flaky(delay=10.0), FAST)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(scenario())
+
+
+def test_retry_after_beyond_deadline_gives_up():
+    async def scenario():
+        with deadline(1.0):
+            await call_with_retry(func, FAST)
+
+    func = Flaky(HTTPError(429, {"retry-after": "30"}))
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(scenario())
+    assert func.calls == 1
+    assert not is_retriable_error(DeadlineExceeded())
@@ -0,0 +1,53 @@
+"""Pruebas de la caché de explicaciones (niveles exacto y de similitud)"""
+
+from omnimastro.core.response_cache import ExplanationCache, math_fingerprint
+from omnimastro.shared.cache import AnalysisCache
+
+CONTEXT = ("intermediate", "es", "mathematics")
+
+
+def _content(equation: str) -> str:
+    return (
+        "Tema: mathematics\n"
+        "\nContenido textual:\n"
+        "Ejercicio 3. Resuelve la siguiente ecuación de segundo grado por "
+        "factorización y comprueba las soluciones sustituyendo en la ecuación "
+        f"original: {equation}\n"
+        "\nElementos visuales: ecuaciones, texto"
+    )
+
+
+def _cache(**kwargs) -> ExplanationCache:
+    return ExplanationCache(store=AnalysisCache(namespace="test", use_disk=False), **kwargs)
+
+
+def test_similarity_tier_is_disabled_by_default():
+    cache = _cache()
+    cache.set(_content("x² + 5x + 6 = 0"), CONTEXT, {"content": "a"})
+
+    assert cache.get(_content("x² + 5x + 6 = 0"), CONTEXT) == ({"content": "a"}, 1.0)
+    assert cache.get(_content("x² + 5x + 6 = 0 "), CONTEXT)[1] == 1.0  # Normalización
+    assert cache.get(_content("x² + 5x + 6 = 0."), CONTEXT) is None
+
+
+def test_similar_entry_with_different_sign_is_not_reused():
+    cache = _cache(enable_similarity=True)
+    cache.set(_content("x² + 5x + 6 = 0"), CONTEXT, {"content": "raíces -2 y -3"})
+
+    assert cache.get(_content("x² + 5x - 6 = 0"), CONTEXT) is None
+    assert cache.get(_content("2x² - 3x + 7 = 0"), CONTEXT) is None
+
+
+def test_similar_entry_with_same_math_is_reused():
+    cache = _cache(enable_similarity=True)
+    cache.set(_content("x² + 5x + 6 = 0"), CONTEXT, {"content": "raíces -2 y -3"})
+
+    # Error típico de OCR que no afecta a cifras ni operadores
+    noisy = _content("x² + 5x + 6 = 0").replace("factorización", "factorizacion")
+    hit = cache.get(noisy, CONTEXT)
+    assert hit is not None and hit[0] == {"content": "raíces -2 y -3"}
+    assert cache.get_statistics()["similar_hits"] == 1
+
+
+def test_math_fingerprint_keeps_digits_and_operators_only():
+    assert math_fingerprint("x² + 5x - 6 = 0") == "²+5-6=0"
@@ -0,0 +1,27 @@
+"""Reparación de objetos JSON truncados"""
+
+import json
+
+import pytest
+
+from omnimastro.core.response_parser import repair_truncated
+
+
+@pytest.mark.parametrize("fragment, expected", [
+    ('{"a": "hola', {"a": "hola"}),                      # String abierto
+    ('{"a": "x, y', {"a": "x, y"}),                      # Coma dentro del string
+    ('{"a": "x\\', {"a": "x"}),                          # Escape a medias
+    ('{"a": "di \\"hola', {"a": 'di "hola'}),            # Comilla escapada
+    ('{"a": 1, "b', {"a": 1}),                           # Clave sin valor
+    ('{"a": "b", ', {"a": "b"}),                         # Coma final
+    ('{"a": tr', {}),                                    # Literal a medias
+    ('{"a": 1.', {}),                                    # Número a medias
+    ('{"a": -', {}),
+    ('{"a": true', {"a": True}),
+    ('{"a": [1, 2', {"a": [1, 2]}),                      # Lista abierta
+    ('{"a": {"b": null', {"a": {"b": None}}),            # Objetos anidados
+    ('{"a": [{"b": 1}, {"c"', {"a": [{"b": 1}, {}]}),
+    ('{"a": "b"}', {"a": "b"}),                          # Objeto completo
+])
+def test_repair_truncated(fragment, expected):
+    assert json.loads(repair_truncated(fragment)) == expected
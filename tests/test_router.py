@@ -0,0 +1,193 @@
+"""Circuit breaker del enrutador: la llamada de prueba siempre se resuelve"""
+
+import asyncio
+
+import pytest
+
+from omnimastro.core.ai_engine import AIProvider, AnalysisContext, EducationLevel
+from omnimastro.core.hedging import HedgingPolicy
+from omnimastro.core.resilience import AttemptTimeout, RetryPolicy
+from omnimastro.core.response_cache import ExplanationCache
+from omnimastro.core.router import CircuitBreaker, ProviderRouter
+from omnimastro.shared.cache import AnalysisCache
+
+from tests.fakes import FakeProvider, make_engine
+
+
+def _state(router: ProviderRouter, provider: str = "openai") -> str:
+    return router.get_statistics()["circuit_breakers"][provider]["state"]
+
+
+def _half_open(provider: str = "openai", **kw) -> ProviderRouter:
+    """Enrutador con el circuito de ``provider`` semiabierto (enfriamiento nulo)"""
+    router = ProviderRouter(failure_threshold=1, cooldown_seconds=0.0, **kw)
+    router.register(provider)
+    router.record_failure(provider, "generate_explanation", 1.0)
+    router.rank([provider], "generate_explanation")
+    assert _state(router, provider) == CircuitBreaker.HALF_OPEN
+    return router
+
+
+def _probe_free(router: ProviderRouter, provider: str = "openai") -> bool:
+    return router._breakers[provider].allow()
+
+
+def test_breaker_opens_after_threshold_and_closes_on_success():
+    router = ProviderRouter(failure_threshold=2, cooldown_seconds=60.0)
+    router.register("openai")
+    router.record_failure("openai", "generate_explanation", 1.0)
+    assert _state(router) == CircuitBreaker.CLOSED
+    router.record_failure("openai", "generate_explanation", 1.0)
+    assert _state(router) == CircuitBreaker.OPEN
+    assert not _probe_free(router)
+
+    router._breakers["openai"].opened_at -= 60.0
+    assert _probe_free(router)
+    assert _state(router) == CircuitBreaker.HALF_OPEN
+    router.dispatch("openai")
+    router.record_success("openai", "generate_explanation", 0.5)
+    assert _state(router) == CircuitBreaker.CLOSED
+
+
+def test_half_open_probe_is_reserved_on_dispatch_not_on_select():
+    router = _half_open()
+    router.select(["openai"], "generate_explanation")
+    assert _probe_free(router)
+
+    router.dispatch("openai")
+    assert not _probe_free(router)
+    router.release_probe("openai")
+    assert _probe_free(router)
+    assert _state(router) == CircuitBreaker.HALF_OPEN
+
+
+def test_failed_probe_reopens_circuit():
+    router = ProviderRouter(failure_threshold=1, cooldown_seconds=60.0)
+    router.register("openai")
+    router.record_failure("openai", "generate_explanation", 1.0)
+    router._breakers["openai"].opened_at -= 60.0
+    assert _probe_free(router)
+    router.dispatch("openai")
+    router.record_failure("openai", "generate_explanation", 1.0)
+    assert _state(router) == CircuitBreaker.OPEN
+    assert router.get_statistics()["circuit_breakers"]["openai"]["trips"] == 2
+
+
+def test_cancelled_call_releases_probe():
+    async def scenario():
+        engine = make_engine(FakeProvider(delay=10.0), router=_half_open())
+        task = asyncio.ensure_future(engine.generate_explanation("x + 1 = 2"))
+        await asyncio.sleep(0.05)
+        assert not _probe_free(engine.router)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return engine.router
+
+    assert _probe_free(asyncio.run(scenario()))
+
+
+def test_lost_hedge_releases_probe():
+    async def scenario():
+        router = _half_open(preference=("openai", "anthropic"))
+        router.register("anthropic")
+        engine = make_engine(FakeProvider(delay=10.0), FakeProvider(AIProvider.ANTHROPIC),
+                             router=router,
+                             hedging=HedgingPolicy(min_samples=1, budget_ratio=1.0, min_delay=0.01))
+        engine._latency.record(("openai", "generate_explanation"), 0.01)
+        result = await engine.generate_explanation("x + 1 = 2", provider=AIProvider.OPENAI)
+        await asyncio.sleep(0.05)
+        return engine.router, result
+
+    router, result = asyncio.run(scenario())
+    assert result.provider_used == AIProvider.ANTHROPIC
+    assert _probe_free(router)
+
+
+def test_attempt_timeout_counts_as_failure():
+    async def scenario():
+        router = ProviderRouter(failure_threshold=1, cooldown_seconds=60.0)
+        engine = make_engine(FakeProvider(delay=10.0), router=router,
+                             retry_policy=RetryPolicy(max_attempts=1, attempt_timeout=0.05))
+        with pytest.raises(AttemptTimeout):
+            await engine.generate_explanation("x + 1 = 2")
+        return router
+
+    assert _state(asyncio.run(scenario())) == CircuitBreaker.OPEN
+
+
+def test_generate_cache_hit_does_not_reserve_probe():
+    async def scenario():
+        provider = FakeProvider()
+        cache = ExplanationCache(AnalysisCache(namespace="test", use_disk=False))
+        engine = make_engine(provider, router=ProviderRouter(failure_threshold=1, cooldown_seconds=0.0),
+                             response_cache=cache)
+        await engine.generate_explanation("x + 1 = 2")
+        engine.router.record_failure("openai", "generate_explanation", 1.0)
+        await engine.generate_explanation("x + 1 = 2")
+        return engine.router, provider
+
+    router, provider = asyncio.run(scenario())
+    assert provider.calls == 1
+    assert _probe_free(router)
+    assert router.get_statistics()["decisions"]["generate_explanation"]["openai"] == 1
+
+
+def test_analyze_cache_hit_does_not_reserve_probe():
+    async def scenario():
+        provider = FakeProvider()
+        engine = make_engine(provider, router=ProviderRouter(failure_threshold=1, cooldown_seconds=0.0),
+                             cache=AnalysisCache(namespace="test", use_disk=False))
+        context = AnalysisContext(education_level=EducationLevel.HIGH_SCHOOL)
+        await engine.analyze_screenshot(b"png", context)
+        engine.router.record_failure("openai", "analyze_image", 1.0)
+        await engine.analyze_screenshot(b"png", context)
+        return engine.router, provider
+
+    router, provider = asyncio.run(scenario())
+    assert provider.calls == 1
+    assert _probe_free(router)
+
+
+def test_abandoned_stream_releases_probe():
+    async def scenario():
+        chunks = ['{"summary": "Ecuación', ' lineal", "content": "x = 1"}']
+        engine = make_engine(FakeProvider(chunks=chunks), router=_half_open())
+        stream = engine.stream_explanation("x + 1 = 2")
+        await stream.__anext__()
+        assert not _probe_free(engine.router)
+        await stream.aclose()
+        return engine.router
+
+    assert _probe_free(asyncio.run(scenario()))
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+def test_rate_limit_does_not_trip_breaker():
+    async def scenario():
+        router = ProviderRouter(failure_threshold=1, cooldown_seconds=60.0)
+        engine = make_engine(FakeProvider(error=RateLimitError("429")), router=router,
+                             retry_policy=RetryPolicy(max_attempts=1))
+        with pytest.raises(RateLimitError):
+            await engine.generate_explanation("x + 1 = 2")
+        return router
+
+    router = asyncio.run(scenario())
+    assert _state(router) == CircuitBreaker.CLOSED
+    assert router.get_statistics()["circuit_breakers"]["openai"]["consecutive_failures"] == 0
+
+
+def test_rate_limited_probe_is_released():
+    async def scenario():
+        engine = make_engine(FakeProvider(error=RateLimitError("429")), router=_half_open(),
+                             retry_policy=RetryPolicy(max_attempts=1))
+        with pytest.raises(RateLimitError):
+            await engine.generate_explanation("x + 1 = 2")
+        return engine.router
+
+    router = asyncio.run(scenario())
+    assert _state(router) == CircuitBreaker.HALF_OPEN
+    assert _probe_free(router)
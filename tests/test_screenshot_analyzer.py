@@ -0,0 +1,94 @@
+"""OCR by regions of interest on upscaled recipes"""
+
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from omnimastro.core import screenshot_analyzer
+from omnimastro.core.frame import Frame
+from omnimastro.core.layout import TextBlock
+from omnimastro.core.ocr_result import OCRResult, OCRWord
+from omnimastro.core.screenshot_analyzer import ScreenshotAnalyzer
+
+# Dark "text" line and the block the layout pre-pass would report around it
+TEXT_BOX = (100, 50, 200, 20)
+BLOCK = TextBlock(96, 46, 208, 28)
+
+
+def _fake_ocr(canvas, config):
+    """Report one word covering the dark pixels of the canvas."""
+    dark = np.argwhere(np.asarray(canvas.convert("L")) < 128)
+    if not len(dark):
+        return OCRResult()
+    (top, left), (bottom, right) = dark.min(axis=0), dark.max(axis=0)
+    return OCRResult(words=[OCRWord("x²", 90.0, int(left), int(top), int(right - left + 1), int(bottom - top + 1))])
+
+
+def test_roi_ocr_maps_blocks_onto_upscaled_image(monkeypatch):
+    monkeypatch.setattr(screenshot_analyzer, "TESSERACT_AVAILABLE", True)
+    monkeypatch.setattr(screenshot_analyzer, "CV2_AVAILABLE", True)
+    monkeypatch.setattr(screenshot_analyzer, "detect_text_blocks", lambda gray, small: [BLOCK])
+
+    image = Image.new("RGB", (400, 200), "white")
+    x, y, width, height = TEXT_BOX
+    ImageDraw.Draw(image).rectangle((x, y, x + width - 1, y + height - 1), fill="black")
+
+    analyzer = ScreenshotAnalyzer(ocr_recipe="small_text")
+    monkeypatch.setattr(analyzer, "_run_ocr", _fake_ocr)
+    result = analyzer._extract_text(Frame(image))
+
+    assert result["method"] == "tesseract_ocr_roi"
+    assert analyzer._preprocess_for_ocr(Frame(image)).width > image.width
+    [word] = result["words"]
+    box = word["bbox"]
+    assert abs(box["x"] - x) <= 2 and abs(box["y"] - y) <= 2
+    assert abs(box["width"] - width) <= 2 and abs(box["height"] - height) <= 2
+
+
+def test_layout_ocr_uses_each_block_psm_and_keeps_blocks_apart(monkeypatch):
+    monkeypatch.setattr(screenshot_analyzer, "TESSERACT_AVAILABLE", True)
+    monkeypatch.setattr(screenshot_analyzer, "CV2_AVAILABLE", True)
+    line, paragraph = TextBlock(20, 20, 200, 24), TextBlock(20, 100, 200, 60, lines=3)
+    monkeypatch.setattr(screenshot_analyzer, "detect_text_blocks", lambda gray, small: [line, paragraph])
+
+    image = Image.new("RGB", (400, 200), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((30, 25, 120, 38), fill="black")
+    draw.rectangle((30, 110, 150, 150), fill="black")
+
+    configs = []
+
+    def fake_ocr(canvas, config):
+        configs.append(config)
+        return _fake_ocr(canvas, config)
+
+    analyzer = ScreenshotAnalyzer(ocr_recipe="screenshot")
+    monkeypatch.setattr(analyzer, "_run_ocr", fake_ocr)
+    result = analyzer._extract_text(Frame(image))
+
+    assert result["method"] == "tesseract_ocr_roi"
+    assert sorted(configs) == ["--psm 6", "--psm 7"]
+    assert result["text"] == "x²\n\nx²"  # One paragraph per block
+
+
+def test_all_stages_share_a_single_ocr_pass(monkeypatch):
+    monkeypatch.setattr(screenshot_analyzer, "TESSERACT_AVAILABLE", True)
+    monkeypatch.setattr(screenshot_analyzer, "CV2_AVAILABLE", False)
+    frames = []
+
+    def fake_extract_text(frame):
+        frames.append(frame)
+        return {"text": "Ejercicio 1: ¿Cuánto vale x? x² + 5x = 6", "confidence": 90.0, "method": "fake"}
+
+    analyzer = ScreenshotAnalyzer()
+    monkeypatch.setattr(analyzer, "_extract_text", fake_extract_text)
+    buffer = BytesIO()
+    Image.new("RGB", (300, 200), "white").save(buffer, "PNG")
+
+    result = analyzer.analyze_image_data(buffer.getvalue())
+
+    assert len(frames) == 1
+    assert result["text_extraction"]["method"] == "fake"
+    assert result["content_detection"]["has_text"] and result["content_detection"]["has_formulas"]
+    assert result["educational_elements"]["question_detected"]
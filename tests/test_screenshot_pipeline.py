@@ -0,0 +1,60 @@
+"""OCR local solapado con la llamada de visión en explain_screenshot"""
+
+import asyncio
+
+from omnimastro.core.ai_engine import OCR_FAST_PATH_MIN_WORDS
+from omnimastro.core.screenshot_analyzer import ScreenshotAnalyzer
+
+from tests.fakes import FakeProvider, make_engine
+
+IMAGE = b"captura"
+
+
+def _local_analysis(confidence: float, words: int = OCR_FAST_PATH_MIN_WORDS) -> dict:
+    text = " ".join(["x² + 5x = 6"] * (words // 4 + 1))
+    return {
+        "text_extraction": {"text": text, "confidence": confidence, "word_count": words},
+        "quality_assessment": {"suitable_for_ocr": True},
+        "content_detection": {"has_text": True, "has_formulas": True, "has_diagrams": False},
+        "educational_elements": {"topics": ["álgebra"]},
+    }
+
+
+def _engine(monkeypatch, local: dict, **kwargs):
+    provider = FakeProvider(delay=0.05)
+    analyzer = ScreenshotAnalyzer()
+    monkeypatch.setattr(analyzer, "analyze_image_data", lambda image_data: local)
+    engine = make_engine(provider, screenshot_analyzer=analyzer, single_flight=False, **kwargs)
+    return engine, provider
+
+
+def test_reliable_ocr_cancels_the_vision_call(monkeypatch):
+    engine, _ = _engine(monkeypatch, _local_analysis(95.0))
+
+    result = asyncio.run(engine.explain_screenshot(IMAGE))
+
+    analysis = result.metadata["image_analysis"]
+    assert analysis["source"] == "local_ocr" and analysis["subject"] == "álgebra"
+    assert engine.get_statistics()["screenshot_pipeline"] == {"ocr_fast_path": 1, "vision": 0, "vision_cancelled": 1}
+
+
+def test_head_start_skips_the_vision_call(monkeypatch):
+    engine, provider = _engine(monkeypatch, _local_analysis(95.0), ocr_head_start=1.0)
+
+    asyncio.run(engine.explain_screenshot(IMAGE))
+
+    assert provider.calls == 1  # Solo la explicación
+    assert engine.get_statistics()["screenshot_pipeline"] == {"ocr_fast_path": 1, "vision": 0, "vision_cancelled": 0}
+
+
+def test_unreliable_ocr_is_merged_into_the_vision_analysis(monkeypatch):
+    local = _local_analysis(40.0)
+    engine, provider = _engine(monkeypatch, local)
+
+    result = asyncio.run(engine.explain_screenshot(IMAGE))
+
+    analysis = result.metadata["image_analysis"]
+    assert analysis["subject"] == "math"
+    assert analysis["ocr_text"] == local["text_extraction"]["text"] and analysis["ocr_confidence"] == 40.0
+    assert provider.calls == 2
+    assert engine.get_statistics()["screenshot_pipeline"]["vision"] == 1
@@ -0,0 +1,103 @@
+"""Coalescencia de llamadas idénticas en curso"""
+
+import asyncio
+
+from omnimastro.core.resilience import DeadlineExceeded
+from omnimastro.core.single_flight import SingleFlight
+
+
+class Call:
+    """Llamada controlable: espera a ``release`` y cuenta sus ejecuciones"""
+
+    def __init__(self, result=None, error=None):
+        self.result = result if result is not None else {"items": [1]}
+        self.error = error
+        self.release = asyncio.Event()
+        self.runs = 0
+
+    async def __call__(self):
+        self.runs += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def test_concurrent_calls_share_one_execution_with_independent_copies():
+    async def scenario():
+        flight, call = SingleFlight(), Call()
+        tasks = [asyncio.ensure_future(flight.do("k", call)) for _ in range(3)]
+        await asyncio.sleep(0)
+        call.release.set()
+        results = await asyncio.gather(*tasks)
+        return flight, call, results
+
+    flight, call, results = asyncio.run(scenario())
+    assert call.runs == 1
+    assert results[0] == results[1] == results[2]
+    results[1]["items"].append(2)
+    assert results[2]["items"] == [1]
+    assert flight.get_statistics()["followers"] == 2
+    assert flight.in_flight() == 0
+
+
+def test_leader_error_reaches_followers():
+    async def scenario():
+        flight, call = SingleFlight(), Call(error=ValueError("boom"))
+        tasks = [asyncio.ensure_future(flight.do("k", call)) for _ in range(2)]
+        await asyncio.sleep(0)
+        call.release.set()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert [type(r) for r in asyncio.run(scenario())] == [ValueError, ValueError]
+
+
+def test_follower_takes_over_when_leader_is_cancelled():
+    async def scenario():
+        flight, call = SingleFlight(), Call()
+        leader = asyncio.ensure_future(flight.do("k", call))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("k", call))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        call.release.set()
+        return flight, call, await follower
+
+    flight, call, result = asyncio.run(scenario())
+    assert result == {"items": [1]}
+    assert call.runs == 2
+    assert flight.get_statistics()["takeovers"] == 1
+
+
+def test_follower_takes_over_when_leader_runs_out_of_deadline():
+    async def scenario():
+        flight, leader_call, follower_call = SingleFlight(), Call(error=DeadlineExceeded("plazo")), Call()
+        leader = asyncio.ensure_future(flight.do("k", leader_call))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("k", follower_call))
+        await asyncio.sleep(0)
+        leader_call.release.set()
+        follower_call.release.set()
+        results = await asyncio.gather(leader, follower, return_exceptions=True)
+        return flight, results
+
+    flight, (leader_result, follower_result) = asyncio.run(scenario())
+    assert isinstance(leader_result, DeadlineExceeded)
+    assert follower_result == {"items": [1]}
+    assert flight.get_statistics()["takeovers"] == 1
+
+
+def test_cancelled_follower_does_not_cancel_leader():
+    async def scenario():
+        flight, call = SingleFlight(), Call()
+        leader = asyncio.ensure_future(flight.do("k", call))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("k", call))
+        await asyncio.sleep(0)
+        follower.cancel()
+        await asyncio.sleep(0)
+        call.release.set()
+        return await leader, follower.cancelled()
+
+    assert asyncio.run(scenario()) == ({"items": [1]}, True)
@@ -0,0 +1,94 @@
+"""Explicaciones en streaming"""
+
+import asyncio
+
+import pytest
+
+from omnimastro.core import response_parser
+from omnimastro.core.ai_engine import AIProvider
+from omnimastro.core.resilience import AttemptTimeout, DeadlineExceeded, RetryPolicy, deadline
+from omnimastro.core.usage import TokenUsage, _current_recorder
+from omnimastro.core.response_cache import ExplanationCache
+from omnimastro.shared.cache import AnalysisCache
+
+from tests.fakes import FakeProvider, make_engine
+
+
+def _stream(chunks):
+    async def scenario():
+        cache = ExplanationCache(AnalysisCache(namespace="test", use_disk=False))
+        engine = make_engine(FakeProvider(chunks=chunks), response_cache=cache)
+        final = [chunk async for chunk in engine.stream_explanation("x + 1 = 2")][-1]
+        return final.result, cache
+
+    return asyncio.run(scenario())
+
+
+def test_complete_stream_is_cached():
+    result, cache = _stream(['{"summary": "Ecuación lineal", ', '"content": "x = 1"}'])
+    assert result.content == "x = 1"
+    assert cache.get_statistics()["store"]["sets"] == 1
+
+
+def test_stream_without_content_uses_fallback_and_is_not_cached():
+    response_parser.reset_parser_statistics()
+    text = '{"summary": "Ecuación lineal", "difficulty_level": "easy"}'
+    result, cache = _stream([text[:20], text[20:]])
+    assert result.content == text
+    assert response_parser.get_parser_statistics()["schemas"]["explanation"]["fallback"] == 1
+    assert cache.get_statistics()["store"]["sets"] == 0
+
+
+def test_unparseable_response_is_not_cached():
+    async def scenario():
+        cache = ExplanationCache(AnalysisCache(namespace="test", use_disk=False))
+        provider = FakeProvider(text='{"summary": "Ecuación lineal", "cont')
+        engine = make_engine(provider, response_cache=cache)
+        first = await engine.generate_explanation("x + 1 = 2")
+        await engine.generate_explanation("x + 1 = 2")
+        return first, cache, provider
+
+    result, cache, provider = asyncio.run(scenario())
+    assert result.metadata["parse_fallback"] is True
+    assert provider.calls == 2
+    assert cache.get_statistics()["store"]["sets"] == 0
+
+
+def test_stalled_stream_times_out_and_counts_as_failure():
+    async def scenario():
+        engine = make_engine(FakeProvider(delay=10.0, chunks=['{"content": "x"}']),
+                             retry_policy=RetryPolicy(attempt_timeout=0.05))
+        with pytest.raises(AttemptTimeout):
+            async for _ in engine.stream_explanation("x + 1 = 2"):
+                pass
+        return engine
+
+    engine = asyncio.run(scenario())
+    assert engine.router.get_statistics()["circuit_breakers"]["openai"]["consecutive_failures"] == 1
+    assert engine._get_limiter(AIProvider.OPENAI).get_statistics()["in_flight"] == 0
+
+
+def test_stream_respects_deadline():
+    async def scenario():
+        engine = make_engine(FakeProvider(delay=10.0, chunks=['{"content": "x"}']))
+        with deadline(0.05):
+            with pytest.raises(DeadlineExceeded):
+                async for _ in engine.stream_explanation("x + 1 = 2"):
+                    pass
+        return engine
+
+    engine = asyncio.run(scenario())
+    assert engine.router.get_statistics()["circuit_breakers"]["openai"]["consecutive_failures"] == 0
+
+
+def test_stream_usage_is_recorded_without_leaking_recorder():
+    async def scenario():
+        usage = TokenUsage(input_tokens=10, output_tokens=5)
+        chunks = ['{"summary": "Ecuación lineal", ', '"content": "x = 1"}']
+        engine = make_engine(FakeProvider(chunks=chunks, usage=usage))
+        active = [_current_recorder.get() async for _ in engine.stream_explanation("x + 1 = 2")]
+        return engine, active
+
+    engine, active = asyncio.run(scenario())
+    assert active == [None] * len(active)
+    assert engine._token_usage.get_statistics()["openai"]["input_tokens"] == 20